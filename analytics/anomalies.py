@@ -1,26 +1,40 @@
 """
-Anomaly detection using Z-score method.
+Anomaly detection using Z-scores against pluggable baselines.
 """
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-import statistics
-from core.domain.entities import Anomaly, MetricType
+import numpy as np
+from core.domain.entities import Anomaly, MetricType, MONEY_METRIC_TYPES
+from core.domain.money import micros_to_float
 from core.infrastructure.clickhouse_client import ClickHouseClient
+from analytics.online_stats import OnlineAnomalyStore
+from analytics.detectors import DetectorStrategy, ZScoreDetector
 
 
 class AnomalyDetector:
     """Detect anomalies in metrics using Z-score."""
 
-    def __init__(self, z_threshold: float = 2.5):
+    MIN_POINTS = 7  # Need at least 7 data points
+    HIERARCHY = ('campaign', 'adgroup', 'ad')
+
+    def __init__(
+        self,
+        z_threshold: float = 2.5,
+        strategy: Optional[DetectorStrategy] = None,
+        clickhouse: Optional[ClickHouseClient] = None,
+    ):
         """
         Initialize anomaly detector.
         
         Args:
             z_threshold: Z-score threshold for anomaly detection (default: 2.5)
+            strategy: Baseline model (default: global mean/stdev z-score)
+            clickhouse: Shared ClickHouse client (default: a new client)
         """
         self.z_threshold = z_threshold
-        self.clickhouse = ClickHouseClient()
+        self.strategy = strategy or ZScoreDetector()
+        self.clickhouse = clickhouse or ClickHouseClient()
 
     def detect_anomalies(
         self,
@@ -28,6 +42,7 @@ class AnomalyDetector:
         entity_id: str,
         entity_type: str = "campaign",
         lookback_days: int = 30,
+        precomputed: bool = False,
     ) -> List[Anomaly]:
         """
         Detect anomalies for a specific metric.
@@ -35,69 +50,330 @@ class AnomalyDetector:
         Args:
             metric_type: Type of metric to analyze
             entity_id: ID of the entity (campaign, ad, etc.)
-            entity_type: Type of entity
+            entity_type: Type of entity (campaign, adgroup, ad)
             lookback_days: Number of days to look back for baseline
+            precomputed: Read the scores maintained at ingestion time
+                instead of querying ClickHouse, if the entity type is tracked
             
         Returns:
             List of detected anomalies
         """
+        if precomputed and OnlineAnomalyStore.tracks(entity_type):
+            return self._get_precomputed_anomalies(
+                metric_type, entity_id, entity_type, lookback_days
+            )
+
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=lookback_days)
 
-        # Get historical data
+        if entity_type not in ClickHouseClient.ENTITY_COLUMNS:
+            raise ValueError(f"Unknown entity type: {entity_type}")
+
+        # Get historical data of the entity only
         time_series = self.clickhouse.get_time_series_metrics(
-            campaign_id=entity_id if entity_type == "campaign" else None,
             start_date=start_date,
             end_date=end_date,
+            **{ClickHouseClient.ENTITY_COLUMNS[entity_type]: entity_id},
         )
 
-        if len(time_series) < 7:  # Need at least 7 data points
+        if len(time_series) < self.MIN_POINTS:
             return []
 
         # Extract values for the metric type
         metric_key = metric_type.value
-        values = [self._get_metric_value(point, metric_key) for point in time_series]
-        dates = [point['date'] for point in time_series]
+        values = np.array([self._get_metric_value(point, metric_key) for point in time_series])
+        matrix, dates = self._build_matrix(
+            np.zeros(len(time_series), dtype=np.intp),
+            np.asarray([point['date'] for point in time_series], dtype='datetime64[D]'),
+            values,
+            1,
+        )
+        return self._find_anomalies(
+            matrix, dates, np.array([entity_id], dtype=object), metric_type, entity_type
+        )
 
-        # Calculate statistics
-        if not values or all(v == 0 for v in values):
-            return []
+    def detect_anomalies_bulk(
+        self,
+        metric_types: Iterable[MetricType],
+        entity_type: str = "campaign",
+        lookback_days: int = 30,
+        entity_ids: Optional[Iterable[str]] = None,
+        parent_ids: Optional[Iterable[str]] = None,
+    ) -> List[Anomaly]:
+        """
+        Detect anomalies for every entity and metric type at once.
 
-        mean = statistics.mean(values)
-        stdev = statistics.stdev(values) if len(values) > 1 else 0
+        The series of all entities are loaded in one grouped query and
+        scored with vectorized operations; results match calling
+        ``detect_anomalies`` per entity and metric.
 
-        if stdev == 0:
+        Args:
+            metric_types: Types of metric to analyze
+            entity_type: Type of entity (campaign, adgroup, ad)
+            lookback_days: Number of days to look back for baseline
+            entity_ids: Only analyze these entities
+            parent_ids: Only analyze children of these parent entities
+
+        Returns:
+            List of detected anomalies
+        """
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=lookback_days)
+
+        series = self.clickhouse.get_entity_time_series(
+            start_date=start_date,
+            end_date=end_date,
+            entity_type=entity_type,
+            entity_ids=list(entity_ids) if entity_ids is not None else None,
+            parent_ids=list(parent_ids) if parent_ids is not None else None,
+        )
+        if not series['entity_id']:
             return []
 
-        # Detect anomalies
+        entity_ids, entity_index = np.unique(
+            np.asarray(series['entity_id'], dtype=object), return_inverse=True
+        )
+        series_dates = np.asarray(series['date'], dtype='datetime64[D]')
+
         anomalies = []
-        for i, (value, date) in enumerate(zip(values, dates)):
-            z_score = (value - mean) / stdev if stdev > 0 else 0
+        for metric_type in metric_types:
+            values = np.asarray(series[metric_type.value], dtype=np.float64)
+            if metric_type in MONEY_METRIC_TYPES:
+                values = micros_to_float(values)
 
-            if abs(z_score) >= self.z_threshold:
-                severity = self._determine_severity(abs(z_score))
-                description = self._generate_description(
-                    metric_type, value, mean, z_score, entity_type
-                )
-
-                anomaly = Anomaly(
-                    metric_type=metric_type,
-                    entity_id=entity_id,
-                    entity_type=entity_type,
-                    date=date if isinstance(date, datetime) else datetime.combine(date, datetime.min.time()),
-                    value=Decimal(str(value)),
-                    expected_value=Decimal(str(mean)),
-                    z_score=Decimal(str(round(z_score, 4))),
-                    severity=severity,
-                    description=description,
-                )
-                anomalies.append(anomaly)
+            matrix, dates = self._build_matrix(entity_index, series_dates, values, len(entity_ids))
+            anomalies.extend(
+                self._find_anomalies(matrix, dates, entity_ids, metric_type, entity_type)
+            )
+
+        return anomalies
+
+    def detect_anomalies_hierarchical(
+        self,
+        metric_types: Iterable[MetricType],
+        campaign_ids: Optional[Iterable[str]] = None,
+        lookback_days: int = 30,
+    ) -> List[Anomaly]:
+        """
+        Detect anomalies down the campaign > ad group > ad hierarchy.
+
+        Each level only analyzes the children of entities found anomalous on
+        the level above, so ad-level coverage does not scan every ad.
+
+        Args:
+            metric_types: Types of metric to analyze
+            campaign_ids: Only start from these campaigns
+            lookback_days: Number of days to look back for baseline
+
+        Returns:
+            Anomalies of all levels, campaigns first
+        """
+        metric_types = list(metric_types)
+        anomalies = self.detect_anomalies_bulk(
+            metric_types, 'campaign', lookback_days, entity_ids=campaign_ids
+        )
+
+        parents = anomalies
+        for entity_type in self.HIERARCHY[1:]:
+            parent_ids = sorted({anomaly.entity_id for anomaly in parents})
+            if not parent_ids:
+                break
+            parents = self.detect_anomalies_bulk(
+                metric_types, entity_type, lookback_days, parent_ids=parent_ids
+            )
+            anomalies.extend(parents)
+
+        return anomalies
+
+    def detect_and_store(
+        self,
+        metric_types: Iterable[MetricType],
+        entity_type: str = "campaign",
+        lookback_days: int = 30,
+        entity_ids: Optional[Iterable[str]] = None,
+    ) -> List[Anomaly]:
+        """
+        Detect anomalies and replace the stored ones of the window.
+
+        Args:
+            metric_types: Types of metric to analyze
+            entity_type: Type of entity
+            lookback_days: Number of days to look back for baseline
+            entity_ids: Only analyze and replace these entities (default: all)
+
+        Returns:
+            List of detected anomalies
+        """
+        metric_types = list(metric_types)
+        entity_ids = list(entity_ids) if entity_ids is not None else None
+        end_date = datetime.utcnow()
+        anomalies = self.detect_anomalies_bulk(
+            metric_types, entity_type, lookback_days, entity_ids=entity_ids
+        )
 
+        self.clickhouse.replace_anomalies(
+            [
+                {
+                    'metric_type': anomaly.metric_type.value,
+                    'entity_id': anomaly.entity_id,
+                    'date': anomaly.date,
+                    'value': anomaly.value,
+                    'expected_value': anomaly.expected_value,
+                    'z_score': anomaly.z_score,
+                    'severity': anomaly.severity,
+                    'description': anomaly.description,
+                }
+                for anomaly in anomalies
+            ],
+            entity_type=entity_type,
+            metric_types=[metric_type.value for metric_type in metric_types],
+            start_date=(end_date - timedelta(days=lookback_days)).date(),
+            end_date=end_date.date(),
+            entity_ids=entity_ids,
+        )
         return anomalies
 
+    def get_stored_anomalies(
+        self,
+        metric_types: Optional[Iterable[MetricType]] = None,
+        entity_id: Optional[str] = None,
+        entity_type: Optional[str] = None,
+        severity: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 1000,
+        after: Optional[Tuple[date, str, str, str]] = None,
+    ) -> List[Anomaly]:
+        """
+        Read anomalies written by the scheduled detection job.
+
+        Args:
+            after: Keyset position (date, entity_type, entity_id, metric_type)
+                to continue after, for pagination
+
+        Returns:
+            List of stored anomalies, most recent first
+        """
+        rows = self.clickhouse.get_anomalies(
+            entity_type=entity_type,
+            entity_id=entity_id,
+            metric_types=[metric_type.value for metric_type in metric_types] if metric_types else None,
+            severity=severity,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            after=after,
+        )
+        return [
+            Anomaly(
+                id=row['id'],
+                metric_type=MetricType(row['metric_type']),
+                entity_id=row['entity_id'],
+                entity_type=row['entity_type'],
+                date=datetime.combine(row['date'], datetime.min.time()),
+                value=row['value'],
+                expected_value=row['expected_value'],
+                z_score=row['z_score'],
+                severity=row['severity'],
+                description=row['description'],
+                created_at=row['created_at'],
+            )
+            for row in rows
+        ]
+
+    def _build_matrix(
+        self,
+        entity_index: np.ndarray,
+        series_dates: np.ndarray,
+        values: np.ndarray,
+        entity_count: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lay out series as an entities x days matrix over a contiguous calendar.
+
+        Returns:
+            The matrix, NaN where an entity has no data that day, and the
+            day of each column
+        """
+        first_day = series_dates.min()
+        dates = np.arange(first_day, series_dates.max() + 1)
+        matrix = np.full((entity_count, len(dates)), np.nan)
+        matrix[entity_index, (series_dates - first_day).astype(np.intp)] = values
+        return matrix, dates
+
+    def _find_anomalies(
+        self,
+        matrix: np.ndarray,
+        dates: np.ndarray,
+        entity_ids: np.ndarray,
+        metric_type: MetricType,
+        entity_type: str,
+    ) -> List[Anomaly]:
+        """Score a matrix of series with the detector strategy and collect anomalies."""
+        expected, z_scores = self.strategy.score(matrix, dates)
+
+        enough_points = np.sum(~np.isnan(matrix), axis=1) >= self.MIN_POINTS
+        with np.errstate(invalid='ignore'):
+            flagged = enough_points[:, None] & (np.abs(z_scores) >= self.z_threshold)
+
+        anomalies = []
+        for i, j in zip(*np.nonzero(flagged)):
+            value = float(matrix[i, j])
+            mean = float(expected[i, j])
+            z_score = float(z_scores[i, j])
+            anomalies.append(Anomaly(
+                metric_type=metric_type,
+                entity_id=entity_ids[i],
+                entity_type=entity_type,
+                date=datetime.combine(dates[j].item(), datetime.min.time()),
+                value=Decimal(str(value)),
+                expected_value=Decimal(str(mean)),
+                z_score=Decimal(str(round(z_score, 4))),
+                severity=self._determine_severity(abs(z_score)),
+                description=self._generate_description(
+                    metric_type, value, mean, z_score, entity_type
+                ),
+            ))
+        return anomalies
+
+    def _get_precomputed_anomalies(
+        self,
+        metric_type: MetricType,
+        entity_id: str,
+        entity_type: str,
+        lookback_days: int,
+    ) -> List[Anomaly]:
+        """Build anomalies from the online statistics store."""
+        scores = OnlineAnomalyStore().get_anomalies(
+            metric_type=metric_type,
+            entity_id=entity_id,
+            entity_type=entity_type,
+            lookback_days=lookback_days,
+            z_threshold=self.z_threshold,
+        )
+        return [
+            Anomaly(
+                metric_type=metric_type,
+                entity_id=entity_id,
+                entity_type=entity_type,
+                date=datetime.combine(score['date'], datetime.min.time()),
+                value=Decimal(str(score['value'])),
+                expected_value=Decimal(str(score['expected'])),
+                z_score=Decimal(str(score['z_score'])),
+                severity=self._determine_severity(abs(score['z_score'])),
+                description=self._generate_description(
+                    metric_type, score['value'], score['expected'], score['z_score'], entity_type
+                ),
+            )
+            for score in scores
+        ]
+
     def _get_metric_value(self, data_point: Dict[str, Any], metric_key: str) -> float:
-        """Extract metric value from data point."""
-        return float(data_point.get(metric_key, 0))
+        """Extract metric value from data point, money in currency units."""
+        value = data_point.get(metric_key, 0)
+        if MetricType(metric_key) in MONEY_METRIC_TYPES:
+            return micros_to_float(value)
+        return float(value)
 
     def _determine_severity(self, abs_z_score: float) -> str:
         """Determine anomaly severity based on Z-score."""
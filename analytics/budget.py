@@ -0,0 +1,215 @@
+"""
+Budget pacing of campaign spend against linear and day-weighted budget curves.
+"""
+from typing import List, Dict, Any, Optional, Sequence
+from datetime import date, datetime, timedelta
+import numpy as np
+from numpy.typing import ArrayLike
+from analytics.roi import _safe_divide
+from core.domain.money import to_micros
+from core.infrastructure.clickhouse_client import ClickHouseClient
+from core.repositories.campaign_repository import DjangoCampaignRepository
+
+CURVES = ('linear', 'day_weighted')
+
+
+def weekday_counts(start_dates: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """
+    Count the weekdays of many date ranges at once.
+
+    Args:
+        start_dates: First day of each range, as datetime64[D]
+        days: Length of each range in days
+
+    Returns:
+        Array of shape (ranges, 7), Monday first
+    """
+    first_weekday = (start_dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    full_weeks, extra_days = np.divmod(np.asarray(days, dtype=np.int64), 7)
+    offset = (np.arange(7)[None, :] - first_weekday[:, None]) % 7
+    return full_weeks[:, None] + (offset < extra_days[:, None])
+
+
+def calculate_pacing_batch(
+    budget: ArrayLike,
+    start_dates: ArrayLike,
+    end_dates: ArrayLike,
+    spend: ArrayLike,
+    recent_spend: ArrayLike,
+    as_of: date,
+    curve: str = 'linear',
+    weekday_weights: Optional[ArrayLike] = None,
+    recent_days: int = 7,
+    tolerance: float = 0.1,
+) -> Dict[str, np.ndarray]:
+    """
+    Compare spend to date with the budget curve of many campaigns at once.
+
+    The linear curve spreads the budget evenly over the flight. The
+    day-weighted curve spreads it in proportion to ``weekday_weights``, so a
+    campaign that normally spends less at weekends is not flagged for it.
+    Spend is projected to the end of the flight at the run rate of the last
+    ``recent_days`` days, weighted by the same curve.
+
+    Args:
+        budget: Total budget per campaign in micros
+        start_dates: First day of each flight
+        end_dates: Last day of each flight
+        spend: Spend from the first day through ``as_of`` in micros
+        recent_spend: Spend over the last ``recent_days`` days through ``as_of`` in micros
+        as_of: Last day covered by the spend
+        curve: 'linear' or 'day_weighted'
+        weekday_weights: Relative spend per weekday, Monday first (day_weighted only)
+        recent_days: Days the run rate is measured over
+        tolerance: Relative deviation from the curve still considered on pace
+
+    Returns:
+        Dictionary of arrays keyed by name: expected spend, projected spend and
+        overspend in micros, the pacing ratio, elapsed and total days, and the
+        over_pacing, under_pacing and overspend_projected flags
+    """
+    if curve not in CURVES:
+        raise ValueError(f"Unknown budget curve: {curve}. Available: {', '.join(CURVES)}")
+
+    budget = np.asarray(budget, dtype=np.float64)
+    spend = np.asarray(spend, dtype=np.float64)
+    recent_spend = np.asarray(recent_spend, dtype=np.float64)
+    start = np.asarray(start_dates, dtype='datetime64[D]')
+    end = np.asarray(end_dates, dtype='datetime64[D]')
+    as_of = np.datetime64(as_of, 'D')
+
+    total_days = np.maximum((end - start).astype(np.int64) + 1, 1)
+    elapsed_days = np.clip((as_of - start).astype(np.int64) + 1, 0, total_days)
+    recent_window = np.minimum(elapsed_days, recent_days)
+
+    if curve == 'linear':
+        weights = np.ones(7)
+    else:
+        weights = np.ones(7) if weekday_weights is None else np.asarray(weekday_weights, dtype=np.float64)
+
+    # Each day counts with the weight of its weekday; the linear curve weighs all days 1
+    total_weight = weekday_counts(start, total_days) @ weights
+    elapsed_weight = weekday_counts(start, elapsed_days) @ weights
+    recent_weight = weekday_counts(start + (elapsed_days - recent_window), recent_window) @ weights
+
+    expected = budget * _safe_divide(elapsed_weight, total_weight)
+    pacing = _safe_divide(spend, expected)
+    projected = spend + _safe_divide(recent_spend, recent_weight) * (total_weight - elapsed_weight)
+    overspend = np.maximum(projected - budget, 0)
+
+    return {
+        'expected_spend': expected,
+        'pacing': pacing,
+        'projected_spend': projected,
+        'projected_overspend': overspend,
+        'days_elapsed': elapsed_days,
+        'days_total': total_days,
+        'over_pacing': (expected > 0) & (pacing > 1 + tolerance),
+        'under_pacing': (expected > 0) & (pacing < 1 - tolerance),
+        'overspend_projected': overspend > 0,
+    }
+
+
+class BudgetPacer:
+    """Track the spend of active campaigns against their budget curve."""
+
+    def __init__(
+        self,
+        curve: str = 'linear',
+        tolerance: float = 0.1,
+        recent_days: int = 7,
+        weekday_weights: Optional[Sequence[float]] = None,
+        clickhouse: Optional[ClickHouseClient] = None,
+    ):
+        """
+        Initialize budget pacer.
+
+        Args:
+            curve: 'linear' or 'day_weighted'
+            tolerance: Relative deviation from the curve still considered on pace
+            recent_days: Days the run rate is measured over
+            weekday_weights: Relative spend per weekday, Monday first; the
+                day-weighted curve learns them from recent spend when unset
+            clickhouse: Shared ClickHouse client (default: a new client)
+        """
+        if curve not in CURVES:
+            raise ValueError(f"Unknown budget curve: {curve}. Available: {', '.join(CURVES)}")
+        self.curve = curve
+        self.tolerance = tolerance
+        self.recent_days = recent_days
+        self.weekday_weights = weekday_weights
+        self.clickhouse = clickhouse or ClickHouseClient()
+        self.campaigns = DjangoCampaignRepository()
+
+    def pace_active_campaigns(self, as_of: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Compute the pacing of all campaigns in flight with a budget.
+
+        Campaigns come from one Postgres query and their spend from one
+        ClickHouse query; the pacing itself is one vectorized pass.
+
+        Args:
+            as_of: Last day of spend to pace (default: yesterday, the last complete day)
+
+        Returns:
+            Pacing per campaign, money in micros
+        """
+        if as_of is None:
+            as_of = datetime.utcnow().date() - timedelta(days=1)
+
+        campaigns = self.campaigns.list_in_flight(as_of)
+        if not campaigns:
+            return []
+
+        campaign_ids = [campaign.id for campaign in campaigns]
+        start_dates = [campaign.start_date.date() for campaign in campaigns]
+        spend = self.clickhouse.get_campaign_spend(
+            campaign_ids, start_dates, as_of, recent_days=self.recent_days
+        )
+
+        pacing = calculate_pacing_batch(
+            budget=[to_micros(campaign.budget) for campaign in campaigns],
+            start_dates=start_dates,
+            end_dates=[campaign.end_date.date() for campaign in campaigns],
+            spend=[spend.get(campaign_id, (0, 0))[0] for campaign_id in campaign_ids],
+            recent_spend=[spend.get(campaign_id, (0, 0))[1] for campaign_id in campaign_ids],
+            as_of=as_of,
+            curve=self.curve,
+            weekday_weights=self._get_weekday_weights(as_of),
+            recent_days=self.recent_days,
+            tolerance=self.tolerance,
+        )
+
+        return [
+            {
+                'campaign_id': campaign.id,
+                'name': campaign.name,
+                'budget': to_micros(campaign.budget),
+                'spend': spend.get(campaign.id, (0, 0))[0],
+                'expected_spend': int(pacing['expected_spend'][i]),
+                'pacing': float(pacing['pacing'][i]),
+                'projected_spend': int(pacing['projected_spend'][i]),
+                'projected_overspend': int(pacing['projected_overspend'][i]),
+                'days_elapsed': int(pacing['days_elapsed'][i]),
+                'days_total': int(pacing['days_total'][i]),
+                'over_pacing': bool(pacing['over_pacing'][i]),
+                'under_pacing': bool(pacing['under_pacing'][i]),
+                'overspend_projected': bool(pacing['overspend_projected'][i]),
+            }
+            for i, campaign in enumerate(campaigns)
+        ]
+
+    def _get_weekday_weights(self, as_of: date) -> Optional[np.ndarray]:
+        """Get the weekday weights of the day-weighted curve, learned from the last four weeks if unset."""
+        if self.curve != 'day_weighted':
+            return None
+        if self.weekday_weights is not None:
+            return np.asarray(self.weekday_weights, dtype=np.float64)
+
+        weekday_spend = np.asarray(
+            self.clickhouse.get_weekday_spend(as_of - timedelta(days=27), as_of),
+            dtype=np.float64,
+        )
+        if weekday_spend.sum() <= 0:
+            return np.ones(7)
+        return weekday_spend / weekday_spend.mean()
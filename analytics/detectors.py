@@ -0,0 +1,144 @@
+"""
+Anomaly detector strategies.
+
+Each strategy scores many series at once. Series are rows of an
+entities x days matrix over a contiguous calendar, with NaN on days without
+data, and all work is done with vectorized NumPy operations.
+"""
+from abc import ABC, abstractmethod
+from typing import Tuple
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+
+class DetectorStrategy(ABC):
+    """Baseline model producing an expected value and scale per data point."""
+
+    name = ""
+
+    @abstractmethod
+    def baseline(self, matrix: np.ndarray, dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the baseline of every data point.
+
+        Args:
+            matrix: Entities x days values, NaN where there is no data
+            dates: Day of each column (datetime64[D])
+
+        Returns:
+            Expected value and scale arrays, broadcastable to the matrix
+        """
+        pass
+
+    def score(self, matrix: np.ndarray, dates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every data point.
+
+        Returns:
+            Expected values and z-scores shaped like the matrix; z-scores
+            are NaN where the baseline is undefined
+        """
+        with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            expected, scale = self.baseline(matrix, dates)
+            expected = np.broadcast_to(expected, matrix.shape)
+            scale = np.broadcast_to(scale, matrix.shape)
+            z_scores = np.where(scale > 0, (matrix - expected) / scale, np.nan)
+        return expected, z_scores
+
+
+class ZScoreDetector(DetectorStrategy):
+    """Mean and standard deviation over the whole lookback (default)."""
+
+    name = "zscore"
+
+    def baseline(self, matrix, dates):
+        mean = np.nanmean(matrix, axis=1)
+        stdev = np.nanstd(matrix, axis=1, ddof=1)
+        return mean[:, None], stdev[:, None]
+
+
+class RollingZScoreDetector(DetectorStrategy):
+    """Mean and standard deviation over the preceding days of each point."""
+
+    name = "rolling"
+    # Smallest window with enough points for a standard deviation to score against
+    MIN_WINDOW = 3
+
+    def __init__(self, window: int = 7, min_periods: int = None):
+        """
+        Args:
+            window: Number of preceding calendar days forming the baseline
+            min_periods: Data points required in a window (default: half of
+                it, at least 3), at most the window
+
+        Raises:
+            ValueError: If the window is shorter than MIN_WINDOW
+        """
+        if window < self.MIN_WINDOW:
+            raise ValueError(f"Rolling window must be at least {self.MIN_WINDOW} days")
+        self.window = window
+        self.min_periods = min(min_periods or max(3, window // 2), window)
+
+    def baseline(self, matrix, dates):
+        # Pad so the window of day t holds days t - window .. t - 1
+        padded = np.pad(matrix, ((0, 0), (self.window, 0)), constant_values=np.nan)
+        windows = sliding_window_view(padded, self.window, axis=1)[:, :matrix.shape[1]]
+
+        counts = np.sum(~np.isnan(windows), axis=2)
+        mean = np.nanmean(windows, axis=2)
+        stdev = np.nanstd(windows, axis=2, ddof=1)
+        stdev[counts < self.min_periods] = np.nan
+        return mean, stdev
+
+
+class RobustMADDetector(DetectorStrategy):
+    """Median and median absolute deviation, insensitive to the outliers themselves."""
+
+    name = "mad"
+
+    def baseline(self, matrix, dates):
+        median = np.nanmedian(matrix, axis=1)[:, None]
+        mad = np.nanmedian(np.abs(matrix - median), axis=1)[:, None]
+        return median, mad * MAD_SCALE
+
+
+class SeasonalDetector(DetectorStrategy):
+    """Day-of-week medians as baseline, scaled by the MAD of the residuals."""
+
+    name = "seasonal"
+
+    def baseline(self, matrix, dates):
+        # 1970-01-01 was a Thursday; 0 is Monday
+        weekdays = (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7
+        expected = np.full(matrix.shape, np.nan)
+        for weekday in range(7):
+            columns = weekdays == weekday
+            if columns.any():
+                expected[:, columns] = np.nanmedian(matrix[:, columns], axis=1)[:, None]
+
+        residuals = matrix - expected
+        mad = np.nanmedian(np.abs(residuals - np.nanmedian(residuals, axis=1)[:, None]), axis=1)
+        return expected, (mad * MAD_SCALE)[:, None]
+
+
+DETECTOR_STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (ZScoreDetector, RollingZScoreDetector, RobustMADDetector, SeasonalDetector)
+}
+
+
+def get_detector_strategy(name: str = "zscore", **options) -> DetectorStrategy:
+    """
+    Create a detector strategy by name.
+
+    Raises:
+        ValueError: If the strategy is unknown or its options are invalid
+    """
+    if name not in DETECTOR_STRATEGIES:
+        raise ValueError(f"Unknown detector strategy: {name}")
+    return DETECTOR_STRATEGIES[name](**options)
@@ -0,0 +1,306 @@
+"""
+Incremental anomaly statistics maintained at ingestion time.
+"""
+from dataclasses import dataclass
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import math
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import LockNotOwnedError
+from core.domain.entities import MetricType, MONEY_METRIC_TYPES
+from core.domain.money import micros_to_float
+
+
+@dataclass
+class RunningStats:
+    """Running mean/variance (Welford, or exponentially weighted)."""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0  # Sum of squared deviations, or the variance when weighted
+
+    def add(self, value: float, alpha: Optional[float] = None):
+        """
+        Add an observation.
+
+        Args:
+            value: Observed value
+            alpha: Smoothing factor for exponential weighting, None for Welford
+        """
+        self.count += 1
+        delta = value - self.mean
+        if alpha is None or self.count == 1:
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+            if alpha is not None:
+                self.m2 = 0.0
+        else:
+            increment = alpha * delta
+            self.mean += increment
+            self.m2 = (1 - alpha) * (self.m2 + delta * increment)
+
+    def remove(self, value: float, alpha: Optional[float] = None):
+        """
+        Remove an observation.
+
+        Exact for Welford. With exponential weighting the observation is
+        undone as if it were the latest one added.
+
+        Args:
+            value: Previously added value
+            alpha: Smoothing factor for exponential weighting, None for Welford
+        """
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        if alpha is None:
+            mean = (self.count * self.mean - value) / (self.count - 1)
+            self.m2 = max(self.m2 - (value - self.mean) * (value - mean), 0.0)
+        else:
+            mean = (self.mean - alpha * value) / (1 - alpha)
+            self.m2 = max(self.m2 / (1 - alpha) - alpha * (value - mean) ** 2, 0.0)
+        self.mean = mean
+        self.count -= 1
+
+    def stdev(self, alpha: Optional[float] = None) -> float:
+        """Get the standard deviation (sample, for Welford)."""
+        if alpha is not None:
+            return math.sqrt(self.m2)
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def to_tuple(self) -> Tuple[int, float, float]:
+        """Pack into a compact tuple for storage."""
+        return (self.count, self.mean, self.m2)
+
+    @classmethod
+    def from_tuple(cls, packed: Tuple[int, float, float]) -> 'RunningStats':
+        """Unpack from storage."""
+        return cls(*packed)
+
+
+class OnlineAnomalyStore:
+    """
+    Per-(entity, metric) running statistics and scores of ingested days.
+
+    Each entry keeps the statistics before and after its latest day. Later
+    batches for that same day revise it from the earlier state instead of
+    counting it twice. Each new day is scored against the statistics of the
+    days before it, in O(1). Totals of the last SCORE_HISTORY days are kept
+    so late batches for earlier days replace their observation.
+
+    Only the entity types in ANOMALY_ONLINE_ENTITY_TYPES are tracked, and
+    entries expire ANOMALY_ONLINE_TTL_SECONDS after their last update.
+    """
+
+    KEY_PREFIX = 'anomaly:online'
+    LOCK_PREFIX = 'anomaly:online:lock'
+    # Read-modify-write attempts of an entity whose lock expired meanwhile
+    LOCK_ATTEMPTS = 3
+    MIN_POINTS = 7
+    SCORE_HISTORY = 90
+
+    # metrics_analytics record field identifying each entity type
+    ENTITY_FIELDS = {
+        'campaign': 'campaign_id',
+        'adgroup': 'ad_group_id',
+        'ad': 'ad_id',
+    }
+
+    def __init__(self, alpha: Optional[float] = None):
+        """
+        Args:
+            alpha: Exponential weighting factor, defaults to the
+                ANOMALY_ONLINE_ALPHA setting (None for plain Welford)
+        """
+        self.alpha = alpha if alpha is not None else settings.ANOMALY_ONLINE_ALPHA
+
+    @classmethod
+    def make_key(cls, entity_type: str, entity_id: str, metric_type: MetricType) -> str:
+        """Build the cache key of an (entity, metric) entry."""
+        return f"{cls.KEY_PREFIX}:{entity_type}:{entity_id}:{metric_type.value}"
+
+    @staticmethod
+    def tracks(entity_type: str) -> bool:
+        """Whether statistics are maintained for an entity type."""
+        return entity_type in settings.ANOMALY_ONLINE_ENTITY_TYPES
+
+    def update(self, records: Iterable[Dict[str, Any]]):
+        """
+        Fold newly ingested ClickHouse metric records into the statistics.
+
+        Args:
+            records: Records as inserted into metrics_analytics
+        """
+        entity_fields = {
+            entity_type: field for entity_type, field in self.ENTITY_FIELDS.items()
+            if self.tracks(entity_type)
+        }
+
+        # Sum the batch per entity, then per metric and day
+        deltas = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+        for record in records:
+            day = record.get('date')
+            if isinstance(day, str):
+                day = datetime.strptime(day, '%Y-%m-%d').date()
+            for entity_type, field in entity_fields.items():
+                entity_id = record.get(field)
+                if not entity_id:
+                    continue
+                entity_deltas = deltas[(entity_type, entity_id)]
+                for metric_type in MetricType:
+                    value = record.get(self._record_field(metric_type)) or 0
+                    if metric_type in MONEY_METRIC_TYPES:
+                        value = micros_to_float(value)
+                    key = self.make_key(entity_type, entity_id, metric_type)
+                    entity_deltas[key][day] += value
+
+        # Entities are updated independently, so concurrent ingestion chunks
+        # only wait on each other for the entities they share
+        for (entity_type, entity_id), entity_deltas in deltas.items():
+            self._update_entity(entity_type, entity_id, entity_deltas)
+
+    def _update_entity(
+        self,
+        entity_type: str,
+        entity_id: str,
+        deltas: Dict[str, Dict[date, float]],
+    ):
+        """
+        Apply the deltas of one entity's metrics under the entity's lock.
+
+        Raises:
+            RuntimeError: If the lock keeps expiring before the entries are written
+        """
+        for _ in range(self.LOCK_ATTEMPTS):
+            written = False
+            try:
+                with self._lock(entity_type, entity_id) as lock:
+                    entries = cache.get_many(list(deltas))
+                    for key, day_values in deltas.items():
+                        entry = entries.get(key) or self._empty_entry()
+                        for day in sorted(day_values):
+                            self._apply(entry, day, day_values[day])
+                        entries[key] = entry
+                    # Writing after the lock expired could overwrite another update
+                    if lock is None or lock.owned():
+                        cache.set_many(entries, settings.ANOMALY_ONLINE_TTL_SECONDS)
+                        written = True
+            except LockNotOwnedError:
+                # Raised on release of an expired lock; retry unless already written
+                pass
+            if written:
+                return
+        raise RuntimeError(f"Lock of {entity_type} {entity_id} expired before its statistics were written")
+
+    def get_anomalies(
+        self,
+        metric_type: MetricType,
+        entity_id: str,
+        entity_type: str = "campaign",
+        lookback_days: int = 30,
+        z_threshold: float = 2.5,
+    ) -> List[Dict[str, Any]]:
+        """
+        Read precomputed scores of an entity's metric.
+
+        Returns:
+            Scored days within the lookback whose absolute z-score reaches
+            the threshold, as dictionaries with date, value, expected and z
+        """
+        entry = cache.get(self.make_key(entity_type, entity_id, metric_type))
+        if not entry:
+            return []
+        since = (datetime.utcnow() - timedelta(days=lookback_days)).date()
+        return [
+            {'date': date.fromisoformat(day), 'value': value, 'expected': expected, 'z_score': z_score}
+            for day, value, expected, z_score in entry['scores']
+            if date.fromisoformat(day) >= since and abs(z_score) >= z_threshold
+        ]
+
+    def _apply(self, entry: Dict[str, Any], day: date, delta: float):
+        """Apply one day's delta to an entry and score the day."""
+        last_date = date.fromisoformat(entry['last_date']) if entry['last_date'] else None
+        day_values = entry.setdefault('values', {})
+
+        if last_date == day:
+            # Revise the latest day from the statistics before it
+            value = entry['last_value'] + delta
+            base = RunningStats.from_tuple(entry['base'])
+            entry['scores'] = [score for score in entry['scores'] if score[0] != day.isoformat()]
+        elif last_date is None or day > last_date:
+            value = delta
+            base = RunningStats.from_tuple(entry['stats'])
+        else:
+            # Earlier day, folded into the history as an extra observation
+            # that replaces the day's previous total
+            previous = day_values.get(day.isoformat())
+            value = delta + (previous or 0.0)
+            base = RunningStats.from_tuple(entry['base'])
+            stats = RunningStats.from_tuple(entry['stats'])
+            if previous is not None:
+                base.remove(previous, self.alpha)
+                stats.remove(previous, self.alpha)
+                entry['scores'] = [score for score in entry['scores'] if score[0] != day.isoformat()]
+            self._score(entry, day, value, base)
+            base.add(value, self.alpha)
+            stats.add(value, self.alpha)
+            entry['base'] = base.to_tuple()
+            entry['stats'] = stats.to_tuple()
+            self._record_value(day_values, day, value)
+            return
+
+        self._score(entry, day, value, base)
+        stats = RunningStats.from_tuple(base.to_tuple())
+        stats.add(value, self.alpha)
+        entry['base'] = base.to_tuple()
+        entry['stats'] = stats.to_tuple()
+        entry['last_date'] = day.isoformat()
+        entry['last_value'] = value
+        self._record_value(day_values, day, value)
+
+    def _record_value(self, day_values: Dict[str, float], day: date, value: float):
+        """Keep a day's total, dropping days beyond SCORE_HISTORY."""
+        day_values[day.isoformat()] = value
+        for old_day in sorted(day_values)[:-self.SCORE_HISTORY]:
+            del day_values[old_day]
+
+    def _score(self, entry: Dict[str, Any], day: date, value: float, base: RunningStats):
+        """Score a day against the statistics of earlier days."""
+        stdev = base.stdev(self.alpha)
+        if base.count < self.MIN_POINTS or stdev == 0:
+            return
+        z_score = (value - base.mean) / stdev
+        entry['scores'].append((day.isoformat(), value, base.mean, round(z_score, 4)))
+        entry['scores'].sort()
+        del entry['scores'][:-self.SCORE_HISTORY]
+
+    def _lock(self, entity_type: str, entity_id: str):
+        """Serialize concurrent updates of one entity (Redis cache backends only)."""
+        if hasattr(cache, 'lock'):
+            return cache.lock(
+                f"{self.LOCK_PREFIX}:{entity_type}:{entity_id}",
+                timeout=settings.ANOMALY_ONLINE_LOCK_TIMEOUT_SECONDS,
+            )
+        return nullcontext()
+
+    def _empty_entry(self) -> Dict[str, Any]:
+        """Create a new store entry."""
+        return {
+            'stats': RunningStats().to_tuple(),
+            'base': RunningStats().to_tuple(),
+            'last_date': None,
+            'last_value': 0.0,
+            'scores': [],
+            'values': {},
+        }
+
+    @staticmethod
+    def _record_field(metric_type: MetricType) -> str:
+        """Get the metrics_analytics record field holding a metric."""
+        if metric_type in MONEY_METRIC_TYPES:
+            return f"{metric_type.value}_micros"
+        return metric_type.value
@@ -1,59 +1,61 @@
 """
 ROI and related metric calculations.
 """
-from decimal import Decimal
+from typing import Dict
+import numpy as np
+from numpy.typing import ArrayLike
 from core.domain.entities import AnalyticsResult
 
 
-def calculate_roi(cost: Decimal, revenue: Decimal) -> Decimal:
+def calculate_roi(cost: int, revenue: int) -> float:
     """
     Calculate ROI: (Revenue - Cost) / Cost * 100.
     
     Args:
-        cost: Total cost
-        revenue: Total revenue
+        cost: Total cost in micros
+        revenue: Total revenue in micros
         
     Returns:
         ROI percentage
     """
     if cost == 0:
-        return Decimal('0')
-    return ((revenue - cost) / cost) * 100
+        return 0.0
+    return (revenue - cost) * 100 / cost
 
 
-def calculate_cpc(cost: Decimal, clicks: int) -> Decimal:
+def calculate_cpc(cost: int, clicks: int) -> float:
     """
     Calculate Cost Per Click: Cost / Clicks.
     
     Args:
-        cost: Total cost
+        cost: Total cost in micros
         clicks: Total clicks
         
     Returns:
-        Cost per click
+        Cost per click in micros
     """
     if clicks == 0:
-        return Decimal('0')
-    return cost / Decimal(clicks)
+        return 0.0
+    return cost / clicks
 
 
-def calculate_cpa(cost: Decimal, conversions: int) -> Decimal:
+def calculate_cpa(cost: int, conversions: int) -> float:
     """
     Calculate Cost Per Acquisition: Cost / Conversions.
     
     Args:
-        cost: Total cost
+        cost: Total cost in micros
         conversions: Total conversions
         
     Returns:
-        Cost per acquisition
+        Cost per acquisition in micros
     """
     if conversions == 0:
-        return Decimal('0')
-    return cost / Decimal(conversions)
+        return 0.0
+    return cost / conversions
 
 
-def calculate_ctr(clicks: int, impressions: int) -> Decimal:
+def calculate_ctr(clicks: int, impressions: int) -> float:
     """
     Calculate Click-Through Rate: (Clicks / Impressions) * 100.
     
@@ -65,8 +67,8 @@ def calculate_ctr(clicks: int, impressions: int) -> Decimal:
         CTR percentage
     """
     if impressions == 0:
-        return Decimal('0')
-    return (Decimal(clicks) / Decimal(impressions)) * 100
+        return 0.0
+    return clicks * 100 / impressions
 
 
 def calculate_all_metrics(result: AnalyticsResult) -> AnalyticsResult:
@@ -84,3 +86,46 @@ def calculate_all_metrics(result: AnalyticsResult) -> AnalyticsResult:
     result.cpa = calculate_cpa(result.total_cost, result.total_conversions)
     result.ctr = calculate_ctr(result.total_clicks, result.total_impressions)
     return result
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise division yielding 0 where the denominator is 0."""
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def calculate_all_metrics_batch(
+    cost: ArrayLike,
+    revenue: ArrayLike,
+    clicks: ArrayLike,
+    impressions: ArrayLike,
+    conversions: ArrayLike,
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate ROI, CPC, CPA and CTR for many entities at once.
+
+    Zero denominators yield 0, as in the scalar functions.
+
+    Args:
+        cost: Total cost per entity in micros
+        revenue: Total revenue per entity in micros
+        clicks: Total clicks per entity
+        impressions: Total impressions per entity
+        conversions: Total conversions per entity
+
+    Returns:
+        Dictionary of float64 arrays keyed by metric name, CPC and CPA in micros
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    revenue = np.asarray(revenue, dtype=np.float64)
+    clicks = np.asarray(clicks, dtype=np.float64)
+    impressions = np.asarray(impressions, dtype=np.float64)
+    conversions = np.asarray(conversions, dtype=np.float64)
+
+    return {
+        'roi': _safe_divide((revenue - cost) * 100, cost),
+        'cpc': _safe_divide(cost, clicks),
+        'cpa': _safe_divide(cost, conversions),
+        'ctr': _safe_divide(clicks * 100, impressions),
+    }
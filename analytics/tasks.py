@@ -0,0 +1,293 @@
+"""
+Celery tasks for analytics maintenance.
+"""
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional
+from celery import shared_task, chain
+from django.conf import settings
+from django.core.cache import cache
+from core.services.analytics_service import AnalyticsService
+from core.services.insight_service import InsightService
+from core.services.query_job_service import QueryJobService
+from core.domain.entities import MetricType
+from core.utils.cache import get_most_accessed, decay_access_counts
+from core.utils.dirty import drain_dirty, restore_dirty
+from core.utils.logging import analytics_logger
+from analytics.anomalies import AnomalyDetector
+from analytics.detectors import get_detector_strategy
+
+
+# Cached AnalyticsService methods that can be warmed, by cache key prefix
+WARMABLE_METHODS = {
+    'analytics:roi': 'calculate_roi',
+    'analytics:trends': 'get_trends',
+    'analytics:top_campaigns': 'get_campaign_performance',
+}
+
+WARM_LOCK_KEY = 'analytics:warm:lock'
+
+DETECTION_LOCK_KEY = 'anomaly:detect:lock'
+
+
+@shared_task(ignore_result=True)
+def warm_analytics_cache(
+    limit: Optional[int] = None,
+    budget_seconds: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Recompute the most requested analytics results into the cache.
+
+    Runs after ingestion. Only one warming run is active at a time, at most
+    ``CACHE_WARM_CONCURRENCY`` queries run in parallel, and no new query is
+    started once the time budget is spent.
+
+    Args:
+        limit: Number of most accessed keys to warm
+        budget_seconds: Time budget of the run
+
+    Returns:
+        Dictionary with warming results
+    """
+    limit = limit or settings.CACHE_WARM_TOP_N
+    budget_seconds = budget_seconds or settings.CACHE_WARM_BUDGET_SECONDS
+
+    if not cache.add(WARM_LOCK_KEY, True, budget_seconds):
+        analytics_logger.info("Cache warming already running, skipping")
+        return {'warmed': 0, 'failed': 0, 'skipped': 0, 'locked': True}
+
+    try:
+        entries = [
+            entry for entry in get_most_accessed(limit)
+            if entry['key_prefix'] in WARMABLE_METHODS
+        ]
+        deadline = time.monotonic() + budget_seconds
+        service = AnalyticsService()
+
+        def warm(entry: Dict[str, Any]) -> str:
+            if time.monotonic() >= deadline:
+                return 'skipped'
+            method = getattr(AnalyticsService, WARMABLE_METHODS[entry['key_prefix']])
+            method.refresh(service, **entry['arguments'])
+            return 'warmed'
+
+        counts = {'warmed': 0, 'failed': 0, 'skipped': 0}
+        with ThreadPoolExecutor(max_workers=settings.CACHE_WARM_CONCURRENCY) as pool:
+            futures = [pool.submit(warm, entry) for entry in entries]
+            done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+            for future in not_done:
+                future.cancel()
+                counts['skipped'] += 1
+            for future in done:
+                try:
+                    counts[future.result()] += 1
+                except Exception as e:
+                    analytics_logger.warning(f"Cache warming query failed: {str(e)}")
+                    counts['failed'] += 1
+
+        decay_access_counts()
+        analytics_logger.info(f"Cache warming finished: {counts}")
+        return counts
+    finally:
+        cache.delete(WARM_LOCK_KEY)
+
+
+@shared_task(ignore_result=True)
+def detect_and_store_anomalies(
+    lookback_days: Optional[int] = None,
+    method: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run anomaly detection for all entities and metrics into the anomalies store.
+
+    Scheduled by Celery beat. Re-running over the same window replaces
+    the stored results, so overlapping or repeated runs are harmless.
+
+    Args:
+        lookback_days: Detection window, defaults to ANOMALY_DETECTION_LOOKBACK_DAYS
+        method: Detector strategy, defaults to ANOMALY_DETECTION_METHOD
+
+    Returns:
+        Dictionary with the number of anomalies stored per entity type
+    """
+    lookback_days = lookback_days or settings.ANOMALY_DETECTION_LOOKBACK_DAYS
+    method = method or settings.ANOMALY_DETECTION_METHOD
+
+    if not cache.add(DETECTION_LOCK_KEY, True, settings.ANOMALY_DETECTION_INTERVAL_SECONDS):
+        analytics_logger.info("Anomaly detection already running, skipping")
+        return {'locked': True}
+
+    try:
+        detector = AnomalyDetector(strategy=get_detector_strategy(method))
+        counts = {}
+        for entity_type in settings.ANOMALY_DETECTION_ENTITY_TYPES:
+            anomalies = detector.detect_and_store(
+                metric_types=list(MetricType),
+                entity_type=entity_type,
+                lookback_days=lookback_days,
+            )
+            counts[entity_type] = len(anomalies)
+
+        analytics_logger.info(f"Anomaly detection stored: {counts}")
+        return counts
+    finally:
+        cache.delete(DETECTION_LOCK_KEY)
+
+
+@shared_task(ignore_result=True)
+def detect_dirty_anomalies() -> Dict[str, Any]:
+    """
+    Re-run anomaly detection for entities whose data changed since the last run.
+
+    Returns:
+        Dictionary with the number of entities processed per entity type
+    """
+    if not cache.add(DETECTION_LOCK_KEY, True, settings.ANOMALY_DETECTION_INTERVAL_SECONDS):
+        # Changed entities stay marked for the next run
+        analytics_logger.info("Anomaly detection already running, skipping")
+        return {'locked': True}
+
+    try:
+        detector = AnomalyDetector(strategy=get_detector_strategy(settings.ANOMALY_DETECTION_METHOD))
+        counts = {}
+        for entity_type in settings.ANOMALY_DETECTION_ENTITY_TYPES:
+            entity_ids = drain_dirty('anomalies', entity_type)
+            if not entity_ids:
+                continue
+            try:
+                detector.detect_and_store(
+                    metric_types=list(MetricType),
+                    entity_type=entity_type,
+                    lookback_days=settings.ANOMALY_DETECTION_LOOKBACK_DAYS,
+                    entity_ids=sorted(entity_ids),
+                )
+            except Exception:
+                restore_dirty('anomalies', entity_type, entity_ids)
+                raise
+            counts[entity_type] = len(entity_ids)
+
+        if counts:
+            analytics_logger.info(f"Anomaly detection for changed entities: {counts}")
+        return counts
+    finally:
+        cache.delete(DETECTION_LOCK_KEY)
+
+
+@shared_task(ignore_result=True)
+def refresh_insights(force: bool = False) -> Dict[str, Any]:
+    """
+    Materialize insight snapshots of the trailing windows and requested windows.
+
+    Without ``force`` new snapshots of the trailing windows are only
+    generated when campaign data changed since the last refresh, or today's
+    snapshot of a window is missing or degraded. Campaigns are ranked against
+    each other, so any change refreshes the whole summary. Windows recorded
+    with InsightService.track_window are refreshed when data changed.
+
+    Args:
+        force: Regenerate even if nothing changed
+
+    Returns:
+        Dictionary with the refreshed windows
+    """
+    windows = settings.INSIGHT_SUMMARY_WINDOWS
+    limit = settings.INSIGHT_SUMMARY_LIMIT
+
+    changed = drain_dirty('insights', 'campaign')
+    latest = {
+        days: InsightService.get_latest_snapshot(*InsightService.trailing_window(days), limit)
+        for days in windows
+    }
+    # Snapshots missing a stage that failed or timed out are retried
+    missing = [
+        days for days, snapshot in latest.items()
+        if snapshot is None or snapshot.metadata.get('degraded')
+    ]
+    if not (force or changed or missing):
+        return {'refreshed': []}
+
+    requested = InsightService.requested_windows() if changed else []
+    refreshed_requested = 0
+    try:
+        service = InsightService()
+        for days in windows:
+            service.materialize_snapshot(*InsightService.trailing_window(days), limit)
+        for window in requested:
+            # Skip windows a read is already refreshing
+            if not InsightService.claim_window(*window):
+                continue
+            try:
+                service.materialize_snapshot(*window)
+                refreshed_requested += 1
+            finally:
+                InsightService.release_window(*window)
+    except Exception:
+        restore_dirty('insights', 'campaign', changed)
+        raise
+
+    analytics_logger.info(
+        f"Insight snapshots refreshed for {len(changed)} changed campaigns, "
+        f"including {refreshed_requested} requested windows"
+    )
+    return {'refreshed': windows, 'requested': refreshed_requested}
+
+
+@shared_task(ignore_result=True)
+def refresh_insight_window(start_date: str, end_date: str, limit: int):
+    """
+    Materialize a new snapshot of a window claimed with InsightService.claim_window.
+
+    Queued by reads that found the window's latest snapshot stale or missing;
+    the claim is released once the snapshot is stored or failed.
+
+    Args:
+        start_date: First day of the window (YYYY-MM-DD)
+        end_date: Last day of the window (YYYY-MM-DD)
+        limit: Result limit of the snapshot
+    """
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    try:
+        InsightService().materialize_snapshot(start, end, limit)
+    finally:
+        InsightService.release_window(start, end, limit)
+
+
+@shared_task(ignore_result=True)
+def prune_insight_snapshots(retention_days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Apply the insight snapshot retention policy.
+
+    Args:
+        retention_days: Defaults to INSIGHT_SNAPSHOT_RETENTION_DAYS
+
+    Returns:
+        Dictionary with the number of deleted snapshots
+    """
+    retention_days = retention_days or settings.INSIGHT_SNAPSHOT_RETENTION_DAYS
+    deleted = InsightService.prune_snapshots(retention_days)
+    analytics_logger.info(f"Pruned {deleted} insight snapshots older than {retention_days} days")
+    return {'deleted': deleted}
+
+
+@shared_task(ignore_result=True)
+def process_dirty_entities():
+    """Recompute anomalies, then insights, of entities changed since the last run."""
+    chain(detect_dirty_anomalies.si(), refresh_insights.si()).apply_async()
+
+
+@shared_task(ignore_result=True, soft_time_limit=settings.ANALYTICS_JOB_TIMEOUT_SECONDS)
+def run_query_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Run an analytics query job.
+
+    Routed to the ANALYTICS_JOB_QUEUE queue, so long queries are served by
+    their own workers and never wait behind ingestion.
+
+    Args:
+        job_id: ID of a job created by QueryJobService.submit
+
+    Returns:
+        The finished job
+    """
+    return QueryJobService().run(job_id)
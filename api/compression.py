@@ -0,0 +1,92 @@
+"""
+Response compression middleware (brotli or gzip).
+"""
+import re
+from typing import Iterator, Optional
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+_accepts_br = re.compile(r'\bbr\b')
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def _brotli_sequence(sequence: Iterator[bytes]) -> Iterator[bytes]:
+    """Compress a streamed response chunk by chunk."""
+    compressor = brotli.Compressor(quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli if the client accepts it, else gzip.
+
+    Responses below RESPONSE_COMPRESSION_MIN_BYTES are sent as they are, as
+    compressing them costs more than it saves. Streamed responses have no
+    known size and are always compressed, chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    @staticmethod
+    def _select_encoding(request) -> Optional[str]:
+        """Pick the encoding to use from the request's Accept-Encoding."""
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and _accepts_br.search(accept_encoding):
+            return 'br'
+        if _accepts_gzip.search(accept_encoding):
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        """Compress the response if it qualifies."""
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+
+        # Caches must key on the encoding even when this client gets none
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = self._select_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(
+                    response.content, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY
+                )
+            else:
+                compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The representation changed, so a strong ETag would be wrong
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
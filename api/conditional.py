@@ -0,0 +1,73 @@
+"""
+HTTP conditional request support for analytics endpoints.
+"""
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from core.utils.cache import get_data_version, get_materialized_version
+
+
+def _scope_campaign(request, scope: str) -> Optional[str]:
+    """Get the campaign a request is scoped to, if any."""
+    if scope == 'campaign':
+        return request.GET.get('campaign_id') or None
+    return None
+
+
+def _version(request, scope: str) -> float:
+    """Get the watermark a request's response depends on."""
+    if scope == 'insights':
+        # Insights are served from the latest materialized snapshot of each window
+        return get_materialized_version('insights')
+    return get_data_version(_scope_campaign(request, scope))
+
+
+def _start_of_today() -> datetime:
+    """Get midnight UTC of the current day."""
+    now = datetime.now(timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def make_etag_func(scope: str = 'campaign'):
+    """
+    Build an ETag function for a view.
+
+    The tag combines the data version watermark, the current day (default
+    windows are relative to today) and the normalized request parameters.
+    """
+    def etag_func(request, *args, **kwargs) -> str:
+        version = _version(request, scope)
+        params = sorted(request.GET.lists())
+        key_data = f"{version}:{_start_of_today().date()}:{request.path}:{params}"
+        return hashlib.md5(key_data.encode()).hexdigest()
+    return etag_func
+
+
+def make_last_modified_func(scope: str = 'campaign'):
+    """Build a Last-Modified function for a view."""
+    def last_modified_func(request, *args, **kwargs) -> datetime:
+        version = _version(request, scope)
+        modified = datetime.fromtimestamp(version, tz=timezone.utc)
+        return max(modified, _start_of_today())
+    return last_modified_func
+
+
+def conditional_on_data_version(scope: str = 'campaign'):
+    """
+    Decorator for APIView methods answering conditional GETs with 304.
+
+    The check runs before the view body, so no service is constructed and
+    ClickHouse is not queried for unchanged data.
+
+    Args:
+        scope: 'campaign' to follow the campaign_id watermark when the
+            parameter is present, 'global' to always use the global one,
+            'insights' to follow materialized insight snapshots
+    """
+    return method_decorator(condition(
+        etag_func=make_etag_func(scope),
+        last_modified_func=make_last_modified_func(scope),
+    ))
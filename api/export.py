@@ -0,0 +1,110 @@
+"""
+Streaming CSV and NDJSON export of analytics rows.
+"""
+import csv
+import json
+from datetime import date
+from typing import Any, Iterable, Iterator, List
+from django.http import StreamingHttpResponse
+from core.domain.money import micros_to_float
+from core.utils.logging import analytics_logger
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+MONEY_COLUMNS = {'cost', 'revenue'}
+
+# Rows rendered per chunk written to the client
+ROWS_PER_CHUNK = 1000
+
+
+class _Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _values(columns: List[str], row: Iterable[Any]) -> List[Any]:
+    """Convert a row for output: dates to ISO strings, micros to currency units."""
+    values = []
+    for column, value in zip(columns, row):
+        if column in MONEY_COLUMNS:
+            value = micros_to_float(int(value or 0))
+        elif isinstance(value, date):
+            value = value.isoformat()
+        values.append(value)
+    return values
+
+
+def _chunked(lines: Iterator[str]) -> Iterator[str]:
+    """Join rendered rows into chunks of ROWS_PER_CHUNK."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def render_csv(columns: List[str], rows: Iterable[Iterable[Any]]) -> Iterator[str]:
+    """Render rows as CSV with a header line, chunk by chunk."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    yield from _chunked(writer.writerow(_values(columns, row)) for row in rows)
+
+
+def render_ndjson(columns: List[str], rows: Iterable[Iterable[Any]]) -> Iterator[str]:
+    """Render rows as one JSON object per line, chunk by chunk."""
+    yield from _chunked(
+        json.dumps(dict(zip(columns, _values(columns, row)))) + '\n' for row in rows
+    )
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def _log_failures(chunks: Iterator[str], filename: str) -> Iterator[str]:
+    """Log a failure after the response started, when the status can no longer change."""
+    try:
+        yield from chunks
+    except Exception as e:
+        analytics_logger.error(f"Export {filename} failed while streaming: {str(e)}")
+        raise
+
+
+def streaming_export(
+    columns: List[str],
+    rows: Iterable[Iterable[Any]],
+    export_format: str,
+    filename: str,
+) -> StreamingHttpResponse:
+    """
+    Stream rows to the client as a file download.
+
+    Rows are rendered as they are read, so memory stays bounded and the
+    first bytes are sent before the whole result exists.
+
+    Args:
+        columns: Column names, in row order
+        rows: Row tuples, money in micros
+        export_format: 'csv' or 'ndjson'
+        filename: Download name without extension
+
+    Returns:
+        Streaming response
+    """
+    filename = f"{filename}.{export_format}"
+    response = StreamingHttpResponse(
+        _log_failures(RENDERERS[export_format](columns, rows), filename),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
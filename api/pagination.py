@@ -0,0 +1,90 @@
+"""
+Keyset (cursor) pagination for API views.
+"""
+import base64
+import json
+from typing import Any, Dict, Optional
+from django.conf import settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Encode a keyset position as an opaque URL-safe token."""
+    data = json.dumps(position, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """
+    Decode a cursor token.
+
+    Raises:
+        InvalidCursor: If the token was not produced by ``encode_cursor``
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position = json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+    if not isinstance(position, dict):
+        raise InvalidCursor(f"Invalid cursor: {token}")
+    return position
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a keyset of the result's sort order.
+
+    Each page is read with a range condition on the sort key after the last
+    row of the previous page instead of an offset, so every page costs one
+    index range scan however deep it is. The body stays the plain list of
+    rows; the next page's cursor is sent in the ``Link`` and
+    ``X-Next-Cursor`` headers and is absent on the last page.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, request, default_page_size: Optional[int] = None):
+        """
+        Args:
+            request: The API request
+            default_page_size: Page size without ``page_size`` (default: PAGE_SIZE)
+        """
+        self.request = request
+        self.default_page_size = default_page_size or settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    @property
+    def page_size(self) -> int:
+        """Requested page size, capped at MAX_PAGE_SIZE."""
+        try:
+            page_size = int(self.request.query_params.get(self.page_size_query_param, self.default_page_size))
+        except ValueError:
+            page_size = self.default_page_size
+        return max(1, min(page_size, settings.MAX_PAGE_SIZE))
+
+    @property
+    def position(self) -> Optional[Dict[str, Any]]:
+        """
+        Keyset position of the requested page, None for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor parameter is malformed
+        """
+        token = self.request.query_params.get(self.cursor_query_param)
+        return decode_cursor(token) if token else None
+
+    def headers(self, next_position: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Build the response headers pointing to the next page, if any."""
+        if next_position is None:
+            return {}
+        token = encode_cursor(next_position)
+        url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+        return {
+            'Link': f'<{url}>; rel="next"',
+            'X-Next-Cursor': token,
+        }
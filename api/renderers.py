@@ -0,0 +1,39 @@
+"""
+Fast JSON rendering for API responses.
+"""
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+# DRF's encoder covers the rest (Decimal, timedelta, lazy strings, querysets)
+_fallback_default = JSONEncoder().default
+
+ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY
+    | orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_UTC_Z
+)
+
+
+class ORJSONRenderer(renderers.BaseRenderer):
+    """
+    JSON renderer backed by orjson.
+
+    Dates, datetimes, UUIDs, dataclasses and NumPy arrays and scalars are
+    serialized natively, Decimal through DRF's encoder (as a number), so
+    views need not convert them first.
+    """
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        """Render data to JSON bytes, indented if the client asked for it."""
+        if data is None:
+            return b''
+
+        options = ORJSON_OPTIONS
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_fallback_default, option=options)
@@ -0,0 +1,128 @@
+"""
+Request throttling and admission control.
+"""
+from typing import Optional
+from django.conf import settings
+from django_redis import get_redis_connection
+from rest_framework.throttling import BaseThrottle
+from core.utils.logging import api_logger
+from core.utils.progress import IngestionProgress
+
+THROTTLE_KEY_PREFIX = 'throttle'
+
+# Refill a bucket for the time since its last request, then take the cost if
+# the bucket holds enough tokens. Runs atomically in Redis, so concurrent
+# requests of one client cannot both spend the same tokens. Uses the Redis
+# clock, so application servers need not agree on the time.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle per user, or per client address when anonymous.
+
+    Each scope has its own bucket in THROTTLE_BUCKETS: ``capacity`` tokens
+    allow a burst, refilled at ``refill_per_second``; a request costs one
+    token. Throttled requests get 429 with ``Retry-After``. Throttling fails
+    open, so a Redis outage does not take the API down with it.
+    """
+
+    scope: Optional[str] = None
+    _script = None
+
+    def __init__(self):
+        self.retry_after: Optional[float] = None
+
+    @staticmethod
+    def _get_script():
+        """Register the token bucket script once per process."""
+        if TokenBucketThrottle._script is None:
+            TokenBucketThrottle._script = get_redis_connection('default').register_script(TOKEN_BUCKET_SCRIPT)
+        return TokenBucketThrottle._script
+
+    def get_cache_key(self, request, view) -> str:
+        """Key of the requesting client's bucket."""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user:{user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{THROTTLE_KEY_PREFIX}:{self.scope}:{ident}'
+
+    def allow_request(self, request, view) -> bool:
+        """Take a token from the client's bucket."""
+        bucket = settings.THROTTLE_BUCKETS[self.scope]
+        try:
+            allowed, wait = self._get_script()(
+                keys=[self.get_cache_key(request, view)],
+                args=[bucket['capacity'], bucket['refill_per_second'], 1],
+            )
+        except Exception as e:
+            api_logger.warning(f"Throttling unavailable, allowing request: {str(e)}")
+            return True
+
+        if int(allowed):
+            return True
+        self.retry_after = float(wait)
+        return False
+
+    def wait(self) -> Optional[float]:
+        """Seconds until the bucket holds a token again."""
+        return self.retry_after
+
+
+class CheapRateThrottle(TokenBucketThrottle):
+    """Budget of cheap endpoints: single lookups and status reads."""
+
+    scope = 'cheap'
+
+
+class ExpensiveRateThrottle(TokenBucketThrottle):
+    """Budget of expensive endpoints: ingestion, scans, exports and insights."""
+
+    scope = 'expensive'
+
+
+def ingestion_backlog_retry_after() -> Optional[int]:
+    """
+    Admission control of ingestion on the backlog of queued tasks.
+
+    Returns:
+        Seconds to wait before retrying if the backlog has reached
+        INGESTION_BACKLOG_MAX_TASKS, else None. Admits when the backlog
+        cannot be read.
+    """
+    try:
+        backlog = IngestionProgress.backlog()
+    except Exception as e:
+        api_logger.warning(f"Ingestion backlog unavailable, admitting request: {str(e)}")
+        return None
+
+    if backlog < settings.INGESTION_BACKLOG_MAX_TASKS:
+        return None
+    api_logger.warning(f"Rejecting ingestion: {backlog} tasks in backlog")
+    return settings.INGESTION_BACKLOG_RETRY_AFTER_SECONDS
@@ -5,8 +5,15 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api.views import (
     DataIngestionView,
+    IngestionStatusView,
     ROIAnalyticsView,
+    ROIBatchAnalyticsView,
     TrendsAnalyticsView,
+    TrendsExportView,
+    MetricsExportView,
+    DashboardView,
+    AnalyticsJobsView,
+    AnalyticsJobView,
     AnomaliesAnalyticsView,
     InsightsSummaryView,
 )
@@ -21,11 +28,18 @@ urlpatterns = [
     
     # Data Ingestion
     path('data/ingest', DataIngestionView.as_view(), name='data-ingest'),
+    path('data/ingest/<str:task_id>', IngestionStatusView.as_view(), name='data-ingest-status'),
     
     # Analytics
     path('analytics/roi', ROIAnalyticsView.as_view(), name='analytics-roi'),
+    path('analytics/roi/batch', ROIBatchAnalyticsView.as_view(), name='analytics-roi-batch'),
     path('analytics/trends', TrendsAnalyticsView.as_view(), name='analytics-trends'),
     path('analytics/anomalies', AnomaliesAnalyticsView.as_view(), name='analytics-anomalies'),
+    path('analytics/export/trends', TrendsExportView.as_view(), name='analytics-export-trends'),
+    path('analytics/dashboard', DashboardView.as_view(), name='analytics-dashboard'),
+    path('analytics/jobs', AnalyticsJobsView.as_view(), name='analytics-jobs'),
+    path('analytics/jobs/<str:job_id>', AnalyticsJobView.as_view(), name='analytics-job'),
+    path('analytics/export/metrics', MetricsExportView.as_view(), name='analytics-export-metrics'),
     
     # Insights
     path('insights/summary', InsightsSummaryView.as_view(), name='insights-summary'),
@@ -6,17 +6,141 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from typing import List, Dict, Any
-from datetime import datetime
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from django.conf import settings
+from django.urls import reverse
 
-from core.services.ingestion_service import IngestionService
-from core.services.analytics_service import AnalyticsService
+from core.container import container
 from core.services.insight_service import InsightService
 from analytics.anomalies import AnomalyDetector
+from analytics.detectors import RollingZScoreDetector, get_detector_strategy
 from ingestion.tasks import ingest_marketing_data
-from ingestion.adapters.csv_adapter import CSVAdapter
-from core.domain.entities import MetricType
+from analytics.tasks import refresh_insight_window, run_query_job, warm_analytics_cache
+from core.domain.entities import InsightSnapshot, MetricType
+from core.domain.money import micros_to_float
+from core.utils.cache import get_data_version
+from core.services.query_job_service import JOB_QUERIES
+from core.utils.logging import api_logger
+from core.utils.progress import IngestionProgress
+from api.conditional import conditional_on_data_version
+from api.export import EXPORT_FORMATS, streaming_export
+from api.fields import Fieldset, InvalidFieldset, requested_precision, round_floats
+from api.pagination import InvalidCursor, KeysetPaginator
+from api.throttling import CheapRateThrottle, ExpensiveRateThrottle, ingestion_backlog_retry_after
+from core.infrastructure.clickhouse_client import ClickHouseClient
+
+
+# Fields of analytics results, money in currency units
+ROI_FIELDS = {
+    'roi': lambda result: float(result.roi) if result.roi else None,
+    'cpc': lambda result: micros_to_float(result.cpc) if result.cpc else None,
+    'cpa': lambda result: micros_to_float(result.cpa) if result.cpa else None,
+    'ctr': lambda result: float(result.ctr) if result.ctr else None,
+    'total_cost': lambda result: micros_to_float(result.total_cost),
+    'total_revenue': lambda result: micros_to_float(result.total_revenue),
+    'total_clicks': lambda result: result.total_clicks,
+    'total_impressions': lambda result: result.total_impressions,
+    'total_conversions': lambda result: result.total_conversions,
+    'campaign_id': lambda result: result.campaign_id,
+    'platform': lambda result: result.platform,
+}
+
+# Fields of daily trend rows; dates are rendered natively, money converted from micros
+TREND_FIELDS = {
+    'date': lambda trend: trend['date'].date() if isinstance(trend['date'], datetime) else trend['date'],
+    'impressions': lambda trend: trend['impressions'],
+    'clicks': lambda trend: trend['clicks'],
+    'cost': lambda trend: micros_to_float(trend['cost']),
+    'conversions': lambda trend: trend['conversions'],
+    'revenue': lambda trend: micros_to_float(trend['revenue']),
+}
+
+# Fields of top campaign rows, money in currency units
+CAMPAIGN_PERFORMANCE_FIELDS = {
+    'campaign_id': lambda campaign: campaign['campaign_id'],
+    'impressions': lambda campaign: campaign['impressions'],
+    'clicks': lambda campaign: campaign['clicks'],
+    'cost': lambda campaign: micros_to_float(campaign['cost']),
+    'conversions': lambda campaign: campaign['conversions'],
+    'revenue': lambda campaign: micros_to_float(campaign['revenue']),
+    'roi': lambda campaign: campaign['roi'],
+    'cpc': lambda campaign: micros_to_float(campaign['cpc']),
+    'cpa': lambda campaign: micros_to_float(campaign['cpa']),
+    'ctr': lambda campaign: campaign['ctr'],
+}
+
+INSIGHT_FIELDS = {
+    'type': lambda insight: insight.type,
+    'title': lambda insight: insight.title,
+    'description': lambda insight: insight.description,
+    'entity_id': lambda insight: insight.entity_id,
+    'entity_type': lambda insight: insight.entity_type,
+    'severity': lambda insight: insight.severity,
+    'metadata': lambda insight: insight.metadata,
+    'created_at': lambda insight: insight.created_at.isoformat() if insight.created_at else None,
+}
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter('fields', str, description='Comma-separated fields to return (default: all)'),
+    OpenApiParameter('precision', int, description='Round floats to this many decimals (0-10)'),
+]
+
+
+def _serialize(getters: Dict[str, Any], obj: Any) -> Dict[str, Any]:
+    """Build the payload of an object from all its fields."""
+    return {field: getter(obj) for field, getter in getters.items()}
+
+
+def _invalid_fieldset(error: InvalidFieldset) -> Response:
+    """Answer a request whose fields or precision cannot be applied."""
+    return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _invalid_cursor() -> Response:
+    """Answer a request whose cursor cannot be used."""
+    return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _positive_int_param(request, name: str, default: int) -> int:
+    """
+    Get a query parameter that must be a positive integer.
+
+    Raises:
+        ValueError: If the parameter is not a positive integer
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ValueError(f'{name} must be a positive integer')
+    return number
+
+
+def _queue_insight_refresh(start_date, end_date, limit: int):
+    """Queue the materialization of a window's snapshot, unless one is already running."""
+    if not InsightService.claim_window(start_date, end_date, limit):
+        return
+    try:
+        refresh_insight_window.delay(start_date.isoformat(), end_date.isoformat(), limit)
+    except Exception as e:
+        InsightService.release_window(start_date, end_date, limit)
+        api_logger.error(f"Could not queue insight refresh of {start_date} to {end_date}: {str(e)}")
+
+
+def _split_list_param(request, name: str) -> List[str]:
+    """Get a list query parameter given comma-separated, repeated, or both."""
+    values = []
+    for value in request.query_params.getlist(name):
+        values.extend(item.strip() for item in value.split(',') if item.strip())
+    return list(dict.fromkeys(values))
 
 
 class DataIngestionView(APIView):
@@ -25,6 +149,7 @@ class DataIngestionView(APIView):
     # Note: In production, use IsAuthenticated
     # For development, you can temporarily remove this or use AllowAny
     permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
 
     @extend_schema(
         summary="Ingest marketing data",
@@ -53,10 +178,24 @@ class DataIngestionView(APIView):
             },
             'text/csv': {'type': 'string'},
         },
-        responses={202: {'description': 'Data ingestion started'}},
+        responses={
+            202: {'description': 'Data ingestion started'},
+            429: {'description': 'Request budget exhausted; see Retry-After'},
+            503: {'description': 'Ingestion backlog full; see Retry-After'},
+        },
     )
     def post(self, request):
         """Ingest marketing data (JSON or CSV)."""
+        # Shed load before parsing while workers are behind
+        retry_after = ingestion_backlog_retry_after()
+        if retry_after is not None:
+            return Response(
+                {'error': 'Ingestion backlog is full, retry later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(retry_after)},
+            )
+
+        started = time.monotonic()
         content_type = request.content_type or ''
         
         # Handle CSV upload
@@ -73,8 +212,7 @@ class DataIngestionView(APIView):
                 )
             
             try:
-                adapter = CSVAdapter()
-                data = adapter.parse(csv_content)
+                data = container.resolve('csv_adapter').parse(csv_content)
             except ValueError as e:
                 return Response(
                     {'error': f'CSV parsing error: {str(e)}'},
@@ -97,23 +235,59 @@ class DataIngestionView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        # Queue async task
-        task = ingest_marketing_data.delay(data)
+        # Register progress before queueing, so the status endpoint knows the
+        # task even if a worker has not picked it up yet
+        task_id = str(uuid4())
+        IngestionProgress(task_id).queue(len(data), parse_ms=(time.monotonic() - started) * 1000)
+
+        # Queue async task, warming the analytics cache once it is done
+        task = ingest_marketing_data.apply_async(
+            (data,),
+            task_id=task_id,
+            link=warm_analytics_cache.si().set(countdown=settings.CACHE_WARM_DELAY_SECONDS),
+        )
 
         return Response(
             {
                 'message': 'Data ingestion started',
                 'task_id': task.id,
                 'records_count': len(data),
+                'status_url': request.build_absolute_uri(
+                    reverse('api:data-ingest-status', args=[task.id])
+                ),
             },
             status=status.HTTP_202_ACCEPTED,
         )
 
 
+class IngestionStatusView(APIView):
+    """View for the progress of an ingestion task."""
+
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [CheapRateThrottle]
+
+    @extend_schema(
+        summary="Get ingestion task status",
+        description="Status, processed/total records, per-stage timings (ms) and error samples "
+                    "of an ingestion task, read from its progress record.",
+        responses={200: {'description': 'Ingestion progress'}, 404: {'description': 'Unknown task'}},
+    )
+    def get(self, request, task_id: str):
+        """Get the progress of an ingestion task."""
+        progress = IngestionProgress.get(task_id)
+        if progress is None:
+            return Response(
+                {'error': f'Unknown or expired ingestion task: {task_id}'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(progress)
+
+
 class ROIAnalyticsView(APIView):
     """View for ROI analytics."""
 
     permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [CheapRateThrottle]
 
     @extend_schema(
         summary="Get ROI analytics",
@@ -123,12 +297,18 @@ class ROIAnalyticsView(APIView):
             OpenApiParameter('platform', str, description='Filter by platform'),
             OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
             OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
+            *FIELDSET_PARAMETERS,
         ],
         responses={200: {'description': 'Analytics results'}},
     )
+    @conditional_on_data_version(scope='campaign')
     def get(self, request):
         """Get ROI analytics."""
-        service = AnalyticsService()
+        try:
+            fieldset = Fieldset(request, ROI_FIELDS)
+        except InvalidFieldset as e:
+            return _invalid_fieldset(e)
+        service = container.resolve('analytics_service')
 
         campaign_id = request.query_params.get('campaign_id')
         platform = request.query_params.get('platform')
@@ -145,25 +325,71 @@ class ROIAnalyticsView(APIView):
             end_date=end,
         )
 
-        return Response({
-            'roi': float(result.roi) if result.roi else None,
-            'cpc': float(result.cpc) if result.cpc else None,
-            'cpa': float(result.cpa) if result.cpa else None,
-            'ctr': float(result.ctr) if result.ctr else None,
-            'total_cost': float(result.total_cost),
-            'total_revenue': float(result.total_revenue),
-            'total_clicks': result.total_clicks,
-            'total_impressions': result.total_impressions,
-            'total_conversions': result.total_conversions,
-            'campaign_id': result.campaign_id,
-            'platform': result.platform,
-        })
+        return Response(fieldset.serialize(result))
+
+
+class ROIBatchAnalyticsView(APIView):
+    """View for ROI analytics of many campaigns."""
+
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
+
+    @extend_schema(
+        summary="Get ROI analytics for many campaigns",
+        description=(
+            "Calculate ROI and related metrics per campaign for a list of campaigns "
+            "or platforms in one window, from a single grouped query."
+        ),
+        parameters=[
+            OpenApiParameter('campaign_ids', str, description='Comma-separated campaign IDs'),
+            OpenApiParameter('platform', str, description='Comma-separated platforms'),
+            OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
+            OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
+            *FIELDSET_PARAMETERS,
+        ],
+        responses={200: {'description': 'Analytics results per campaign'}},
+    )
+    @conditional_on_data_version(scope='global')
+    def get(self, request):
+        """Get ROI analytics per campaign."""
+        try:
+            fieldset = Fieldset(request, ROI_FIELDS)
+        except InvalidFieldset as e:
+            return _invalid_fieldset(e)
+        campaign_ids = _split_list_param(request, 'campaign_ids')
+        platforms = _split_list_param(request, 'platform')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+
+        if not campaign_ids and not platforms:
+            return Response(
+                {'error': 'campaign_ids or platform is required'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(campaign_ids) > settings.ANALYTICS_BATCH_MAX_CAMPAIGNS:
+            return Response(
+                {'error': f'At most {settings.ANALYTICS_BATCH_MAX_CAMPAIGNS} campaign_ids are allowed'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else None
+
+        results = container.resolve('analytics_service').calculate_roi_batch(
+            campaign_ids=campaign_ids or None,
+            platforms=platforms,
+            start_date=start,
+            end_date=end,
+        )
+
+        return Response([fieldset.serialize(result) for result in results.values()])
 
 
 class TrendsAnalyticsView(APIView):
     """View for trends analytics."""
 
     permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
 
     @extend_schema(
         summary="Get trends analytics",
@@ -174,12 +400,21 @@ class TrendsAnalyticsView(APIView):
             OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
             OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
             OpenApiParameter('days', int, description='Number of days (default: 30)'),
+            OpenApiParameter('page_size', int, description='Days per page (default: 50)'),
+            OpenApiParameter('cursor', str, description='Next page cursor from the Link or X-Next-Cursor header'),
+            *FIELDSET_PARAMETERS,
         ],
         responses={200: {'description': 'Trends data'}},
     )
+    @conditional_on_data_version(scope='campaign')
     def get(self, request):
-        """Get trends analytics."""
-        service = AnalyticsService()
+        """Get trends analytics, one page of days at a time."""
+        try:
+            fieldset = Fieldset(request, TREND_FIELDS)
+        except InvalidFieldset as e:
+            return _invalid_fieldset(e)
+        service = container.resolve('analytics_service')
+        paginator = KeysetPaginator(request)
 
         campaign_id = request.query_params.get('campaign_id')
         platform = request.query_params.get('platform')
@@ -187,74 +422,279 @@ class TrendsAnalyticsView(APIView):
         end_date = request.query_params.get('end_date')
         days = int(request.query_params.get('days', 30))
 
-        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
-        end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else None
+        # Whole days, so a window keeps its cache entries for the day
+        end = (
+            datetime.strptime(end_date, '%Y-%m-%d') if end_date
+            else datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        )
+        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else end - timedelta(days=days)
+
+        # Pages are date ranges of the (date, ...) ordered metrics table
+        try:
+            position = paginator.position
+            page_start = (
+                datetime.strptime(position['d'], '%Y-%m-%d') + timedelta(days=1) if position
+                else start
+            )
+        except (InvalidCursor, KeyError, TypeError, ValueError):
+            return _invalid_cursor()
+        page_end = min(end, page_start + timedelta(days=paginator.page_size - 1))
 
         trends = service.get_trends(
             campaign_id=campaign_id,
             platform=platform,
+            start_date=page_start,
+            end_date=page_end,
+        ) if page_start <= end else []
+        next_position = {'d': page_end.strftime('%Y-%m-%d')} if page_end < end else None
+
+        return Response(
+            [fieldset.serialize(trend) for trend in trends],
+            headers=paginator.headers(next_position),
+        )
+
+
+EXPORT_PARAMETERS = [
+    OpenApiParameter('campaign_id', str, description='Filter by campaign ID'),
+    OpenApiParameter('platform', str, description='Filter by platform'),
+    OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
+    OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
+    OpenApiParameter('days', int, description='Number of days when no start date is given (default: 30)'),
+    OpenApiParameter('export_format', str, description='csv (default) or ndjson'),
+]
+
+
+def _export_window(request):
+    """Get the date window of an export request."""
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+    days = int(request.query_params.get('days', 30))
+
+    end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.utcnow()
+    start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else end - timedelta(days=days)
+    return start, end
+
+
+class TrendsExportView(APIView):
+    """View streaming time series exports."""
+
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
+
+    @extend_schema(
+        summary="Export trends",
+        description="Stream daily metrics as CSV or NDJSON, in total or per campaign.",
+        parameters=EXPORT_PARAMETERS + [
+            OpenApiParameter('by_campaign', bool, description='One series per campaign'),
+        ],
+        responses={200: {'description': 'Streamed CSV or NDJSON file'}},
+    )
+    @conditional_on_data_version(scope='campaign')
+    def get(self, request):
+        """Stream trends."""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        by_campaign = request.query_params.get('by_campaign') in ('1', 'true')
+        start, end = _export_window(request)
+
+        rows = container.resolve('clickhouse').stream_time_series_metrics(
             start_date=start,
             end_date=end,
-            days=days,
+            campaign_id=request.query_params.get('campaign_id'),
+            platform=request.query_params.get('platform'),
+            by_campaign=by_campaign,
+        )
+        columns = (
+            ClickHouseClient.TIME_SERIES_BY_CAMPAIGN_EXPORT_COLUMNS if by_campaign
+            else ClickHouseClient.TIME_SERIES_EXPORT_COLUMNS
         )
+        return streaming_export(columns, rows, export_format, f"trends_{start:%Y%m%d}_{end:%Y%m%d}")
 
-        # Convert dates to strings for JSON serialization
-        for trend in trends:
-            if isinstance(trend['date'], datetime):
-                trend['date'] = trend['date'].strftime('%Y-%m-%d')
-            elif hasattr(trend['date'], 'isoformat'):
-                trend['date'] = trend['date'].isoformat()
-            trend['cost'] = float(trend['cost'])
-            trend['revenue'] = float(trend['revenue'])
 
-        return Response(trends)
+class MetricsExportView(APIView):
+    """View streaming raw ad-level metric exports."""
+
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
+
+    @extend_schema(
+        summary="Export metrics",
+        description="Stream stored ad-level metric rows as CSV or NDJSON.",
+        parameters=EXPORT_PARAMETERS,
+        responses={200: {'description': 'Streamed CSV or NDJSON file'}},
+    )
+    @conditional_on_data_version(scope='campaign')
+    def get(self, request):
+        """Stream ad-level metrics."""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"export_format must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end = _export_window(request)
+
+        rows = container.resolve('clickhouse').stream_ad_metrics(
+            start_date=start,
+            end_date=end,
+            campaign_id=request.query_params.get('campaign_id'),
+            platform=request.query_params.get('platform'),
+        )
+        return streaming_export(
+            ClickHouseClient.AD_METRICS_EXPORT_COLUMNS, rows, export_format,
+            f"metrics_{start:%Y%m%d}_{end:%Y%m%d}",
+        )
 
 
 class AnomaliesAnalyticsView(APIView):
     """View for anomaly detection."""
 
     permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
 
     @extend_schema(
         summary="Get anomalies",
-        description="Detect anomalies in metrics using Z-score.",
+        description=(
+            "Get anomalies stored by the scheduled detection job, or detect them "
+            "live for one entity with live=1."
+        ),
         parameters=[
             OpenApiParameter('metric_type', str, description='Metric type (impressions, clicks, cost, etc.)'),
-            OpenApiParameter('entity_id', str, description='Entity ID (campaign, ad, etc.)'),
+            OpenApiParameter('entity_id', str, description='Entity ID (campaign, ad, etc.); required with live=1'),
             OpenApiParameter('entity_type', str, description='Entity type (campaign, ad, adgroup)'),
+            OpenApiParameter('severity', str, description='Filter stored anomalies by severity (low, medium, high)'),
+            OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
+            OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
             OpenApiParameter('lookback_days', int, description='Lookback days (default: 30)'),
+            OpenApiParameter('live', bool, description='Recompute detection instead of reading the store'),
+            OpenApiParameter('precomputed', bool, description='Read scores maintained at ingestion time'),
+            OpenApiParameter('drill_down', bool, description='Live only: also check ad groups and ads of anomalous parents'),
+            OpenApiParameter('method', str, description='Live detector (zscore, rolling, mad, seasonal; default: zscore)'),
+            OpenApiParameter('window', int, description='Rolling window in days, at least 3 (rolling method only, default: 7)'),
+            OpenApiParameter('page_size', int, description='Stored anomalies per page (default: 50)'),
+            OpenApiParameter('cursor', str, description='Next page cursor from the Link or X-Next-Cursor header'),
         ],
         responses={200: {'description': 'Anomalies detected'}},
     )
     def get(self, request):
-        """Get anomalies."""
-        detector = AnomalyDetector()
+        """Get anomalies; stored anomalies are paginated."""
+        paginator = KeysetPaginator(request)
+        next_position = None
+        method = request.query_params.get('method', 'zscore')
+        options = {}
 
-        metric_type_str = request.query_params.get('metric_type', 'impressions')
-        entity_id = request.query_params.get('entity_id')
-        entity_type = request.query_params.get('entity_type', 'campaign')
-        lookback_days = int(request.query_params.get('lookback_days', 30))
+        try:
+            if method == 'rolling' and request.query_params.get('window'):
+                options['window'] = _positive_int_param(request, 'window', 7)
+                if options['window'] < RollingZScoreDetector.MIN_WINDOW:
+                    raise ValueError(f'window must be at least {RollingZScoreDetector.MIN_WINDOW}')
+            lookback_days = _positive_int_param(request, 'lookback_days', 30)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not entity_id:
+        try:
+            strategy = get_detector_strategy(method, **options)
+        except ValueError:
             return Response(
-                {'error': 'entity_id is required'},
+                {'error': f'Invalid method: {method}'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        detector = AnomalyDetector(strategy=strategy, clickhouse=container.resolve('clickhouse'))
+
+        metric_type_str = request.query_params.get('metric_type')
+        entity_id = request.query_params.get('entity_id')
+        entity_type = request.query_params.get('entity_type', 'campaign')
+        live = request.query_params.get('live') in ('1', 'true')
+        precomputed = request.query_params.get('precomputed') in ('1', 'true')
+        drill_down = request.query_params.get('drill_down') in ('1', 'true')
 
         try:
-            metric_type = MetricType(metric_type_str)
+            metric_type = MetricType(metric_type_str) if metric_type_str else None
         except ValueError:
             return Response(
                 {'error': f'Invalid metric_type: {metric_type_str}'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        anomalies = detector.detect_anomalies(
-            metric_type=metric_type,
-            entity_id=entity_id,
-            entity_type=entity_type,
-            lookback_days=lookback_days,
-        )
+        if entity_type not in AnomalyDetector.HIERARCHY:
+            return Response(
+                {'error': f'Invalid entity_type: {entity_type}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if live or precomputed:
+            if not entity_id:
+                return Response(
+                    {'error': 'entity_id is required'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if request.query_params.get(paginator.cursor_query_param):
+                return Response(
+                    {'error': 'Only stored anomalies are paginated'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if drill_down:
+                if entity_type != 'campaign':
+                    return Response(
+                        {'error': 'drill_down starts from a campaign'},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                anomalies = detector.detect_anomalies_hierarchical(
+                    metric_types=[metric_type or MetricType.IMPRESSIONS],
+                    campaign_ids=[entity_id],
+                    lookback_days=lookback_days,
+                )
+            else:
+                anomalies = detector.detect_anomalies(
+                    metric_type=metric_type or MetricType.IMPRESSIONS,
+                    entity_id=entity_id,
+                    entity_type=entity_type,
+                    lookback_days=lookback_days,
+                    precomputed=precomputed,
+                )
+        else:
+            start_date = request.query_params.get('start_date')
+            end_date = request.query_params.get('end_date')
+            start = (
+                datetime.strptime(start_date, '%Y-%m-%d') if start_date
+                else datetime.utcnow() - timedelta(days=lookback_days)
+            )
+            end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else None
+
+            # Keyset on the anomalies table's (date, entity_type, entity_id, metric_type) key
+            try:
+                position = paginator.position
+                after = (
+                    datetime.strptime(position['d'], '%Y-%m-%d').date(),
+                    position['t'], position['e'], position['m'],
+                ) if position else None
+            except (InvalidCursor, KeyError, TypeError, ValueError):
+                return _invalid_cursor()
+
+            anomalies = detector.get_stored_anomalies(
+                metric_types=[metric_type] if metric_type else None,
+                entity_id=entity_id,
+                entity_type=entity_type,
+                severity=request.query_params.get('severity'),
+                start_date=start,
+                end_date=end,
+                limit=paginator.page_size + 1,
+                after=after,
+            )
+            if len(anomalies) > paginator.page_size:
+                anomalies = anomalies[:paginator.page_size]
+                last = anomalies[-1]
+                next_position = {
+                    'd': last.date.strftime('%Y-%m-%d'),
+                    't': last.entity_type,
+                    'e': last.entity_id,
+                    'm': last.metric_type.value,
+                }
 
         return Response([
             {
@@ -269,51 +709,306 @@ class AnomaliesAnalyticsView(APIView):
                 'description': anomaly.description,
             }
             for anomaly in anomalies
-        ])
+        ], headers=paginator.headers(next_position))
 
 
 class InsightsSummaryView(APIView):
     """View for insights summary."""
 
     permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
 
     @extend_schema(
         summary="Get insights summary",
-        description="Get generated marketing insights summary.",
+        description=(
+            "Get the insights of the window's latest snapshot. Outdated snapshots are served "
+            "while a refresh runs in the background (X-Insights-Stale). A window without "
+            "any snapshot answers 202 with Retry-After while it is generated."
+        ),
         parameters=[
             OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
             OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
+            OpenApiParameter('days', int, description='Trailing window in days when no dates are given (default: 30)'),
             OpenApiParameter('limit', int, description='Limit results (default: 10)'),
+            OpenApiParameter('page_size', int, description='Insights per page (default: 50)'),
+            OpenApiParameter('cursor', str, description='Next page cursor from the Link or X-Next-Cursor header'),
+            *FIELDSET_PARAMETERS,
         ],
-        responses={200: {'description': 'Insights summary'}},
+        responses={200: {'description': 'Insights summary'}, 202: {'description': 'Snapshot being generated'}},
     )
+    @conditional_on_data_version(scope='insights')
     def get(self, request):
-        """Get insights summary."""
-        service = InsightService()
+        """Get insights summary, paginated within one snapshot."""
+        try:
+            fieldset = Fieldset(request, INSIGHT_FIELDS)
+        except InvalidFieldset as e:
+            return _invalid_fieldset(e)
+        paginator = KeysetPaginator(request)
+        try:
+            position = paginator.position
+            after = (datetime.fromisoformat(position['c']), int(position['i'])) if position else None
+        except (InvalidCursor, KeyError, TypeError, ValueError):
+            return _invalid_cursor()
+
+        stale = False
+        if position:
+            # Later pages stay on the snapshot of the first page
+            snapshot = InsightService.get_snapshot(position.get('s'))
+            if snapshot is None:
+                return _invalid_cursor()
+        else:
+            snapshot, stale = self._get_snapshot(request)
+            if snapshot is None:
+                return Response(
+                    {'status': 'generating'},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={'Retry-After': str(settings.INSIGHT_MATERIALIZE_RETRY_AFTER_SECONDS)},
+                )
 
+        insights = InsightService.get_snapshot_insights(snapshot.id, paginator.page_size + 1, after=after)
+        next_position = None
+        if len(insights) > paginator.page_size:
+            insights = insights[:paginator.page_size]
+            last = insights[-1]
+            next_position = {'s': snapshot.id, 'c': last.created_at.isoformat(), 'i': int(last.id)}
+
+        headers = {**self._snapshot_headers(snapshot), **paginator.headers(next_position)}
+        if stale:
+            headers['X-Insights-Stale'] = '1'
+        return Response([fieldset.serialize(insight) for insight in insights], headers=headers)
+
+    @staticmethod
+    def _get_snapshot(request) -> Tuple[Optional[InsightSnapshot], bool]:
+        """
+        Get the latest snapshot of the requested window and whether it is stale.
+
+        A stale snapshot is served while a refresh is queued. A missing one is
+        materialized by one request per window; the others get None.
+        """
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+        days = int(request.query_params.get('days', 30))
         limit = int(request.query_params.get('limit', 10))
 
-        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
-        end = datetime.strptime(end_date, '%Y-%m-%d') if end_date else None
+        if start_date or end_date:
+            end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else datetime.utcnow().date()
+            start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else end - timedelta(days=30)
+            # Explicit windows are refreshed on demand once data arrived after their snapshot
+            updated_after = datetime.fromtimestamp(get_data_version(), tz=timezone.utc)
+        else:
+            # Trailing windows are kept up to date by the scheduled refresh
+            start, end = InsightService.trailing_window(days)
+            updated_after = None
+
+        InsightService.track_window(start, end, limit)
+        snapshot = InsightService.get_latest_snapshot(start, end, limit, with_insights=False)
+        if snapshot is None:
+            if not InsightService.claim_window(start, end, limit):
+                return None, False
+            try:
+                return container.resolve('insight_service').materialize_snapshot(start, end, limit), False
+            finally:
+                InsightService.release_window(start, end, limit)
+
+        stale = bool(snapshot.metadata.get('degraded')) or (
+            updated_after is not None and snapshot.created_at < updated_after
+        )
+        if stale:
+            _queue_insight_refresh(start, end, limit)
+        return snapshot, stale
+
+    @staticmethod
+    def _snapshot_headers(snapshot) -> Dict[str, str]:
+        """Describe the served snapshot and its stage timings in response headers."""
+        stages = snapshot.metadata.get('stages', {})
+        headers = {'X-Insights-Snapshot': snapshot.id}
+        if stages:
+            headers['Server-Timing'] = ', '.join(
+                f'{name};dur={stage["duration_ms"]};desc="{stage["status"]}"'
+                for name, stage in stages.items()
+            )
+        degraded = [name for name, stage in stages.items() if stage['status'] != 'ok']
+        if degraded:
+            headers['X-Insights-Degraded'] = ','.join(degraded)
+        return headers
+
+
+class DashboardView(APIView):
+    """View for the dashboard: ROI, trends, top campaigns and insights in one document."""
+
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
+
+    # Serialization of each section's items
+    SECTION_FIELDS = {
+        'roi': ROI_FIELDS,
+        'trends': TREND_FIELDS,
+        'top_campaigns': CAMPAIGN_PERFORMANCE_FIELDS,
+        'insights': INSIGHT_FIELDS,
+    }
+
+    @extend_schema(
+        summary="Get dashboard",
+        description=(
+            "ROI, daily trends, top campaigns and latest insights of one window, computed "
+            "concurrently. ROI and trends follow the campaign and platform filters; top "
+            "campaigns and insights cover the account. Insights come from stored snapshots. "
+            "Sections that fail, time out or have no snapshot yet are null, with their "
+            "status in timing."
+        ),
+        parameters=[
+            OpenApiParameter('campaign_id', str, description='Filter ROI and trends by campaign ID'),
+            OpenApiParameter('platform', str, description='Filter ROI and trends by platform'),
+            OpenApiParameter('start_date', str, description='Start date (YYYY-MM-DD)'),
+            OpenApiParameter('end_date', str, description='End date (YYYY-MM-DD)'),
+            OpenApiParameter('days', int, description='Number of days when no start date is given (default: 30)'),
+            OpenApiParameter('limit', int, description='Top campaigns and insights limit (default: 10)'),
+            FIELDSET_PARAMETERS[1],
+        ],
+        responses={200: {'description': 'Dashboard sections with per-section timing'}},
+    )
+    def get(self, request):
+        """Get the dashboard."""
+        try:
+            precision = requested_precision(request)
+        except InvalidFieldset as e:
+            return _invalid_fieldset(e)
+
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        days = int(request.query_params.get('days', 30))
+        limit = int(request.query_params.get('limit', 10))
 
-        insights = service.generate_summary(
+        # Whole days, so sections share cache entries and insight snapshots
+        # with the other endpoints
+        end = (
+            datetime.strptime(end_date, '%Y-%m-%d') if end_date
+            else datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        )
+        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else end - timedelta(days=days)
+        InsightService.track_window(start.date(), end.date(), limit)
+
+        results = container.resolve('dashboard_service').build(
             start_date=start,
             end_date=end,
+            campaign_id=request.query_params.get('campaign_id'),
+            platform=request.query_params.get('platform'),
             limit=limit,
         )
+        if not results['insights'].ok:
+            # Snapshots are materialized by a worker, never on the stage pool
+            _queue_insight_refresh(start.date(), end.date(), limit)
+
+        sections = {}
+        for name, result in results.items():
+            if not result.ok:
+                sections[name] = None
+            elif name == 'roi':
+                sections[name] = _serialize(ROI_FIELDS, result.value)
+            else:
+                sections[name] = [_serialize(self.SECTION_FIELDS[name], item) for item in result.value]
+
+        degraded = [name for name, result in results.items() if not result.ok]
+        headers = {
+            'Server-Timing': ', '.join(
+                f'{name};dur={result.duration_ms:.1f};desc="{result.status}"'
+                for name, result in results.items()
+            ),
+        }
+        if degraded:
+            headers['X-Dashboard-Degraded'] = ','.join(degraded)
+
+        return Response(round_floats({
+            'start_date': start.date(),
+            'end_date': end.date(),
+            'sections': sections,
+            'timing': {name: result.to_dict() for name, result in results.items()},
+            'degraded': bool(degraded),
+        }, precision), headers=headers)
+
+
+class AnalyticsJobsView(APIView):
+    """View submitting long-running analytics queries as jobs."""
 
-        return Response([
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [ExpensiveRateThrottle]
+
+    @extend_schema(
+        summary="Submit analytics query job",
+        description=(
+            "Run a long query (multi-year trends, or a breakdown per campaign, ad group or "
+            "ad) in the background. Identical submissions while a job is queued or running "
+            "return that job. Poll the status URL for the result."
+        ),
+        request={
+            'application/json': {
+                'type': 'object',
+                'properties': {
+                    'query': {'type': 'string', 'enum': list(JOB_QUERIES)},
+                    'entity_type': {'type': 'string', 'enum': list(ClickHouseClient.ENTITY_COLUMNS)},
+                    'campaign_id': {'type': 'string'},
+                    'platform': {'type': 'string'},
+                    'start_date': {'type': 'string', 'format': 'date'},
+                    'end_date': {'type': 'string', 'format': 'date'},
+                },
+                'required': ['query'],
+            },
+        },
+        responses={202: {'description': 'Job queued or joined'}},
+    )
+    def post(self, request):
+        """Submit an analytics query job."""
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Job must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+
+        service = container.resolve('query_job_service')
+        try:
+            job, created = service.submit(request.data.get('query'), request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if created:
+            try:
+                run_query_job.apply_async((job['job_id'],), queue=settings.ANALYTICS_JOB_QUEUE)
+            except Exception as e:
+                service.fail(job, f"Could not queue job: {str(e)}")
+                raise
+
+        return Response(
             {
-                'type': insight.type,
-                'title': insight.title,
-                'description': insight.description,
-                'entity_id': insight.entity_id,
-                'entity_type': insight.entity_type,
-                'severity': insight.severity,
-                'metadata': insight.metadata,
-                'created_at': insight.created_at.isoformat() if insight.created_at else None,
-            }
-            for insight in insights
-        ])
+                'job_id': job['job_id'],
+                'status': job['status'],
+                'deduplicated': not created,
+                'status_url': request.build_absolute_uri(
+                    reverse('api:analytics-job', args=[job['job_id']])
+                ),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class AnalyticsJobView(APIView):
+    """View for the status and result of an analytics query job."""
+
+    permission_classes = []  # Change to [IsAuthenticated] in production
+    throttle_classes = [CheapRateThrottle]
+
+    @extend_schema(
+        summary="Get analytics query job",
+        description="Status of a query job, with its rows once it has succeeded.",
+        responses={200: {'description': 'Job status and result'}, 404: {'description': 'Unknown job'}},
+    )
+    def get(self, request, job_id: str):
+        """Get an analytics query job."""
+        service = container.resolve('query_job_service')
+        job = service.get(job_id)
+        if job is None:
+            return Response(
+                {'error': f'Unknown or expired job: {job_id}'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        payload = {key: value for key, value in job.items() if key != 'fingerprint'}
+        if job['status'] == 'succeeded':
+            payload['result'] = service.get_result(job_id)
+        return Response(payload)
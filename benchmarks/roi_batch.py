@@ -0,0 +1,58 @@
+"""
+Benchmark batch metric computation against the scalar loop.
+
+Usage:
+    python -m benchmarks.roi_batch [entities]
+"""
+import sys
+import timeit
+import numpy as np
+from analytics.roi import (
+    calculate_roi,
+    calculate_cpc,
+    calculate_cpa,
+    calculate_ctr,
+    calculate_all_metrics_batch,
+)
+
+
+def _make_data(size: int):
+    """Generate random campaign totals, money in micros."""
+    rng = np.random.default_rng(42)
+    cost = rng.integers(0, 5000, size) * 1_000_000
+    revenue = rng.integers(0, 10000, size) * 1_000_000
+    impressions = rng.integers(0, 1_000_000, size)
+    clicks = rng.integers(0, 10_000, size)
+    conversions = rng.integers(0, 500, size)
+    return cost, revenue, clicks, impressions, conversions
+
+
+def scalar_loop(cost, revenue, clicks, impressions, conversions):
+    """Compute metrics one entity at a time."""
+    results = []
+    for i in range(len(cost)):
+        entity_cost = int(cost[i])
+        entity_revenue = int(revenue[i])
+        results.append((
+            calculate_roi(entity_cost, entity_revenue),
+            calculate_cpc(entity_cost, int(clicks[i])),
+            calculate_cpa(entity_cost, int(conversions[i])),
+            calculate_ctr(int(clicks[i]), int(impressions[i])),
+        ))
+    return results
+
+
+def main(size: int = 10_000, repeat: int = 5):
+    """Run the benchmark and print timings."""
+    data = _make_data(size)
+    scalar = min(timeit.repeat(lambda: scalar_loop(*data), number=1, repeat=repeat))
+    batch = min(timeit.repeat(lambda: calculate_all_metrics_batch(*data), number=1, repeat=repeat))
+
+    print(f"Entities:     {size}")
+    print(f"Scalar loop:  {scalar * 1000:.2f} ms")
+    print(f"Batch:        {batch * 1000:.2f} ms")
+    print(f"Speedup:      {scalar / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
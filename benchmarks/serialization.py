@@ -0,0 +1,95 @@
+"""
+Benchmark trend response serialization and compression.
+
+Compares the former trends path (convert every value in a Python loop, then
+render with DRF's JSONRenderer) with ORJSONRenderer rendering dates natively,
+and reports payload bytes uncompressed, gzipped and brotli-compressed.
+
+Usage:
+    python -m benchmarks.serialization [days] [campaigns]
+"""
+import os
+import sys
+import timeit
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'insightflow.settings')
+django.setup()
+
+from django.utils.text import compress_string  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from api.compression import brotli  # noqa: E402
+from api.renderers import ORJSONRenderer  # noqa: E402
+from core.domain.money import micros_to_float  # noqa: E402
+
+
+def _make_trends(days: int, campaigns: int):
+    """Generate daily trend rows per campaign as ClickHouse returns them, money in micros."""
+    start = date(2024, 1, 1)
+    return [
+        {
+            'date': start + timedelta(days=day),
+            'campaign_id': f'camp_{campaign}',
+            'impressions': 10_000 + day * 7 + campaign,
+            'clicks': 300 + day % 50,
+            'cost': (150 + campaign % 100) * 1_000_000 + day * 10_000,
+            'conversions': 12 + campaign % 9,
+            'revenue': (420 + day % 300) * 1_000_000 + campaign * 10_000,
+        }
+        for campaign in range(campaigns)
+        for day in range(days)
+    ]
+
+
+def loop_and_drf(trends):
+    """Render as TrendsAnalyticsView used to: convert every value in place, then DRF's encoder."""
+    trends = [dict(trend) for trend in trends]
+    for trend in trends:
+        trend['date'] = trend['date'].isoformat()
+        trend['cost'] = micros_to_float(trend['cost'])
+        trend['revenue'] = micros_to_float(trend['revenue'])
+    return JSONRenderer().render(trends)
+
+
+def orjson_renderer(trends):
+    """Render as TrendsAnalyticsView does now: convert money only, dates natively."""
+    return ORJSONRenderer().render([
+        {
+            **trend,
+            'cost': micros_to_float(trend['cost']),
+            'revenue': micros_to_float(trend['revenue']),
+        }
+        for trend in trends
+    ])
+
+
+def main(days: int = 365, campaigns: int = 500, repeat: int = 3):
+    """Run the benchmark and print timings and sizes."""
+    trends = _make_trends(days, campaigns)
+    baseline = min(timeit.repeat(lambda: loop_and_drf(trends), number=1, repeat=repeat))
+    fast = min(timeit.repeat(lambda: orjson_renderer(trends), number=1, repeat=repeat))
+
+    payload = orjson_renderer(trends)
+    gzip_time = min(timeit.repeat(lambda: compress_string(payload), number=1, repeat=repeat))
+
+    print(f"Rows:               {len(trends)} ({days} days x {campaigns} campaigns)")
+    print(f"Loop + JSONRenderer: {baseline * 1000:.1f} ms, {len(loop_and_drf(trends))} bytes")
+    print(f"ORJSONRenderer:     {fast * 1000:.1f} ms, {len(payload)} bytes")
+    print(f"Speedup:            {baseline / fast:.1f}x")
+    print(f"gzip:               {gzip_time * 1000:.1f} ms, {len(compress_string(payload))} bytes")
+    if brotli is not None:
+        quality = 5
+        brotli_time = min(timeit.repeat(
+            lambda: brotli.compress(payload, quality=quality), number=1, repeat=repeat
+        ))
+        print(f"brotli (q{quality}):        {brotli_time * 1000:.1f} ms, "
+              f"{len(brotli.compress(payload, quality=quality))} bytes")
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 365,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+    )
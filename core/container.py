@@ -0,0 +1,120 @@
+"""
+Service container - process-wide instances of stateless services and clients.
+
+Services and clients are built once per process, on first use or by
+``warm()`` at server start, instead of per request: building them opens
+ClickHouse connections and checks its tables. Tests replace services for
+the current context with ``override()``.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, Mapping, Optional
+from django.conf import settings
+from analytics.anomalies import AnomalyDetector
+from analytics.budget import BudgetPacer
+from core.infrastructure.clickhouse_client import ClickHouseClient
+from core.services.analytics_service import AnalyticsService
+from core.services.dashboard_service import DashboardService
+from core.services.insight_service import InsightService
+from core.services.query_job_service import QueryJobService
+from core.utils.logging import logger
+from ingestion.adapters.csv_adapter import CSVAdapter
+
+
+class ServiceContainer:
+    """Registry of lazily built process-level singletons with context-local overrides."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._overrides: ContextVar[Mapping[str, Any]] = ContextVar('service_overrides', default={})
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        Register how to build a service.
+
+        Args:
+            name: Service name
+            factory: Callable without arguments building the service; it may
+                resolve the services it depends on
+        """
+        self._factories[name] = factory
+
+    def resolve(self, name: str) -> Any:
+        """
+        Get a service: its override in the current context, else the process instance.
+
+        Raises:
+            KeyError: If no service is registered under ``name``
+        """
+        overrides = self._overrides.get()
+        if name in overrides:
+            return overrides[name]
+
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._factories[name]()
+                    self._instances[name] = instance
+        return instance
+
+    @contextmanager
+    def override(self, **services: Any) -> Iterator[None]:
+        """Replace services within the current context (request, test or thread)."""
+        token = self._overrides.set({**self._overrides.get(), **services})
+        try:
+            yield
+        finally:
+            self._overrides.reset(token)
+
+    def warm(self, names: Optional[Iterable[str]] = None):
+        """
+        Build services ahead of requests.
+
+        Stops at the first failure, as later services mostly share the failed
+        dependency; whatever is left is built on first use.
+        """
+        for name in names or list(self._factories):
+            try:
+                self.resolve(name)
+            except Exception as e:
+                logger.warning(f"Could not initialize service {name}: {str(e)}")
+                return
+
+    def reset(self):
+        """Drop all process instances, e.g. after settings change."""
+        with self._lock:
+            self._instances.clear()
+
+
+container = ServiceContainer()
+
+# Application services, each built from the shared ClickHouse client
+container.register('clickhouse', ClickHouseClient)
+container.register('analytics_service', lambda: AnalyticsService(
+    clickhouse=container.resolve('clickhouse'),
+))
+container.register('anomaly_detector', lambda: AnomalyDetector(
+    clickhouse=container.resolve('clickhouse'),
+))
+container.register('budget_pacer', lambda: BudgetPacer(
+    curve=settings.BUDGET_PACING_CURVE,
+    tolerance=settings.BUDGET_PACING_TOLERANCE,
+    recent_days=settings.BUDGET_PACING_RECENT_DAYS,
+    weekday_weights=settings.BUDGET_PACING_WEEKDAY_WEIGHTS,
+    clickhouse=container.resolve('clickhouse'),
+))
+container.register('insight_service', lambda: InsightService(
+    analytics_service=container.resolve('analytics_service'),
+    anomaly_detector=container.resolve('anomaly_detector'),
+    budget_pacer=container.resolve('budget_pacer'),
+))
+container.register('dashboard_service', lambda: DashboardService(
+    analytics_service=container.resolve('analytics_service'),
+))
+container.register('query_job_service', QueryJobService)
+container.register('csv_adapter', CSVAdapter)
@@ -1,8 +1,8 @@
 """
 Domain entities - Pure business logic with no framework dependencies.
 """
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional, List
 from enum import Enum
@@ -17,6 +17,10 @@ class MetricType(str, Enum):
     REVENUE = "revenue"
 
 
+# Metric types carried as integer micros (see core.domain.money)
+MONEY_METRIC_TYPES = frozenset({MetricType.COST, MetricType.REVENUE})
+
+
 @dataclass
 class Campaign:
     """Campaign domain entity."""
@@ -74,7 +78,7 @@ class Metric:
     ad_id: Optional[str] = None
     date: datetime = None
     metric_type: MetricType = MetricType.IMPRESSIONS
-    value: Decimal = Decimal('0')
+    value: int = 0  # Count, or micros for money metric types
     platform: str = ""
     created_at: Optional[datetime] = None
 
@@ -103,15 +107,30 @@ class Insight:
             self.metadata = {}
 
 
+@dataclass
+class InsightSnapshot:
+    """Insights materialized for one window at one point in time."""
+    id: Optional[str] = None
+    start_date: date = None
+    end_date: date = None
+    limit: int = 10
+    insights: List[Insight] = field(default_factory=list)
+    metadata: dict = field(default_factory=dict)
+    created_at: Optional[datetime] = None
+
+
 @dataclass
 class AnalyticsResult:
-    """Analytics computation result."""
-    roi: Optional[Decimal] = None
-    cpc: Optional[Decimal] = None  # Cost Per Click
-    cpa: Optional[Decimal] = None  # Cost Per Acquisition
-    ctr: Optional[Decimal] = None  # Click-Through Rate
-    total_cost: Decimal = Decimal('0')
-    total_revenue: Decimal = Decimal('0')
+    """Analytics computation result.
+
+    Money amounts (total cost and revenue, CPC, CPA) are in micros.
+    """
+    roi: Optional[float] = None
+    cpc: Optional[float] = None  # Cost Per Click
+    cpa: Optional[float] = None  # Cost Per Acquisition
+    ctr: Optional[float] = None  # Click-Through Rate
+    total_cost: int = 0
+    total_revenue: int = 0
     total_clicks: int = 0
     total_impressions: int = 0
     total_conversions: int = 0
@@ -120,29 +139,29 @@ class AnalyticsResult:
     campaign_id: Optional[str] = None
     platform: Optional[str] = None
 
-    def calculate_roi(self) -> Decimal:
+    def calculate_roi(self) -> float:
         """Calculate ROI: (Revenue - Cost) / Cost * 100."""
         if self.total_cost == 0:
-            return Decimal('0')
-        return ((self.total_revenue - self.total_cost) / self.total_cost) * 100
+            return 0.0
+        return (self.total_revenue - self.total_cost) * 100 / self.total_cost
 
-    def calculate_cpc(self) -> Decimal:
+    def calculate_cpc(self) -> float:
         """Calculate CPC: Cost / Clicks."""
         if self.total_clicks == 0:
-            return Decimal('0')
+            return 0.0
         return self.total_cost / self.total_clicks
 
-    def calculate_cpa(self) -> Decimal:
+    def calculate_cpa(self) -> float:
         """Calculate CPA: Cost / Conversions."""
         if self.total_conversions == 0:
-            return Decimal('0')
+            return 0.0
         return self.total_cost / self.total_conversions
 
-    def calculate_ctr(self) -> Decimal:
+    def calculate_ctr(self) -> float:
         """Calculate CTR: (Clicks / Impressions) * 100."""
         if self.total_impressions == 0:
-            return Decimal('0')
-        return (Decimal(self.total_clicks) / Decimal(self.total_impressions)) * 100
+            return 0.0
+        return self.total_clicks * 100 / self.total_impressions
 
 
 @dataclass
@@ -0,0 +1,42 @@
+"""
+Fixed-point money representation.
+
+Money is carried as integer micros (millionths of the currency unit) from
+ingestion through ClickHouse, aggregation and metric formulas, so sums are
+exact and arithmetic stays on machine integers. Amounts are converted to
+Decimal or float only at the API boundary.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Union
+
+MICROS_PER_UNIT = 1_000_000
+
+# Integer amount of micros of the currency unit
+Micros = int
+
+
+def to_micros(amount: Union[int, float, str, Decimal, None]) -> Micros:
+    """
+    Convert a currency amount to integer micros.
+
+    Floats are converted through their shortest repr, so 25.5 becomes
+    exactly 25_500_000. Sub-micro fractions are rounded half to even.
+    """
+    if amount is None:
+        return 0
+    if isinstance(amount, int):
+        return amount * MICROS_PER_UNIT
+    if isinstance(amount, float):
+        amount = repr(amount)
+    value = Decimal(amount) * MICROS_PER_UNIT
+    return int(value.to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_micros(micros: Micros) -> Decimal:
+    """Convert integer micros to an exact Decimal amount."""
+    return Decimal(micros) / MICROS_PER_UNIT
+
+
+def micros_to_float(micros: Union[Micros, float]) -> float:
+    """Convert micros (or fractional micros, e.g. CPC) to a float amount."""
+    return micros / MICROS_PER_UNIT
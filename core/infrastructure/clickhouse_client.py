@@ -1,17 +1,49 @@
 """
 ClickHouse client for analytics data storage.
+
+Money columns are stored and returned as integer micros (see
+core.domain.money).
 """
 import os
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import hashlib
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from datetime import date, datetime
 from decimal import Decimal
 import clickhouse_connect
+from clickhouse_connect import common as clickhouse_common
 from django.conf import settings
+from core.domain.money import MICROS_PER_UNIT
+
+# Without per-client sessions a client can run queries from several threads
+clickhouse_common.set_setting('autogenerate_session_id', False)
+
+CENTS = Decimal('0.01')
 
 
 class ClickHouseClient:
     """ClickHouse client for analytics operations."""
 
+    # metrics_analytics column identifying each entity type
+    ENTITY_COLUMNS = {
+        'campaign': 'campaign_id',
+        'adgroup': 'ad_group_id',
+        'ad': 'ad_id',
+    }
+
+    # Parent in the campaign > ad group > ad hierarchy of each entity type
+    ENTITY_PARENTS = {
+        'adgroup': 'campaign',
+        'ad': 'adgroup',
+    }
+
+    # Columns of streamed exports, in row order
+    TIME_SERIES_EXPORT_COLUMNS = ['date', 'impressions', 'clicks', 'cost', 'conversions', 'revenue']
+    TIME_SERIES_BY_CAMPAIGN_EXPORT_COLUMNS = ['date', 'campaign_id'] + TIME_SERIES_EXPORT_COLUMNS[1:]
+    AD_METRICS_EXPORT_COLUMNS = [
+        'date', 'campaign_id', 'platform', 'ad_group_id', 'ad_id',
+        'impressions', 'clicks', 'cost', 'conversions', 'revenue',
+    ]
+
     def __init__(self):
         """Initialize ClickHouse client."""
         # ClickHouse default user doesn't require password if empty
@@ -37,16 +69,19 @@ class ClickHouseClient:
                 platform String,
                 impressions UInt64,
                 clicks UInt64,
-                cost Decimal(15, 2),
+                cost_micros Int64,
                 conversions UInt32,
-                revenue Decimal(15, 2),
+                revenue_micros Int64,
                 created_at DateTime DEFAULT now()
             ) ENGINE = MergeTree()
             ORDER BY (date, campaign_id, platform)
             PARTITION BY toYYYYMM(date)
         """)
+        self._migrate_money_columns()
 
-        # Anomalies table
+        # Anomalies table, one row per (day, entity, metric); re-detection
+        # replaces rows by version and stale anomalies are tombstoned
+        self._migrate_anomalies_table()
         self.client.command("""
             CREATE TABLE IF NOT EXISTS anomalies (
                 id String,
@@ -59,14 +94,40 @@ class ClickHouseClient:
                 z_score Decimal(10, 4),
                 severity String,
                 description String,
-                created_at DateTime DEFAULT now()
-            ) ENGINE = MergeTree()
-            ORDER BY (date, entity_id, metric_type)
+                is_active UInt8 DEFAULT 1,
+                created_at DateTime64(3) DEFAULT now64(3)
+            ) ENGINE = ReplacingMergeTree(created_at)
+            ORDER BY (date, entity_type, entity_id, metric_type)
             PARTITION BY toYYYYMM(date)
         """)
 
+    def _migrate_money_columns(self):
+        """Add integer micros columns to tables created with Decimal money."""
+        result = self.client.query("""
+            SELECT name FROM system.columns
+            WHERE database = currentDatabase() AND table = 'metrics_analytics'
+        """)
+        columns = {row[0] for row in result.result_rows}
+        for column in ('cost', 'revenue'):
+            if f'{column}_micros' not in columns:
+                # Existing parts compute the column from the legacy Decimal(15, 2)
+                self.client.command(f"""
+                    ALTER TABLE metrics_analytics
+                    ADD COLUMN {column}_micros Int64
+                    DEFAULT toInt64({column} * 100) * {MICROS_PER_UNIT // 100}
+                """)
+
+    def _migrate_anomalies_table(self):
+        """Move aside an anomalies table created with the plain MergeTree layout."""
+        result = self.client.query("""
+            SELECT engine FROM system.tables
+            WHERE database = currentDatabase() AND name = 'anomalies'
+        """)
+        if result.result_rows and result.result_rows[0][0] != 'ReplacingMergeTree':
+            self.client.command("RENAME TABLE anomalies TO anomalies_legacy")
+
     def insert_metrics(self, metrics: List[Dict[str, Any]]):
-        """Insert metrics into ClickHouse."""
+        """Insert metrics into ClickHouse, money as integer micros."""
         if not metrics:
             return
 
@@ -75,7 +136,7 @@ class ClickHouseClient:
             metrics,
             column_names=[
                 'campaign_id', 'ad_group_id', 'ad_id', 'date', 'platform',
-                'impressions', 'clicks', 'cost', 'conversions', 'revenue'
+                'impressions', 'clicks', 'cost_micros', 'conversions', 'revenue_micros'
             ]
         )
 
@@ -112,9 +173,9 @@ class ClickHouseClient:
             SELECT
                 sum(impressions) as total_impressions,
                 sum(clicks) as total_clicks,
-                sum(cost) as total_cost,
+                sum(cost_micros) as total_cost,
                 sum(conversions) as total_conversions,
-                sum(revenue) as total_revenue
+                sum(revenue_micros) as total_revenue
             FROM metrics_analytics
             WHERE {where_clause}
         """
@@ -125,16 +186,82 @@ class ClickHouseClient:
             return {
                 'total_impressions': int(row[0]) if row[0] else 0,
                 'total_clicks': int(row[1]) if row[1] else 0,
-                'total_cost': Decimal(str(row[2])) if row[2] else Decimal('0'),
+                'total_cost': int(row[2]) if row[2] else 0,
                 'total_conversions': int(row[3]) if row[3] else 0,
-                'total_revenue': Decimal(str(row[4])) if row[4] else Decimal('0'),
+                'total_revenue': int(row[4]) if row[4] else 0,
             }
         return {
             'total_impressions': 0,
             'total_clicks': 0,
-            'total_cost': Decimal('0'),
+            'total_cost': 0,
             'total_conversions': 0,
-            'total_revenue': Decimal('0'),
+            'total_revenue': 0,
+        }
+
+    def get_aggregated_metrics_by_campaign(
+        self,
+        campaign_ids: Optional[List[str]] = None,
+        platforms: Optional[List[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Get aggregated metrics of many campaigns in one grouped query.
+
+        Args:
+            campaign_ids: Campaigns to include (default: all)
+            platforms: Platforms to include (default: all)
+            start_date: First day
+            end_date: Last day
+
+        Returns:
+            Totals as returned by ``get_aggregated_metrics`` by campaign ID;
+            campaigns without data are left out
+        """
+        conditions = []
+        params = {}
+
+        if campaign_ids is not None:
+            conditions.append("campaign_id IN {campaign_ids:Array(String)}")
+            params['campaign_ids'] = list(campaign_ids)
+
+        if platforms:
+            conditions.append("platform IN {platforms:Array(String)}")
+            params['platforms'] = list(platforms)
+
+        if start_date:
+            conditions.append("date >= {start_date:Date}")
+            params['start_date'] = start_date.date()
+
+        if end_date:
+            conditions.append("date <= {end_date:Date}")
+            params['end_date'] = end_date.date()
+
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+
+        query = f"""
+            SELECT
+                campaign_id,
+                sum(impressions) as total_impressions,
+                sum(clicks) as total_clicks,
+                sum(cost_micros) as total_cost,
+                sum(conversions) as total_conversions,
+                sum(revenue_micros) as total_revenue
+            FROM metrics_analytics
+            WHERE {where_clause}
+            GROUP BY campaign_id
+        """
+
+        result = self.client.query(query, parameters=params)
+        return {
+            row[0]: {
+                'total_impressions': int(row[1]) if row[1] else 0,
+                'total_clicks': int(row[2]) if row[2] else 0,
+                'total_cost': int(row[3]) if row[3] else 0,
+                'total_conversions': int(row[4]) if row[4] else 0,
+                'total_revenue': int(row[5]) if row[5] else 0,
+            }
+            for row in result.result_rows
         }
 
     def get_time_series_metrics(
@@ -143,8 +270,11 @@ class ClickHouseClient:
         platform: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
+        ad_group_id: Optional[str] = None,
+        ad_id: Optional[str] = None,
+        query_id: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
-        """Get time series metrics grouped by date."""
+        """Get time series metrics grouped by date; ``query_id`` tags the ClickHouse query."""
         conditions = []
         params = {}
 
@@ -152,6 +282,14 @@ class ClickHouseClient:
             conditions.append("campaign_id = {campaign_id:String}")
             params['campaign_id'] = campaign_id
 
+        if ad_group_id:
+            conditions.append("ad_group_id = {ad_group_id:String}")
+            params['ad_group_id'] = ad_group_id
+
+        if ad_id:
+            conditions.append("ad_id = {ad_id:String}")
+            params['ad_id'] = ad_id
+
         if platform:
             conditions.append("platform = {platform:String}")
             params['platform'] = platform
@@ -171,35 +309,318 @@ class ClickHouseClient:
                 date,
                 sum(impressions) as impressions,
                 sum(clicks) as clicks,
-                sum(cost) as cost,
+                sum(cost_micros) as cost,
                 sum(conversions) as conversions,
-                sum(revenue) as revenue
+                sum(revenue_micros) as revenue
             FROM metrics_analytics
             WHERE {where_clause}
             GROUP BY date
             ORDER BY date
         """
 
-        result = self.client.query(query, parameters=params)
+        result = self.client.query(query, parameters=params, settings=self._query_settings(query_id))
         return [
             {
                 'date': row[0],
                 'impressions': int(row[1]) if row[1] else 0,
                 'clicks': int(row[2]) if row[2] else 0,
-                'cost': Decimal(str(row[3])) if row[3] else Decimal('0'),
+                'cost': int(row[3]) if row[3] else 0,
+                'conversions': int(row[4]) if row[4] else 0,
+                'revenue': int(row[5]) if row[5] else 0,
+            }
+            for row in result.result_rows
+        ]
+
+    @staticmethod
+    def _query_settings(query_id: Optional[str]) -> Optional[Dict[str, str]]:
+        """
+        Settings tagging a query with an ID.
+
+        The ID shows in system.query_log and system.processes, allows
+        ``KILL QUERY``, and ClickHouse refuses a second running query with
+        the same ID.
+        """
+        return {'query_id': query_id} if query_id else None
+
+    def _export_filters(
+        self,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        campaign_id: Optional[str],
+        platform: Optional[str],
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Build the WHERE clause and parameters of an export query."""
+        conditions = []
+        params = {}
+
+        if campaign_id:
+            conditions.append("campaign_id = {campaign_id:String}")
+            params['campaign_id'] = campaign_id
+
+        if platform:
+            conditions.append("platform = {platform:String}")
+            params['platform'] = platform
+
+        if start_date:
+            conditions.append("date >= {start_date:Date}")
+            params['start_date'] = start_date.date()
+
+        if end_date:
+            conditions.append("date <= {end_date:Date}")
+            params['end_date'] = end_date.date()
+
+        return " AND ".join(conditions) if conditions else "1=1", params
+
+    def _stream_rows(self, query: str, params: Dict[str, Any]) -> Iterator[tuple]:
+        """Yield the rows of a query block by block as ClickHouse sends them."""
+        with self.client.query_rows_stream(query, parameters=params) as stream:
+            for row in stream:
+                yield row
+
+    def stream_time_series_metrics(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+        by_campaign: bool = False,
+    ) -> Iterator[tuple]:
+        """
+        Stream daily metrics without loading the result.
+
+        Args:
+            start_date: First day
+            end_date: Last day
+            campaign_id: Filter by campaign
+            platform: Filter by platform
+            by_campaign: One series per campaign instead of one in total
+
+        Returns:
+            Rows of TIME_SERIES_EXPORT_COLUMNS (or BY_CAMPAIGN), money in micros
+        """
+        where_clause, params = self._export_filters(start_date, end_date, campaign_id, platform)
+        group_by = "date, campaign_id" if by_campaign else "date"
+
+        query = f"""
+            SELECT
+                {group_by},
+                sum(impressions) as impressions,
+                sum(clicks) as clicks,
+                sum(cost_micros) as cost,
+                sum(conversions) as conversions,
+                sum(revenue_micros) as revenue
+            FROM metrics_analytics
+            WHERE {where_clause}
+            GROUP BY {group_by}
+            ORDER BY {group_by}
+        """
+        return self._stream_rows(query, params)
+
+    def stream_ad_metrics(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+    ) -> Iterator[tuple]:
+        """
+        Stream stored ad-level metric rows without loading the result.
+
+        Rows are read in table order, so ClickHouse starts sending before it
+        has read the whole range.
+
+        Returns:
+            Rows of AD_METRICS_EXPORT_COLUMNS, money in micros
+        """
+        where_clause, params = self._export_filters(start_date, end_date, campaign_id, platform)
+
+        query = f"""
+            SELECT
+                date, campaign_id, platform, ad_group_id, ad_id,
+                impressions, clicks, cost_micros, conversions, revenue_micros
+            FROM metrics_analytics
+            WHERE {where_clause}
+            ORDER BY date, campaign_id, platform
+        """
+        return self._stream_rows(query, params)
+
+    def get_entity_breakdown(
+        self,
+        entity_type: str = 'ad',
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+        query_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get summed metrics per campaign, ad group or ad.
+
+        Args:
+            entity_type: 'campaign', 'adgroup' or 'ad'
+            start_date: First day
+            end_date: Last day
+            campaign_id: Filter by campaign
+            platform: Filter by platform
+            query_id: ClickHouse query ID
+
+        Returns:
+            Entities ordered by cost descending, money in micros
+        """
+        column = self.ENTITY_COLUMNS[entity_type]
+        where_clause, params = self._export_filters(start_date, end_date, campaign_id, platform)
+
+        query = f"""
+            SELECT
+                assumeNotNull({column}) as entity_id,
+                sum(impressions) as impressions,
+                sum(clicks) as clicks,
+                sum(cost_micros) as cost,
+                sum(conversions) as conversions,
+                sum(revenue_micros) as revenue
+            FROM metrics_analytics
+            WHERE {where_clause} AND isNotNull({column})
+            GROUP BY entity_id
+            ORDER BY cost DESC, entity_id
+        """
+
+        result = self.client.query(query, parameters=params, settings=self._query_settings(query_id))
+        return [
+            {
+                'entity_id': row[0],
+                'impressions': int(row[1]) if row[1] else 0,
+                'clicks': int(row[2]) if row[2] else 0,
+                'cost': int(row[3]) if row[3] else 0,
                 'conversions': int(row[4]) if row[4] else 0,
-                'revenue': Decimal(str(row[5])) if row[5] else Decimal('0'),
+                'revenue': int(row[5]) if row[5] else 0,
             }
             for row in result.result_rows
         ]
 
+    def get_entity_time_series(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        entity_type: str = 'campaign',
+        entity_ids: Optional[List[str]] = None,
+        parent_ids: Optional[List[str]] = None,
+    ) -> Dict[str, List[Any]]:
+        """
+        Get daily metrics of every entity in one grouped query.
+
+        Args:
+            start_date: First day
+            end_date: Last day
+            entity_type: Entity type to group by (campaign, adgroup, ad)
+            entity_ids: Only include these entities
+            parent_ids: Only include children of these parent entities
+
+        Returns:
+            Column-oriented dictionary with entity_id, date and one list per
+            metric, ordered by entity and date
+        """
+        names = ['entity_id', 'date', 'impressions', 'clicks', 'cost', 'conversions', 'revenue']
+        if (entity_ids is not None and not entity_ids) or (parent_ids is not None and not parent_ids):
+            return {name: [] for name in names}
+
+        entity_column = self.ENTITY_COLUMNS[entity_type]
+        conditions = [
+            "date >= {start_date:Date}",
+            "date <= {end_date:Date}",
+            f"isNotNull({entity_column})",
+        ]
+        params = {
+            'start_date': start_date.date(),
+            'end_date': end_date.date(),
+        }
+
+        if entity_ids is not None:
+            conditions.append(f"{entity_column} IN {{entity_ids:Array(String)}}")
+            params['entity_ids'] = list(entity_ids)
+
+        if parent_ids is not None:
+            parent_column = self.ENTITY_COLUMNS[self.ENTITY_PARENTS[entity_type]]
+            conditions.append(f"{parent_column} IN {{parent_ids:Array(String)}}")
+            params['parent_ids'] = list(parent_ids)
+
+        where_clause = " AND ".join(conditions)
+
+        query = f"""
+            SELECT
+                assumeNotNull({entity_column}) as entity_id,
+                date,
+                sum(impressions) as impressions,
+                sum(clicks) as clicks,
+                sum(cost_micros) as cost,
+                sum(conversions) as conversions,
+                sum(revenue_micros) as revenue
+            FROM metrics_analytics
+            WHERE {where_clause}
+            GROUP BY entity_id, date
+            ORDER BY entity_id, date
+        """
+
+        result = self.client.query(query, parameters=params)
+        if not result.result_rows:
+            return {name: [] for name in names}
+        return dict(zip(names, result.result_columns))
+
+    def get_daily_metrics(
+        self,
+        days: List[date],
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+    ) -> Dict[date, Dict[str, Any]]:
+        """Get metrics summed per day for an explicit list of days."""
+        if not days:
+            return {}
+
+        conditions = ["date IN {days:Array(Date)}"]
+        params = {'days': list(days)}
+
+        if campaign_id:
+            conditions.append("campaign_id = {campaign_id:String}")
+            params['campaign_id'] = campaign_id
+
+        if platform:
+            conditions.append("platform = {platform:String}")
+            params['platform'] = platform
+
+        where_clause = " AND ".join(conditions)
+
+        query = f"""
+            SELECT
+                date,
+                sum(impressions) as impressions,
+                sum(clicks) as clicks,
+                sum(cost_micros) as cost,
+                sum(conversions) as conversions,
+                sum(revenue_micros) as revenue
+            FROM metrics_analytics
+            WHERE {where_clause}
+            GROUP BY date
+        """
+
+        result = self.client.query(query, parameters=params)
+        return {
+            row[0]: {
+                'date': row[0],
+                'impressions': int(row[1]) if row[1] else 0,
+                'clicks': int(row[2]) if row[2] else 0,
+                'cost': int(row[3]) if row[3] else 0,
+                'conversions': int(row[4]) if row[4] else 0,
+                'revenue': int(row[5]) if row[5] else 0,
+            }
+            for row in result.result_rows
+        }
+
     def get_campaign_performance(
         self,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 10,
     ) -> List[Dict[str, Any]]:
-        """Get top performing campaigns by ROI."""
+        """Get summed metrics of the top performing campaigns by ROI."""
         conditions = []
         params = {}
 
@@ -218,33 +639,335 @@ class ClickHouseClient:
                 campaign_id,
                 sum(impressions) as impressions,
                 sum(clicks) as clicks,
-                sum(cost) as cost,
+                sum(cost_micros) as cost,
                 sum(conversions) as conversions,
-                sum(revenue) as revenue
+                sum(revenue_micros) as revenue
             FROM metrics_analytics
             WHERE {where_clause}
             GROUP BY campaign_id
-            HAVING sum(cost) > 0
-            ORDER BY (sum(revenue) - sum(cost)) / sum(cost) DESC
+            HAVING sum(cost_micros) > 0
+            ORDER BY (sum(revenue_micros) - sum(cost_micros)) / sum(cost_micros) DESC
             LIMIT {{limit:UInt32}}
         """
         params['limit'] = limit
 
         result = self.client.query(query, parameters=params)
-        campaigns = []
-        for row in result.result_rows:
-            cost = Decimal(str(row[2])) if row[2] else Decimal('0')
-            revenue = Decimal(str(row[4])) if row[4] else Decimal('0')
-            roi = ((revenue - cost) / cost * 100) if cost > 0 else Decimal('0')
-            
-            campaigns.append({
+        return [
+            {
                 'campaign_id': row[0],
                 'impressions': int(row[1]) if row[1] else 0,
                 'clicks': int(row[2]) if row[2] else 0,
-                'cost': float(cost),
-                'conversions': int(row[3]) if row[3] else 0,
-                'revenue': float(revenue),
-                'roi': float(roi),
+                'cost': int(row[3]) if row[3] else 0,
+                'conversions': int(row[4]) if row[4] else 0,
+                'revenue': int(row[5]) if row[5] else 0,
+            }
+            for row in result.result_rows
+        ]
+
+    def get_underperforming_ads(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        max_cpa: int,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get summed metrics of the worst ads by ROI that lose money or convert too expensively.
+
+        Thresholds are applied server-side: an ad qualifies when its revenue
+        is below its cost (ROI < 0), or its cost per conversion exceeds
+        ``max_cpa``, counting ads without conversions as infinitely expensive.
+
+        Args:
+            start_date: First day
+            end_date: Last day
+            max_cpa: Highest acceptable cost per conversion, in micros
+            limit: Number of ads to return
+
+        Returns:
+            Ads ordered by ROI ascending, money in micros
+        """
+        query = """
+            SELECT
+                assumeNotNull(ad_id) as ad,
+                sum(impressions) as impressions,
+                sum(clicks) as clicks,
+                sum(cost_micros) as cost,
+                sum(conversions) as conversions,
+                sum(revenue_micros) as revenue
+            FROM metrics_analytics
+            WHERE date >= {start_date:Date} AND date <= {end_date:Date}
+              AND isNotNull(ad_id)
+            GROUP BY ad
+            HAVING sum(cost_micros) > 0 AND (
+                sum(revenue_micros) < sum(cost_micros)
+                OR sum(cost_micros) > {max_cpa:Int64} * sum(conversions)
+            )
+            ORDER BY (sum(revenue_micros) - sum(cost_micros)) / sum(cost_micros) ASC,
+                sum(cost_micros) DESC
+            LIMIT {limit:UInt32}
+        """
+        params = {
+            'start_date': start_date.date(),
+            'end_date': end_date.date(),
+            'max_cpa': max_cpa,
+            'limit': limit,
+        }
+
+        result = self.client.query(query, parameters=params)
+        return [
+            {
+                'ad_id': row[0],
+                'impressions': int(row[1]) if row[1] else 0,
+                'clicks': int(row[2]) if row[2] else 0,
+                'cost': int(row[3]) if row[3] else 0,
+                'conversions': int(row[4]) if row[4] else 0,
+                'revenue': int(row[5]) if row[5] else 0,
+            }
+            for row in result.result_rows
+        ]
+
+    def get_campaign_spend(
+        self,
+        campaign_ids: List[str],
+        start_dates: List[date],
+        as_of: date,
+        recent_days: int = 7,
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        Get the cumulative spend of many campaigns since each one's own start in one query.
+
+        Args:
+            campaign_ids: Campaign IDs
+            start_dates: First day of each campaign's flight, in the order of ``campaign_ids``
+            as_of: Last day to include
+            recent_days: Length of the trailing window of the recent spend
+
+        Returns:
+            (spend since start, spend over the last ``recent_days`` days) in
+            micros by campaign ID; campaigns without spend are left out
+        """
+        if not campaign_ids:
+            return {}
+
+        query = """
+            WITH transform(
+                campaign_id, {campaign_ids:Array(String)}, {start_dates:Array(Date)}, {as_of:Date} + 1
+            ) AS flight_start
+            SELECT
+                campaign_id,
+                sumIf(cost_micros, date >= flight_start) as spend,
+                sumIf(cost_micros, date >= flight_start
+                    AND date > {as_of:Date} - {recent_days:UInt16}) as recent_spend
+            FROM metrics_analytics
+            WHERE campaign_id IN {campaign_ids:Array(String)}
+              AND date >= {min_start:Date} AND date <= {as_of:Date}
+            GROUP BY campaign_id
+        """
+        params = {
+            'campaign_ids': list(campaign_ids),
+            'start_dates': list(start_dates),
+            'min_start': min(start_dates),
+            'as_of': as_of,
+            'recent_days': recent_days,
+        }
+
+        result = self.client.query(query, parameters=params)
+        return {
+            row[0]: (int(row[1]) if row[1] else 0, int(row[2]) if row[2] else 0)
+            for row in result.result_rows
+        }
+
+    def get_weekday_spend(self, start_date: date, end_date: date) -> List[int]:
+        """
+        Get the total spend of all campaigns per weekday.
+
+        Args:
+            start_date: First day
+            end_date: Last day
+
+        Returns:
+            Spend in micros per weekday, Monday first
+        """
+        query = """
+            SELECT toDayOfWeek(date) as weekday, sum(cost_micros) as spend
+            FROM metrics_analytics
+            WHERE date >= {start_date:Date} AND date <= {end_date:Date}
+            GROUP BY weekday
+        """
+        params = {
+            'start_date': start_date,
+            'end_date': end_date,
+        }
+
+        result = self.client.query(query, parameters=params)
+        spend = [0] * 7
+        for row in result.result_rows:
+            spend[int(row[0]) - 1] = int(row[1]) if row[1] else 0
+        return spend
+
+    @staticmethod
+    def anomaly_id(entity_type: str, entity_id: str, metric_type: str, day: date) -> str:
+        """Build the deterministic id of an anomaly row."""
+        key = f"{entity_type}:{entity_id}:{metric_type}:{day.isoformat()}"
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def replace_anomalies(
+        self,
+        anomalies: List[Dict[str, Any]],
+        entity_type: str,
+        metric_types: List[str],
+        start_date: date,
+        end_date: date,
+        entity_ids: Optional[List[str]] = None,
+    ):
+        """
+        Replace the stored anomalies of a detection window.
+
+        Rows are keyed by (date, entity, metric), so re-running detection over
+        the same window is idempotent. Previously stored anomalies of the
+        window that were not detected again are tombstoned.
+
+        Args:
+            anomalies: Detected anomalies with metric_type, entity_id, date,
+                value, expected_value, z_score, severity and description
+            entity_type: Entity type the detection ran for
+            metric_types: Metric types the detection ran for
+            start_date: First day of the detection window
+            end_date: Last day of the detection window
+            entity_ids: Entities the detection ran for, None for all
+        """
+        version = datetime.utcnow()
+        rows = []
+        for anomaly in anomalies:
+            day = anomaly['date'].date() if isinstance(anomaly['date'], datetime) else anomaly['date']
+            rows.append([
+                self.anomaly_id(entity_type, anomaly['entity_id'], anomaly['metric_type'], day),
+                anomaly['metric_type'], anomaly['entity_id'], entity_type, day,
+                Decimal(anomaly['value']).quantize(CENTS),
+                Decimal(anomaly['expected_value']).quantize(CENTS),
+                Decimal(anomaly['z_score']).quantize(Decimal('0.0001')),
+                anomaly['severity'], anomaly['description'], 1, version,
+            ])
+        detected = {row[0] for row in rows}
+
+        conditions = [
+            "is_active = 1",
+            "entity_type = {entity_type:String}",
+            "metric_type IN {metric_types:Array(String)}",
+            "date >= {start_date:Date} AND date <= {end_date:Date}",
+        ]
+        params = {
+            'entity_type': entity_type,
+            'metric_types': list(metric_types),
+            'start_date': start_date,
+            'end_date': end_date,
+        }
+        if entity_ids is not None:
+            conditions.append("entity_id IN {entity_ids:Array(String)}")
+            params['entity_ids'] = list(entity_ids)
+
+        where_clause = " AND ".join(conditions)
+        stored = self.client.query(f"""
+            SELECT id, metric_type, entity_id, date
+            FROM anomalies FINAL
+            WHERE {where_clause}
+        """, parameters=params)
+        for anomaly_id, metric_type, entity_id, day in stored.result_rows:
+            if anomaly_id not in detected:
+                rows.append([
+                    anomaly_id, metric_type, entity_id, entity_type, day,
+                    Decimal(0), Decimal(0), Decimal(0), '', '', 0, version,
+                ])
+
+        if not rows:
+            return
+
+        self.client.insert(
+            'anomalies',
+            rows,
+            column_names=[
+                'id', 'metric_type', 'entity_id', 'entity_type', 'date',
+                'value', 'expected_value', 'z_score', 'severity', 'description',
+                'is_active', 'created_at',
+            ]
+        )
+
+    def get_anomalies(
+        self,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[str] = None,
+        metric_types: Optional[List[str]] = None,
+        severity: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 1000,
+        after: Optional[Tuple[date, str, str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get stored anomalies, most recent first.
+
+        Args:
+            after: Keyset position (date, entity_type, entity_id, metric_type)
+                of the last anomaly of the previous page; the page starts after it
+        """
+        conditions = ["is_active = 1"]
+        params = {}
+
+        if entity_type:
+            conditions.append("entity_type = {entity_type:String}")
+            params['entity_type'] = entity_type
+
+        if entity_id:
+            conditions.append("entity_id = {entity_id:String}")
+            params['entity_id'] = entity_id
+
+        if metric_types:
+            conditions.append("metric_type IN {metric_types:Array(String)}")
+            params['metric_types'] = list(metric_types)
+
+        if severity:
+            conditions.append("severity = {severity:String}")
+            params['severity'] = severity
+
+        if start_date:
+            conditions.append("date >= {start_date:Date}")
+            params['start_date'] = start_date.date()
+
+        if end_date:
+            conditions.append("date <= {end_date:Date}")
+            params['end_date'] = end_date.date()
+
+        if after:
+            # The date bound alone prunes by the primary key, the rest resolves ties within the day
+            conditions.append(
+                "date <= {after_date:Date} AND (date < {after_date:Date} OR "
+                "(entity_type, entity_id, metric_type) > "
+                "({after_entity_type:String}, {after_entity_id:String}, {after_metric_type:String}))"
+            )
+            params.update({
+                'after_date': after[0],
+                'after_entity_type': after[1],
+                'after_entity_id': after[2],
+                'after_metric_type': after[3],
             })
-        
-        return campaigns
+
+        where_clause = " AND ".join(conditions)
+
+        query = f"""
+            SELECT
+                id, metric_type, entity_id, entity_type, date,
+                value, expected_value, z_score, severity, description, created_at
+            FROM anomalies FINAL
+            WHERE {where_clause}
+            ORDER BY date DESC, entity_type, entity_id, metric_type
+            LIMIT {{limit:UInt32}}
+        """
+        params['limit'] = limit
+
+        result = self.client.query(query, parameters=params)
+        names = [
+            'id', 'metric_type', 'entity_id', 'entity_type', 'date',
+            'value', 'expected_value', 'z_score', 'severity', 'description', 'created_at',
+        ]
+        return [dict(zip(names, row)) for row in result.result_rows]
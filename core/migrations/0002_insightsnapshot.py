@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InsightSnapshot",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField()),
+                ("limit", models.PositiveIntegerField(default=10)),
+                ("insight_count", models.PositiveIntegerField(default=0)),
+                ("metadata", models.JSONField(blank=True, default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "insight_snapshots",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["start_date", "end_date", "limit", "-created_at"],
+                        name="insight_snapshot_window_idx",
+                    ),
+                    models.Index(
+                        fields=["created_at"], name="insight_snapshot_created_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="insight",
+            name="snapshot",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="insights",
+                to="core.insightsnapshot",
+            ),
+        ),
+    ]
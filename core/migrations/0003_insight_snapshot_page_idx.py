@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0002_insightsnapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="insight",
+            index=models.Index(
+                fields=["snapshot", "created_at", "id"], name="insight_snapshot_page_idx"
+            ),
+        ),
+    ]
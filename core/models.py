@@ -102,6 +102,31 @@ class Metric(models.Model):
         return f"{self.metric_type}: {self.value} ({self.date})"
 
 
+class InsightSnapshot(models.Model):
+    """Insight summary materialized for one window."""
+    id = models.AutoField(primary_key=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    limit = models.PositiveIntegerField(default=10)
+    insight_count = models.PositiveIntegerField(default=0)
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'insight_snapshots'
+        indexes = [
+            models.Index(
+                fields=['start_date', 'end_date', 'limit', '-created_at'],
+                name='insight_snapshot_window_idx',
+            ),
+            models.Index(fields=['created_at'], name='insight_snapshot_created_idx'),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Insights {self.start_date} - {self.end_date} ({self.created_at})"
+
+
 class Insight(models.Model):
     """Insight model."""
     INSIGHT_TYPES = [
@@ -125,6 +150,13 @@ class Insight(models.Model):
     entity_type = models.CharField(max_length=50)  # campaign, ad, adgroup
     severity = models.CharField(max_length=20, choices=SEVERITY_LEVELS, default='info')
     metadata = models.JSONField(default=dict, blank=True)
+    snapshot = models.ForeignKey(
+        InsightSnapshot,
+        on_delete=models.CASCADE,
+        related_name='insights',
+        null=True,
+        blank=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -133,6 +165,7 @@ class Insight(models.Model):
             models.Index(fields=['type', 'severity']),
             models.Index(fields=['entity_type', 'entity_id']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['snapshot', 'created_at', 'id'], name='insight_snapshot_page_idx'),
         ]
         ordering = ['-created_at']
 
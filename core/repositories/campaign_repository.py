@@ -3,6 +3,7 @@ Campaign repository interface and implementation.
 """
 from abc import ABC, abstractmethod
 from typing import Optional, List
+from datetime import date
 from core.domain.entities import Campaign as CampaignEntity
 from core.models import Campaign as CampaignModel
 
@@ -30,6 +31,11 @@ class CampaignRepositoryInterface(ABC):
         """List all campaigns, optionally filtered by platform."""
         pass
 
+    @abstractmethod
+    def list_in_flight(self, as_of: date) -> List[CampaignEntity]:
+        """List active campaigns with a budget whose flight includes a day."""
+        pass
+
 
 class DjangoCampaignRepository(CampaignRepositoryInterface):
     """Django ORM implementation of CampaignRepository."""
@@ -92,3 +98,13 @@ class DjangoCampaignRepository(CampaignRepositoryInterface):
         if platform:
             queryset = queryset.filter(platform=platform)
         return [self._to_entity(model) for model in queryset]
+
+    def list_in_flight(self, as_of: date) -> List[CampaignEntity]:
+        """List active campaigns with a budget whose flight includes a day."""
+        queryset = CampaignModel.objects.filter(
+            status='active',
+            budget__gt=0,
+            start_date__date__lte=as_of,
+            end_date__date__gte=as_of,
+        ).order_by('id')
+        return [self._to_entity(model) for model in queryset]
@@ -0,0 +1,71 @@
+"""
+Dimension (campaign, ad group, ad) name lookup repository.
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable
+from django.core.cache import cache
+from core.models import Campaign, AdGroup, Ad
+
+
+class DimensionRepositoryInterface(ABC):
+    """Dimension repository interface."""
+
+    @abstractmethod
+    def get_names(self, entity_type: str, entity_ids: Iterable[str]) -> Dict[str, str]:
+        """Get the names of entities by id."""
+        pass
+
+
+class CachedDimensionRepository(DimensionRepositoryInterface):
+    """
+    Django ORM dimension lookup behind the cache.
+
+    Names are cached per entity. Each lookup costs one cache round trip, and
+    at most one query fetches the names that are not cached yet.
+    """
+
+    KEY_PREFIX = 'dimension'
+
+    MODELS = {
+        'campaign': Campaign,
+        'adgroup': AdGroup,
+        'ad': Ad,
+    }
+
+    def __init__(self, timeout: int = 24 * 3600):
+        """
+        Args:
+            timeout: Lifetime of cached names in seconds
+        """
+        self.timeout = timeout
+
+    def _key(self, entity_type: str, entity_id: str) -> str:
+        """Build the cache key of an entity name."""
+        return f"{self.KEY_PREFIX}:{entity_type}:{entity_id}"
+
+    def get_names(self, entity_type: str, entity_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Get the names of entities by id.
+
+        Returns:
+            Names by id; unknown entities are left out
+        """
+        entity_ids = list(dict.fromkeys(entity_ids))
+        if not entity_ids:
+            return {}
+
+        keys = {self._key(entity_type, entity_id): entity_id for entity_id in entity_ids}
+        cached = cache.get_many(list(keys))
+        names = {keys[key]: name for key, name in cached.items()}
+
+        missing = [entity_id for entity_id in entity_ids if entity_id not in names]
+        if missing:
+            model = self.MODELS[entity_type]
+            loaded = dict(model.objects.filter(id__in=missing).values_list('id', 'name'))
+            cache.set_many(
+                {self._key(entity_type, entity_id): name for entity_id, name in loaded.items()},
+                self.timeout,
+            )
+            names.update(loaded)
+
+        return names
@@ -0,0 +1,204 @@
+"""
+Insight snapshot repository interface and implementation.
+"""
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from datetime import date, datetime
+from django.db import transaction
+from django.db.models import Max, Q
+from core.domain.entities import Insight as InsightEntity, InsightSnapshot as SnapshotEntity
+from core.models import Insight as InsightModel, InsightSnapshot as SnapshotModel
+
+
+class InsightRepositoryInterface(ABC):
+    """Insight snapshot repository interface."""
+
+    @abstractmethod
+    def create_snapshot(self, snapshot: SnapshotEntity) -> SnapshotEntity:
+        """Store a snapshot with all its insights."""
+        pass
+
+    @abstractmethod
+    def get_latest_snapshot(
+        self,
+        start_date: date,
+        end_date: date,
+        limit: int,
+        created_after: Optional[datetime] = None,
+        with_insights: bool = True,
+    ) -> Optional[SnapshotEntity]:
+        """Get the most recent snapshot of a window."""
+        pass
+
+    @abstractmethod
+    def get_snapshot(self, snapshot_id: str) -> Optional[SnapshotEntity]:
+        """Get a snapshot by ID, without its insights."""
+        pass
+
+    @abstractmethod
+    def get_snapshot_insights(
+        self,
+        snapshot_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[InsightEntity]:
+        """Get a page of a snapshot's insights in (created_at, id) order."""
+        pass
+
+    @abstractmethod
+    def prune(self, cutoff: datetime) -> int:
+        """Delete snapshots created before the cutoff, except the latest of each window."""
+        pass
+
+
+class DjangoInsightRepository(InsightRepositoryInterface):
+    """Django ORM implementation of InsightRepository."""
+
+    def _to_entity(self, model: InsightModel) -> InsightEntity:
+        """Convert Django model to domain entity."""
+        return InsightEntity(
+            id=str(model.id),
+            type=model.type,
+            title=model.title,
+            description=model.description,
+            entity_id=model.entity_id,
+            entity_type=model.entity_type,
+            severity=model.severity,
+            metadata=model.metadata,
+            created_at=model.created_at,
+        )
+
+    def _to_model(self, entity: InsightEntity, snapshot: SnapshotModel) -> InsightModel:
+        """Convert domain entity to Django model."""
+        return InsightModel(
+            type=entity.type,
+            title=entity.title,
+            description=entity.description,
+            entity_id=entity.entity_id,
+            entity_type=entity.entity_type,
+            severity=entity.severity,
+            metadata=entity.metadata or {},
+            snapshot=snapshot,
+        )
+
+    def create_snapshot(self, snapshot: SnapshotEntity) -> SnapshotEntity:
+        """Store a snapshot and its insights in one transaction with a single insert."""
+        with transaction.atomic():
+            model = SnapshotModel.objects.create(
+                start_date=snapshot.start_date,
+                end_date=snapshot.end_date,
+                limit=snapshot.limit,
+                insight_count=len(snapshot.insights),
+                metadata=snapshot.metadata,
+            )
+            InsightModel.objects.bulk_create(
+                [self._to_model(insight, model) for insight in snapshot.insights]
+            )
+
+        snapshot.id = str(model.id)
+        snapshot.created_at = model.created_at
+        for insight in snapshot.insights:
+            insight.created_at = model.created_at
+        return snapshot
+
+    def get_latest_snapshot(
+        self,
+        start_date: date,
+        end_date: date,
+        limit: int,
+        created_after: Optional[datetime] = None,
+        with_insights: bool = True,
+    ) -> Optional[SnapshotEntity]:
+        """
+        Get the most recent snapshot of a window, optionally only if newer than a time.
+
+        Args:
+            with_insights: Load the insights too; pages of them can be read
+                with ``get_snapshot_insights`` instead
+        """
+        queryset = SnapshotModel.objects.filter(
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+        )
+        if created_after:
+            queryset = queryset.filter(created_at__gte=created_after)
+
+        model = queryset.order_by('-created_at').first()
+        if model is None:
+            return None
+        return self._to_snapshot_entity(model, with_insights)
+
+    def get_snapshot(self, snapshot_id: str) -> Optional[SnapshotEntity]:
+        """Get a snapshot by ID, without its insights."""
+        model = SnapshotModel.objects.filter(id=snapshot_id).first()
+        if model is None:
+            return None
+        return self._to_snapshot_entity(model, with_insights=False)
+
+    def get_snapshot_insights(
+        self,
+        snapshot_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[InsightEntity]:
+        """
+        Get a page of a snapshot's insights in (created_at, id) order.
+
+        Pages are range scans of the (snapshot, created_at, id) index.
+
+        Args:
+            snapshot_id: Snapshot ID
+            limit: Page size
+            after: (created_at, id) of the last insight of the previous page
+        """
+        queryset = InsightModel.objects.filter(snapshot_id=snapshot_id)
+        if after:
+            created_at, insight_id = after
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=insight_id)
+            )
+        return [
+            self._to_entity(model)
+            for model in queryset.order_by('created_at', 'id')[:limit]
+        ]
+
+    def _to_snapshot_entity(self, model: SnapshotModel, with_insights: bool) -> SnapshotEntity:
+        """Convert a snapshot model to a domain entity."""
+        return SnapshotEntity(
+            id=str(model.id),
+            start_date=model.start_date,
+            end_date=model.end_date,
+            limit=model.limit,
+            insights=(
+                [self._to_entity(insight) for insight in model.insights.order_by('created_at', 'id')]
+                if with_insights else []
+            ),
+            metadata=model.metadata,
+            created_at=model.created_at,
+        )
+
+    def prune(self, cutoff: datetime) -> int:
+        """
+        Delete snapshots created before the cutoff, except the latest of each window.
+
+        Insights stored before snapshots existed are deleted past the cutoff too.
+
+        Returns:
+            Number of deleted snapshots
+        """
+        latest_ids = (
+            SnapshotModel.objects
+            .values('start_date', 'end_date', 'limit')
+            .annotate(latest_id=Max('id'))
+            .values_list('latest_id', flat=True)
+        )
+        with transaction.atomic():
+            deleted, per_model = (
+                SnapshotModel.objects
+                .filter(created_at__lt=cutoff)
+                .exclude(id__in=list(latest_ids))
+                .delete()
+            )
+            InsightModel.objects.filter(snapshot__isnull=True, created_at__lt=cutoff).delete()
+        return per_model.get(SnapshotModel._meta.label, 0)
@@ -5,7 +5,8 @@ from abc import ABC, abstractmethod
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
-from core.domain.entities import Metric as MetricEntity, MetricType
+from core.domain.entities import Metric as MetricEntity, MetricType, MONEY_METRIC_TYPES
+from core.domain.money import to_micros, from_micros
 from core.models import Metric as MetricModel
 
 
@@ -38,14 +39,19 @@ class DjangoMetricRepository(MetricRepositoryInterface):
 
     def _to_entity(self, model: MetricModel) -> MetricEntity:
         """Convert Django model to domain entity."""
+        metric_type = MetricType(model.metric_type)
+        if metric_type in MONEY_METRIC_TYPES:
+            value = to_micros(model.value)
+        else:
+            value = int(model.value)
         return MetricEntity(
             id=str(model.id),
             campaign_id=model.campaign.id,
             ad_group_id=model.ad_group.id if model.ad_group else None,
             ad_id=model.ad.id if model.ad else None,
             date=datetime.combine(model.date, datetime.min.time()),
-            metric_type=MetricType(model.metric_type),
-            value=model.value,
+            metric_type=metric_type,
+            value=value,
             platform=model.platform,
             created_at=model.created_at,
         )
@@ -70,13 +76,18 @@ class DjangoMetricRepository(MetricRepositoryInterface):
             except Ad.DoesNotExist:
                 pass
 
+        if entity.metric_type in MONEY_METRIC_TYPES:
+            value = from_micros(entity.value)
+        else:
+            value = Decimal(entity.value)
+
         return MetricModel(
             campaign=campaign,
             ad_group=ad_group,
             ad=ad,
             date=entity.date.date(),
             metric_type=entity.metric_type.value,
-            value=entity.value,
+            value=value,
             platform=entity.platform,
         )
 
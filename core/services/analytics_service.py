@@ -1,22 +1,28 @@
 """
 Analytics service - Application layer.
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable
 from datetime import datetime, timedelta
-from decimal import Decimal
+from django.core.cache import cache
 from core.domain.entities import AnalyticsResult
+from analytics.roi import calculate_all_metrics_batch
 from core.infrastructure.clickhouse_client import ClickHouseClient
-from core.utils.cache import cached_result
+from core.utils.cache import cached_result, bind_arguments, DailyAggregateCache
 from core.utils.logging import analytics_logger
 
 
 class AnalyticsService:
     """Service for computing marketing analytics."""
 
-    def __init__(self):
-        self.clickhouse = ClickHouseClient()
+    def __init__(self, clickhouse: Optional[ClickHouseClient] = None):
+        """
+        Args:
+            clickhouse: Shared ClickHouse client (default: a new client)
+        """
+        self.clickhouse = clickhouse or ClickHouseClient()
+        self.daily_cache = DailyAggregateCache(self.clickhouse.get_daily_metrics)
 
-    @cached_result(key_prefix='analytics:roi', timeout=300)
+    @cached_result(key_prefix='analytics:roi', timeout=300, versioned=True, track_access=True)
     def calculate_roi(
         self,
         campaign_id: Optional[str] = None,
@@ -31,36 +37,108 @@ class AnalyticsService:
         )
         
         try:
-            aggregated = self.clickhouse.get_aggregated_metrics(
-                campaign_id=campaign_id,
-                platform=platform,
-                start_date=start_date,
-                end_date=end_date,
-            )
+            if self._use_daily_cache(start_date, end_date):
+                totals = self.daily_cache.get_totals(
+                    start_date.date(),
+                    end_date.date(),
+                    campaign_id=campaign_id,
+                    platform=platform,
+                )
+                aggregated = {
+                    f'total_{field}': value for field, value in totals.items()
+                }
+            else:
+                aggregated = self.clickhouse.get_aggregated_metrics(
+                    campaign_id=campaign_id,
+                    platform=platform,
+                    start_date=start_date,
+                    end_date=end_date,
+                )
         except Exception as e:
             analytics_logger.error(f"Error calculating ROI: {str(e)}")
             raise
 
-        result = AnalyticsResult(
-            total_cost=aggregated['total_cost'],
-            total_revenue=aggregated['total_revenue'],
-            total_clicks=aggregated['total_clicks'],
-            total_impressions=aggregated['total_impressions'],
-            total_conversions=aggregated['total_conversions'],
-            date_range_start=start_date,
-            date_range_end=end_date,
-            campaign_id=campaign_id,
-            platform=platform,
-        )
+        return self._to_result(aggregated, campaign_id, platform, start_date, end_date)
 
-        # Calculate derived metrics
-        result.roi = result.calculate_roi()
-        result.cpc = result.calculate_cpc()
-        result.cpa = result.calculate_cpa()
-        result.ctr = result.calculate_ctr()
+    def calculate_roi_batch(
+        self,
+        campaign_ids: Optional[Iterable[str]] = None,
+        platforms: Optional[Iterable[str]] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Dict[str, AnalyticsResult]:
+        """
+        Calculate ROI and related metrics for many campaigns at once.
 
-        return result
+        Results are shared with ``calculate_roi`` through its cache: listed
+        campaigns cached there are served from it, and the misses come from
+        one grouped ClickHouse query and are cached in turn. Filtering by more
+        than one platform has no ``calculate_roi`` equivalent and bypasses
+        the cache.
+
+        Args:
+            campaign_ids: Campaigns to include (default: all with data)
+            platforms: Platforms to include (default: all)
+            start_date: First day
+            end_date: Last day
+
+        Returns:
+            Results by campaign ID, in the order of ``campaign_ids`` if given
+        """
+        platforms = list(dict.fromkeys(platforms or []))
+        platform = platforms[0] if len(platforms) == 1 else None
+        cacheable = len(platforms) <= 1
+        cached_roi = type(self).calculate_roi
+
+        def cache_keys(ids: List[str]) -> List[str]:
+            return cached_roi.cache_keys(
+                bind_arguments(
+                    cached_roi.__wrapped__, self,
+                    campaign_id=campaign_id, platform=platform,
+                    start_date=start_date, end_date=end_date,
+                )
+                for campaign_id in ids
+            )
+
+        results = {}
+        missing = None
+        if campaign_ids is not None:
+            campaign_ids = list(dict.fromkeys(campaign_ids))
+            if cacheable and campaign_ids:
+                keys = dict(zip(cache_keys(campaign_ids), campaign_ids))
+                results = {keys[key]: result for key, result in cache.get_many(list(keys)).items()}
+            missing = [campaign_id for campaign_id in campaign_ids if campaign_id not in results]
+
+        if missing is None or missing:
+            totals = self.clickhouse.get_aggregated_metrics_by_campaign(
+                campaign_ids=missing,
+                platforms=platforms,
+                start_date=start_date,
+                end_date=end_date,
+            )
+            computed = {
+                campaign_id: self._to_result(
+                    totals.get(campaign_id, {}), campaign_id, platform, start_date, end_date
+                )
+                for campaign_id in (totals if missing is None else missing)
+            }
+            if cacheable:
+                cache.set_many(
+                    dict(zip(cache_keys(list(computed)), computed.values())),
+                    cached_roi.timeout,
+                )
+            results.update(computed)
 
+        if campaign_ids is None:
+            return results
+
+        analytics_logger.info(
+            f"Calculated ROI for {len(campaign_ids)} campaigns, "
+            f"{len(campaign_ids) - len(missing)} from cache"
+        )
+        return {campaign_id: results[campaign_id] for campaign_id in campaign_ids}
+
+    @cached_result(key_prefix='analytics:trends', timeout=300, versioned=True, track_access=True)
     def get_trends(
         self,
         campaign_id: Optional[str] = None,
@@ -74,6 +152,15 @@ class AnalyticsService:
             end_date = end_date or datetime.utcnow()
             start_date = end_date - timedelta(days=days)
 
+        range_end = end_date or datetime.utcnow()
+        if self._use_daily_cache(start_date, range_end):
+            return self.daily_cache.get_days(
+                start_date.date(),
+                range_end.date(),
+                campaign_id=campaign_id,
+                platform=platform,
+            )
+
         return self.clickhouse.get_time_series_metrics(
             campaign_id=campaign_id,
             platform=platform,
@@ -81,15 +168,70 @@ class AnalyticsService:
             end_date=end_date,
         )
 
+    @cached_result(key_prefix='analytics:top_campaigns', timeout=300, versioned=True, track_access=True)
     def get_campaign_performance(
         self,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 10,
     ) -> List[Dict[str, Any]]:
-        """Get top performing campaigns by ROI."""
-        return self.clickhouse.get_campaign_performance(
+        """Get top performing campaigns by ROI, money in micros."""
+        campaigns = self.clickhouse.get_campaign_performance(
             start_date=start_date,
             end_date=end_date,
             limit=limit,
         )
+        if not campaigns:
+            return []
+
+        metrics = calculate_all_metrics_batch(
+            cost=[campaign['cost'] for campaign in campaigns],
+            revenue=[campaign['revenue'] for campaign in campaigns],
+            clicks=[campaign['clicks'] for campaign in campaigns],
+            impressions=[campaign['impressions'] for campaign in campaigns],
+            conversions=[campaign['conversions'] for campaign in campaigns],
+        )
+        for i, campaign in enumerate(campaigns):
+            for name, values in metrics.items():
+                campaign[name] = float(values[i])
+
+        return campaigns
+
+    @staticmethod
+    def _to_result(
+        aggregated: Dict[str, int],
+        campaign_id: Optional[str],
+        platform: Optional[str],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+    ) -> AnalyticsResult:
+        """Build an analytics result with derived metrics from aggregated totals."""
+        result = AnalyticsResult(
+            total_cost=aggregated.get('total_cost', 0),
+            total_revenue=aggregated.get('total_revenue', 0),
+            total_clicks=aggregated.get('total_clicks', 0),
+            total_impressions=aggregated.get('total_impressions', 0),
+            total_conversions=aggregated.get('total_conversions', 0),
+            date_range_start=start_date,
+            date_range_end=end_date,
+            campaign_id=campaign_id,
+            platform=platform,
+        )
+
+        # Calculate derived metrics
+        result.roi = result.calculate_roi()
+        result.cpc = result.calculate_cpc()
+        result.cpa = result.calculate_cpa()
+        result.ctr = result.calculate_ctr()
+
+        return result
+
+    def _use_daily_cache(
+        self,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+    ) -> bool:
+        """Check whether a date window can be served from day buckets."""
+        if not start_date or not end_date:
+            return False
+        return self.daily_cache.supports(start_date.date(), end_date.date())
@@ -0,0 +1,95 @@
+"""
+Dashboard service - Application layer.
+"""
+from typing import Dict, List, Optional
+from datetime import date, datetime
+from django.conf import settings
+from core.domain.entities import Insight
+from core.services.analytics_service import AnalyticsService
+from core.services.insight_service import InsightService
+from core.utils.concurrency import StageResult, run_stages
+
+
+class SnapshotUnavailable(LookupError):
+    """Raised when a window has no insight snapshot yet."""
+
+
+class DashboardService:
+    """Service assembling the dashboard from independently computed sections."""
+
+    SECTIONS = ('roi', 'trends', 'top_campaigns', 'insights')
+
+    def __init__(self, analytics_service: Optional[AnalyticsService] = None):
+        """
+        Args:
+            analytics_service: Shared analytics service (default: a new service)
+        """
+        self.analytics_service = analytics_service or AnalyticsService()
+
+    def build(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+        limit: int = 10,
+    ) -> Dict[str, StageResult]:
+        """
+        Compute the dashboard sections of one window concurrently.
+
+        Each section has its own timeout in DASHBOARD_SECTION_TIMEOUTS; a
+        section that fails or times out is reported as such while the others
+        are returned. ROI and trends follow the campaign and platform filters,
+        top campaigns and insights cover the whole account. Insights are read
+        from the window's latest stored snapshot, which may predate the
+        latest data; without one the section fails until the window is
+        materialized by a worker.
+
+        Args:
+            start_date: First day
+            end_date: Last day
+            campaign_id: Filter ROI and trends by campaign
+            platform: Filter ROI and trends by platform
+            limit: Number of top campaigns, and limit of the insight snapshot
+
+        Returns:
+            Results by section name, in SECTIONS order
+        """
+        stages = {
+            'roi': lambda: self.analytics_service.calculate_roi(
+                campaign_id=campaign_id,
+                platform=platform,
+                start_date=start_date,
+                end_date=end_date,
+            ),
+            'trends': lambda: self.analytics_service.get_trends(
+                campaign_id=campaign_id,
+                platform=platform,
+                start_date=start_date,
+                end_date=end_date,
+            ),
+            'top_campaigns': lambda: self.analytics_service.get_campaign_performance(
+                start_date=start_date,
+                end_date=end_date,
+                limit=limit,
+            ),
+            'insights': lambda: self._latest_insights(start_date.date(), end_date.date(), limit),
+        }
+        return run_stages(stages, settings.DASHBOARD_SECTION_TIMEOUTS)
+
+    @staticmethod
+    def _latest_insights(start_date: date, end_date: date, limit: int) -> List[Insight]:
+        """
+        Get the insights of the window's latest snapshot.
+
+        Snapshots are never materialized here: insight stages would run nested
+        on the stage pool this section already occupies, and under load time
+        out into a degraded snapshot that other readers then reuse.
+
+        Raises:
+            SnapshotUnavailable: If the window has no snapshot yet
+        """
+        snapshot = InsightService.get_latest_snapshot(start_date, end_date, limit)
+        if snapshot is None:
+            raise SnapshotUnavailable(f"No insight snapshot yet for {start_date} to {end_date}")
+        return snapshot.insights
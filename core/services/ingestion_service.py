@@ -1,7 +1,7 @@
 """
 Ingestion service - Application layer.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from decimal import Decimal
 from core.domain.entities import (
@@ -10,10 +10,13 @@ from core.domain.entities import (
     Ad,
     Metric,
     MetricType,
+    MONEY_METRIC_TYPES,
 )
+from core.domain.money import to_micros
 from core.repositories.campaign_repository import DjangoCampaignRepository
 from core.repositories.metric_repository import DjangoMetricRepository
 from core.models import AdGroup as AdGroupModel, Ad as AdModel
+from core.utils.progress import IngestionProgress
 
 
 class IngestionService:
@@ -23,9 +26,16 @@ class IngestionService:
         self.campaign_repo = DjangoCampaignRepository()
         self.metric_repo = DjangoMetricRepository()
 
-    def normalize_and_store(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def normalize_and_store(
+        self,
+        data: List[Dict[str, Any]],
+        progress: Optional[IngestionProgress] = None,
+    ) -> Dict[str, Any]:
         """
         Normalize and store ingested data.
+
+        Records are normalized first, then their dimensions and metrics are
+        stored; ``progress`` receives the timing of each stage.
         
         Expected data format:
         [
@@ -47,25 +57,36 @@ class IngestionService:
             ...
         ]
         """
+        progress = progress or IngestionProgress(None)
         campaigns_created = 0
         ad_groups_created = 0
         ads_created = 0
         metrics_created = 0
 
-        metrics_to_store = []
-
-        for record in data:
-            # Normalize and create Campaign
-            campaign = self._normalize_campaign(record)
-            existing_campaign = self.campaign_repo.get_by_id(campaign.id)
-            if not existing_campaign:
-                self.campaign_repo.create(campaign)
-                campaigns_created += 1
-
-            # Normalize and create AdGroup
-            if record.get('ad_group_id'):
-                ad_group = self._normalize_ad_group(record, campaign.id)
-                if not AdGroupModel.objects.filter(id=ad_group.id).exists():
+        with progress.stage('parse'):
+            normalized = [
+                (
+                    record,
+                    self._normalize_campaign(record),
+                    self._normalize_ad_group(record, record['campaign_id']) if record.get('ad_group_id') else None,
+                    self._normalize_ad(record, record.get('ad_group_id')),
+                )
+                for record in data
+            ]
+            metrics_to_store = [
+                metric for record in data for metric in self._normalize_metrics(record)
+            ]
+
+        with progress.stage('dimensions'):
+            for record, campaign, ad_group, ad in normalized:
+                # Create Campaign
+                existing_campaign = self.campaign_repo.get_by_id(campaign.id)
+                if not existing_campaign:
+                    self.campaign_repo.create(campaign)
+                    campaigns_created += 1
+
+                # Create AdGroup
+                if ad_group and not AdGroupModel.objects.filter(id=ad_group.id).exists():
                     AdGroupModel.objects.create(
                         id=ad_group.id,
                         campaign_id=campaign.id,
@@ -74,9 +95,7 @@ class IngestionService:
                     )
                     ad_groups_created += 1
 
-            # Normalize and create Ad
-            if record.get('ad_id'):
-                ad = self._normalize_ad(record, record.get('ad_group_id'))
+                # Create Ad
                 if ad and not AdModel.objects.filter(id=ad.id).exists():
                     AdModel.objects.create(
                         id=ad.id,
@@ -87,14 +106,11 @@ class IngestionService:
                     )
                     ads_created += 1
 
-            # Normalize metrics
-            metrics = self._normalize_metrics(record)
-            metrics_to_store.extend(metrics)
-
         # Batch insert metrics
-        if metrics_to_store:
-            self.metric_repo.create_batch(metrics_to_store)
-            metrics_created = len(metrics_to_store)
+        with progress.stage('postgres'):
+            if metrics_to_store:
+                self.metric_repo.create_batch(metrics_to_store)
+                metrics_created = len(metrics_to_store)
 
         return {
             'campaigns_created': campaigns_created,
@@ -163,13 +179,17 @@ class IngestionService:
 
         for key, metric_type in metric_mapping.items():
             if key in record and record[key] is not None:
+                if metric_type in MONEY_METRIC_TYPES:
+                    value = to_micros(record[key])
+                else:
+                    value = int(Decimal(str(record[key])))
                 metric = Metric(
                     campaign_id=record['campaign_id'],
                     ad_group_id=record.get('ad_group_id'),
                     ad_id=record.get('ad_id'),
                     date=date,
                     metric_type=metric_type,
-                    value=Decimal(str(record[key])),
+                    value=value,
                     platform=platform,
                 )
                 metrics.append(metric)
@@ -1,21 +1,58 @@
 """
 Insight generation service - Application layer.
 """
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
-from core.domain.entities import Insight
+import numpy as np
+from core.domain.entities import Insight, InsightSnapshot
+from core.domain.money import MICROS_PER_UNIT, micros_to_float
+from analytics.roi import calculate_all_metrics_batch
 from core.services.analytics_service import AnalyticsService
 from analytics.anomalies import AnomalyDetector
-from core.models import Insight as InsightModel
+from analytics.budget import BudgetPacer
+from core.repositories.insight_repository import DjangoInsightRepository
+from core.repositories.dimension_repository import CachedDimensionRepository
+from core.utils.cache import bump_materialized_version
+from core.utils.concurrency import run_stages
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+WINDOW_LOCK_PREFIX = 'insights:materialize'
+
+# Sorted set of requested windows outside the scheduled ones, by last request time
+REQUESTED_WINDOWS_KEY = 'insights:windows'
 
 
 class InsightService:
     """Service for generating marketing insights."""
 
-    def __init__(self):
-        self.analytics_service = AnalyticsService()
-        self.anomaly_detector = AnomalyDetector()
+    # Ads whose cost per conversion exceeds this are underperforming
+    UNDERPERFORMING_MAX_CPA = 50 * MICROS_PER_UNIT
+
+    def __init__(
+        self,
+        analytics_service: Optional[AnalyticsService] = None,
+        anomaly_detector: Optional[AnomalyDetector] = None,
+        budget_pacer: Optional[BudgetPacer] = None,
+    ):
+        """
+        Args:
+            analytics_service: Shared analytics service (default: a new service)
+            anomaly_detector: Shared anomaly detector (default: a new detector)
+            budget_pacer: Shared budget pacer (default: one configured from settings)
+        """
+        self.analytics_service = analytics_service or AnalyticsService()
+        self.anomaly_detector = anomaly_detector or AnomalyDetector()
+        self.dimensions = CachedDimensionRepository()
+        self.budget_pacer = budget_pacer or BudgetPacer(
+            curve=settings.BUDGET_PACING_CURVE,
+            tolerance=settings.BUDGET_PACING_TOLERANCE,
+            recent_days=settings.BUDGET_PACING_RECENT_DAYS,
+            weekday_weights=settings.BUDGET_PACING_WEEKDAY_WEIGHTS,
+        )
 
     def generate_summary(
         self,
@@ -28,60 +65,120 @@ class InsightService:
         - Best performing campaigns
         - Underperforming ads
         - Budget inefficiency signals
+
+        Insights are computed only; ``materialize_snapshot`` stores them.
+        """
+        return self.build_summary(start_date, end_date, limit).insights
+
+    def build_summary(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: int = 10,
+    ) -> InsightSnapshot:
+        """
+        Generate summary insights, running the stages concurrently.
+
+        Each stage has its own timeout (INSIGHT_STAGE_TIMEOUTS). A stage that
+        fails or times out contributes no insights instead of failing the
+        summary, and is reported in the metadata.
+
+        Returns:
+            Unsaved snapshot whose metadata holds per-stage status and timings
         """
         if not end_date:
             end_date = datetime.utcnow()
         if not start_date:
             start_date = end_date - timedelta(days=30)
 
+        stages = {
+            'best_campaigns': lambda: self._best_campaign_insights(start_date, end_date, limit),
+            'underperforming_ads': lambda: self._underperforming_ad_insights(start_date, end_date, limit),
+            'anomalies': lambda: self._anomaly_insights(start_date, end_date),
+            'budget': lambda: self._budget_insights(end_date, limit),
+        }
+        results = run_stages(stages, settings.INSIGHT_STAGE_TIMEOUTS)
+
         insights = []
+        for result in results.values():
+            if result.ok:
+                insights.extend(result.value)
+
+        return InsightSnapshot(
+            start_date=start_date.date(),
+            end_date=end_date.date(),
+            limit=limit,
+            insights=insights,
+            metadata={
+                'stages': {name: result.to_dict() for name, result in results.items()},
+                'degraded': not all(result.ok for result in results.values()),
+            },
+        )
 
-        # Get best performing campaigns
-        best_campaigns = self._get_best_campaigns(start_date, end_date, limit)
-        for campaign in best_campaigns:
+    def _best_campaign_insights(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        limit: int,
+    ) -> List[Insight]:
+        """Build insights for the best performing campaigns."""
+        insights = []
+        for campaign in self._get_best_campaigns(start_date, end_date, limit):
+            revenue = micros_to_float(campaign.get('revenue', 0))
+            cost = micros_to_float(campaign.get('cost', 0))
             insight = Insight(
                 type='best_campaign',
                 title=f"Top Performer: {campaign.get('name', 'Campaign')}",
                 description=(
                     f"Campaign achieved ROI of {campaign.get('roi', 0):.2f}% with "
-                    f"${campaign.get('revenue', 0):.2f} revenue from ${campaign.get('cost', 0):.2f} spend."
+                    f"${revenue:.2f} revenue from ${cost:.2f} spend."
                 ),
                 entity_id=campaign.get('campaign_id', ''),
                 entity_type='campaign',
                 severity='info',
                 metadata={
                     'roi': float(campaign.get('roi', 0)),
-                    'revenue': float(campaign.get('revenue', 0)),
-                    'cost': float(campaign.get('cost', 0)),
+                    'revenue': revenue,
+                    'cost': cost,
                 },
             )
             insights.append(insight)
+        return insights
 
-        # Get underperforming ads
-        underperforming_ads = self._get_underperforming_ads(start_date, end_date, limit)
-        for ad in underperforming_ads:
+    def _underperforming_ad_insights(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        limit: int,
+    ) -> List[Insight]:
+        """Build insights for underperforming ads."""
+        insights = []
+        for ad in self._get_underperforming_ads(start_date, end_date, limit):
+            cpa = micros_to_float(ad.get('cpa', 0))
             insight = Insight(
                 type='underperforming_ad',
                 title=f"Underperforming Ad: {ad.get('ad_name', 'Ad')}",
                 description=(
                     f"Ad has negative ROI ({ad.get('roi', 0):.2f}%) or high CPA "
-                    f"(${ad.get('cpa', 0):.2f}). Consider pausing or optimizing."
+                    f"(${cpa:.2f}). Consider pausing or optimizing."
                 ),
                 entity_id=ad.get('ad_id', ''),
                 entity_type='ad',
                 severity='warning' if ad.get('roi', 0) < -20 else 'info',
                 metadata={
                     'roi': ad.get('roi', 0),
-                    'cpa': ad.get('cpa', 0),
-                    'cost': ad.get('cost', 0),
-                    'revenue': ad.get('revenue', 0),
+                    'cpa': cpa,
+                    'cost': micros_to_float(ad.get('cost', 0)),
+                    'revenue': micros_to_float(ad.get('revenue', 0)),
                 },
             )
             insights.append(insight)
+        return insights
 
-        # Detect anomalies
-        anomalies = self._detect_recent_anomalies(start_date, end_date)
-        for anomaly in anomalies:
+    def _anomaly_insights(self, start_date: datetime, end_date: datetime) -> List[Insight]:
+        """Build insights for recent anomalies."""
+        insights = []
+        for anomaly in self._detect_recent_anomalies(start_date, end_date):
             insight = Insight(
                 type='anomaly_detected',
                 title=f"Anomaly Detected: {anomaly.metric_type.value}",
@@ -96,13 +193,213 @@ class InsightService:
                 },
             )
             insights.append(insight)
+        return insights
 
-        # Store insights
-        for insight in insights:
-            self._store_insight(insight)
+    def _budget_insights(self, end_date: datetime, limit: int) -> List[Insight]:
+        """Build insights for campaigns off their budget curve, worst first."""
+        insights = []
+        for campaign in self._get_budget_inefficiencies(end_date, limit):
+            budget = micros_to_float(campaign['budget'])
+            spend = micros_to_float(campaign['spend'])
+            expected = micros_to_float(campaign['expected_spend'])
+            projected = micros_to_float(campaign['projected_spend'])
 
+            if campaign['spend'] >= campaign['budget']:
+                severity = 'critical'
+                problem = f"has spent ${spend:.2f} of its ${budget:.2f} budget"
+            elif campaign['overspend_projected']:
+                severity = 'warning'
+                problem = f"is projected to spend ${projected:.2f} of its ${budget:.2f} budget"
+            elif campaign['over_pacing']:
+                severity = 'warning'
+                problem = f"is overpacing with ${spend:.2f} spent against ${expected:.2f} planned"
+            else:
+                severity = 'info'
+                problem = f"is underpacing with ${spend:.2f} spent against ${expected:.2f} planned"
+
+            insight = Insight(
+                type='budget_inefficiency',
+                title=f"Budget Pacing: {campaign['name'] or campaign['campaign_id']}",
+                description=(
+                    f"Campaign {problem} after {campaign['days_elapsed']} of "
+                    f"{campaign['days_total']} days."
+                ),
+                entity_id=campaign['campaign_id'],
+                entity_type='campaign',
+                severity=severity,
+                metadata={
+                    'budget': budget,
+                    'spend': spend,
+                    'expected_spend': expected,
+                    'projected_spend': projected,
+                    'pacing': round(campaign['pacing'], 4),
+                    'curve': self.budget_pacer.curve,
+                },
+            )
+            insights.append(insight)
         return insights
 
+    @staticmethod
+    def trailing_window(days: int = 30) -> Tuple[date, date]:
+        """Get the first and last day of the trailing ``days`` days window."""
+        end_date = datetime.utcnow().date()
+        return end_date - timedelta(days=days), end_date
+
+    @staticmethod
+    def get_latest_snapshot(
+        start_date: date,
+        end_date: date,
+        limit: int = 10,
+        created_after: Optional[datetime] = None,
+        with_insights: bool = True,
+    ) -> Optional[InsightSnapshot]:
+        """
+        Get the latest materialized snapshot of a window.
+
+        This is a single indexed lookup, no analytics backend is queried.
+
+        Args:
+            start_date: First day of the window
+            end_date: Last day of the window
+            limit: Result limit the snapshot was generated with
+            created_after: Ignore snapshots created before this time
+            with_insights: Load the insights too, rather than paging through
+                them with ``get_snapshot_insights``
+
+        Returns:
+            The snapshot, or None if there is none
+        """
+        return DjangoInsightRepository().get_latest_snapshot(
+            start_date, end_date, limit, created_after=created_after, with_insights=with_insights
+        )
+
+    @staticmethod
+    def get_snapshot(snapshot_id: str) -> Optional[InsightSnapshot]:
+        """Get a snapshot by ID, without its insights."""
+        return DjangoInsightRepository().get_snapshot(snapshot_id)
+
+    @staticmethod
+    def get_snapshot_insights(
+        snapshot_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> List[Insight]:
+        """
+        Get a page of a snapshot's insights.
+
+        Args:
+            snapshot_id: Snapshot ID
+            limit: Page size
+            after: (created_at, id) of the last insight of the previous page
+
+        Returns:
+            Insights in (created_at, id) order
+        """
+        return DjangoInsightRepository().get_snapshot_insights(snapshot_id, limit, after=after)
+
+    def materialize_snapshot(
+        self,
+        start_date: date,
+        end_date: date,
+        limit: int = 10,
+    ) -> InsightSnapshot:
+        """
+        Generate the insights of a window and store them as a new snapshot version.
+
+        Returns:
+            The stored snapshot
+        """
+        # A window ending today covers the data ingested so far today
+        if end_date >= datetime.utcnow().date():
+            end = datetime.utcnow()
+        else:
+            end = datetime.combine(end_date, datetime.min.time())
+
+        snapshot = self.build_summary(
+            start_date=datetime.combine(start_date, datetime.min.time()),
+            end_date=end,
+            limit=limit,
+        )
+        snapshot.end_date = end_date  # Keyed by the requested window
+        snapshot = DjangoInsightRepository().create_snapshot(snapshot)
+        bump_materialized_version('insights')
+        return snapshot
+
+    @staticmethod
+    def _window_lock_key(start_date: date, end_date: date, limit: int) -> str:
+        return f"{WINDOW_LOCK_PREFIX}:{start_date.isoformat()}:{end_date.isoformat()}:{limit}"
+
+    @staticmethod
+    def claim_window(start_date: date, end_date: date, limit: int) -> bool:
+        """
+        Claim the materialization of a window's snapshot.
+
+        Returns:
+            False if the window is already being materialized
+        """
+        return cache.add(
+            InsightService._window_lock_key(start_date, end_date, limit),
+            True,
+            settings.INSIGHT_MATERIALIZE_LOCK_SECONDS,
+        )
+
+    @staticmethod
+    def release_window(start_date: date, end_date: date, limit: int):
+        """Release a window claimed with ``claim_window``."""
+        cache.delete(InsightService._window_lock_key(start_date, end_date, limit))
+
+    @staticmethod
+    def track_window(start_date: date, end_date: date, limit: int):
+        """
+        Remember a requested window so refresh_insights keeps its snapshot current.
+
+        The trailing windows of INSIGHT_SUMMARY_WINDOWS are always refreshed
+        and are not recorded.
+        """
+        scheduled = limit == settings.INSIGHT_SUMMARY_LIMIT and any(
+            (start_date, end_date) == InsightService.trailing_window(days)
+            for days in settings.INSIGHT_SUMMARY_WINDOWS
+        )
+        if not scheduled:
+            get_redis_connection('default').zadd(
+                REQUESTED_WINDOWS_KEY,
+                {f"{start_date.isoformat()}:{end_date.isoformat()}:{limit}": time.time()},
+            )
+
+    @staticmethod
+    def requested_windows() -> List[Tuple[date, date, int]]:
+        """
+        Get the most recently requested windows.
+
+        Windows not requested for INSIGHT_REQUESTED_WINDOW_SECONDS are
+        forgotten, and at most INSIGHT_REQUESTED_WINDOWS_MAX are returned.
+
+        Returns:
+            (start_date, end_date, limit) of each window, most recent first
+        """
+        connection = get_redis_connection('default')
+        connection.zremrangebyscore(
+            REQUESTED_WINDOWS_KEY, '-inf', time.time() - settings.INSIGHT_REQUESTED_WINDOW_SECONDS
+        )
+        windows = []
+        for member in connection.zrevrange(REQUESTED_WINDOWS_KEY, 0, settings.INSIGHT_REQUESTED_WINDOWS_MAX - 1):
+            if isinstance(member, bytes):
+                member = member.decode()
+            start_date, end_date, limit = member.split(':')
+            windows.append((date.fromisoformat(start_date), date.fromisoformat(end_date), int(limit)))
+        return windows
+
+    @staticmethod
+    def prune_snapshots(retention_days: int) -> int:
+        """
+        Delete snapshots older than the retention, keeping the latest of each window.
+
+        Returns:
+            Number of deleted snapshots
+        """
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        return DjangoInsightRepository().prune(cutoff.replace(tzinfo=timezone.utc))
+
     def _get_best_campaigns(
         self,
         start_date: datetime,
@@ -122,90 +419,66 @@ class InsightService:
         end_date: datetime,
         limit: int = 10,
     ) -> List[Dict[str, Any]]:
-        """Get underperforming ads (low ROI or high CPA)."""
-        from core.models import Ad, Metric as MetricModel
-        from django.db.models import Sum, F, Q
-        from decimal import Decimal
-
-        # Get ads with metrics in date range
-        ads_with_metrics = MetricModel.objects.filter(
-            date__gte=start_date.date(),
-            date__lte=end_date.date(),
-            ad__isnull=False,
-        ).values('ad_id', 'ad__name').annotate(
-            total_cost=Sum('value', filter=Q(metric_type='cost')),
-            total_revenue=Sum('value', filter=Q(metric_type='revenue')),
-            total_clicks=Sum('value', filter=Q(metric_type='clicks')),
-            total_conversions=Sum('value', filter=Q(metric_type='conversions')),
-        ).filter(total_cost__gt=0).order_by('total_cost')
-
-        underperforming = []
-        for ad_data in ads_with_metrics[:limit * 2]:  # Get more to filter
-            cost = Decimal(str(ad_data['total_cost'] or 0))
-            revenue = Decimal(str(ad_data['total_revenue'] or 0))
-            conversions = int(ad_data['total_conversions'] or 0)
-            
-            if cost == 0:
-                continue
-                
-            roi = ((revenue - cost) / cost * 100) if cost > 0 else Decimal('0')
-            cpa = (cost / conversions) if conversions > 0 else Decimal('999999')
-            
-            # Flag as underperforming if ROI < 0 or CPA > 50
-            if roi < 0 or cpa > 50:
-                underperforming.append({
-                    'ad_id': ad_data['ad_id'],
-                    'ad_name': ad_data['ad__name'],
-                    'roi': float(roi),
-                    'cpa': float(cpa),
-                    'cost': float(cost),
-                    'revenue': float(revenue),
-                })
-                if len(underperforming) >= limit:
-                    break
-
-        return underperforming
+        """Get underperforming ads (ROI < 0 or CPA > 50), worst ROI first, money in micros."""
+        rows = self.analytics_service.clickhouse.get_underperforming_ads(
+            start_date=start_date,
+            end_date=end_date,
+            max_cpa=self.UNDERPERFORMING_MAX_CPA,
+            limit=limit,
+        )
+        if not rows:
+            return []
+
+        conversions = np.array([row['conversions'] for row in rows], dtype=np.float64)
+        metrics = calculate_all_metrics_batch(
+            cost=np.array([row['cost'] for row in rows], dtype=np.int64),
+            revenue=np.array([row['revenue'] for row in rows], dtype=np.int64),
+            clicks=[row['clicks'] for row in rows],
+            impressions=[row['impressions'] for row in rows],
+            conversions=conversions,
+        )
+        # Ads that spent without converting are reported through a sentinel CPA
+        cpa = np.where(conversions > 0, metrics['cpa'], 999999.0 * MICROS_PER_UNIT)
+        names = self.dimensions.get_names('ad', [row['ad_id'] for row in rows])
+
+        return [
+            {
+                'ad_id': row['ad_id'],
+                'ad_name': names.get(row['ad_id'], row['ad_id']),
+                'roi': float(metrics['roi'][i]),
+                'cpa': float(cpa[i]),
+                'cost': row['cost'],
+                'revenue': row['revenue'],
+            }
+            for i, row in enumerate(rows)
+        ]
+
+    def _get_budget_inefficiencies(self, end_date: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Get campaigns off their budget curve as of the window end, projected overspend first."""
+        # Pace on complete days only
+        as_of = min(end_date.date(), datetime.utcnow().date() - timedelta(days=1))
+        flagged = [
+            campaign for campaign in self.budget_pacer.pace_active_campaigns(as_of)
+            if campaign['overspend_projected'] or campaign['over_pacing'] or campaign['under_pacing']
+        ]
+        flagged.sort(key=lambda campaign: (
+            not campaign['overspend_projected'],
+            -campaign['projected_overspend'],
+            -abs(campaign['pacing'] - 1),
+        ))
+        return flagged[:limit]
 
     def _detect_recent_anomalies(
         self,
         start_date: datetime,
         end_date: datetime,
     ) -> List:
-        """Detect recent anomalies across all campaigns."""
-        from core.models import Campaign
+        """Get recent anomalies across all campaigns from the anomalies store."""
         from core.domain.entities import MetricType
-        
-        anomalies = []
-        campaigns = Campaign.objects.all()[:20]  # Limit to avoid too many queries
-        
-        for campaign in campaigns:
-            # Check for anomalies in key metrics
-            for metric_type in [MetricType.COST, MetricType.REVENUE, MetricType.CLICKS]:
-                try:
-                    detected = self.anomaly_detector.detect_anomalies(
-                        metric_type=metric_type,
-                        entity_id=campaign.id,
-                        entity_type='campaign',
-                        lookback_days=30,
-                    )
-                    # Only include recent anomalies
-                    for anomaly in detected:
-                        if start_date <= anomaly.date <= end_date:
-                            anomalies.append(anomaly)
-                except Exception:
-                    # Skip if error (e.g., not enough data)
-                    continue
-        
-        return anomalies
-
-    def _store_insight(self, insight: Insight):
-        """Store insight in database."""
-        InsightModel.objects.create(
-            type=insight.type,
-            title=insight.title,
-            description=insight.description,
-            entity_id=insight.entity_id,
-            entity_type=insight.entity_type,
-            severity=insight.severity,
-            metadata=insight.metadata or {},
+
+        return self.anomaly_detector.get_stored_anomalies(
+            metric_types=[MetricType.COST, MetricType.REVENUE, MetricType.CLICKS],
+            entity_type='campaign',
+            start_date=start_date,
+            end_date=end_date,
         )
@@ -0,0 +1,252 @@
+"""
+Analytics query job service - Application layer.
+
+Long-running queries run as jobs on a dedicated Celery queue instead of in
+the request. Job state and compressed results are kept in the cache with a
+TTL, and identical submissions while a job is in flight share that job.
+"""
+import hashlib
+import json
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from analytics.roi import calculate_all_metrics_batch
+from core.domain.money import micros_to_float
+from core.infrastructure.clickhouse_client import ClickHouseClient
+from core.utils.logging import analytics_logger
+
+JOB_KEY_PREFIX = 'analytics:job'
+
+# Parameters each query accepts
+JOB_QUERIES = {
+    'trends': ('campaign_id', 'platform', 'start_date', 'end_date'),
+    'breakdown': ('entity_type', 'campaign_id', 'platform', 'start_date', 'end_date'),
+}
+
+# Jobs still to finish; submissions identical to one of them join it
+IN_FLIGHT_STATUSES = ('queued', 'running')
+
+
+class QueryJobService:
+    """Service running analytics queries as asynchronous jobs."""
+
+    def __init__(self, clickhouse: Optional[ClickHouseClient] = None):
+        """
+        Args:
+            clickhouse: Shared ClickHouse client (default: built on first run)
+        """
+        self._clickhouse = clickhouse
+
+    @property
+    def clickhouse(self) -> ClickHouseClient:
+        """ClickHouse client, connected only once a job runs."""
+        if self._clickhouse is None:
+            self._clickhouse = ClickHouseClient()
+        return self._clickhouse
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"{JOB_KEY_PREFIX}:{job_id}"
+
+    @staticmethod
+    def _result_key(job_id: str) -> str:
+        return f"{JOB_KEY_PREFIX}:result:{job_id}"
+
+    @staticmethod
+    def _in_flight_key(fingerprint: str) -> str:
+        return f"{JOB_KEY_PREFIX}:inflight:{fingerprint}"
+
+    @staticmethod
+    def normalize(query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate a query's parameters, keeping only those it accepts.
+
+        Raises:
+            ValueError: If the query or a parameter is invalid
+        """
+        if query not in JOB_QUERIES:
+            raise ValueError(f"Unknown query: {query}. Available: {', '.join(JOB_QUERIES)}")
+
+        normalized = {
+            name: str(params[name]) for name in JOB_QUERIES[query]
+            if params.get(name) not in (None, '')
+        }
+        for name in ('start_date', 'end_date'):
+            if name in normalized:
+                datetime.strptime(normalized[name], '%Y-%m-%d')
+        if query == 'breakdown':
+            normalized.setdefault('entity_type', 'ad')
+            if normalized['entity_type'] not in ClickHouseClient.ENTITY_COLUMNS:
+                raise ValueError(
+                    f"Unknown entity_type: {normalized['entity_type']}. "
+                    f"Available: {', '.join(ClickHouseClient.ENTITY_COLUMNS)}"
+                )
+        return normalized
+
+    def submit(self, query: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Create a job, or join the in-flight job of an identical submission.
+
+        The caller queues ``created`` jobs for execution.
+
+        Args:
+            query: Query name in JOB_QUERIES
+            params: Query parameters
+
+        Returns:
+            The job and whether it was created
+
+        Raises:
+            ValueError: If the query or a parameter is invalid
+        """
+        params = self.normalize(query, params)
+        fingerprint = hashlib.sha256(
+            json.dumps({'query': query, 'params': params}, sort_keys=True).encode()
+        ).hexdigest()
+        in_flight_key = self._in_flight_key(fingerprint)
+        job_id = uuid4().hex
+
+        if not cache.add(in_flight_key, job_id, settings.ANALYTICS_JOB_TIMEOUT_SECONDS):
+            existing = self.get(cache.get(in_flight_key) or '')
+            if existing is not None and existing['status'] in IN_FLIGHT_STATUSES:
+                analytics_logger.info(f"Query job {existing['job_id']} reused for identical {query} submission")
+                return existing, False
+            # The previous job is gone without releasing its submission
+            cache.set(in_flight_key, job_id, settings.ANALYTICS_JOB_TIMEOUT_SECONDS)
+
+        job = {
+            'job_id': job_id,
+            'query': query,
+            'params': params,
+            'fingerprint': fingerprint,
+            'status': 'queued',
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'rows': None,
+            'result_bytes': None,
+            'error': None,
+        }
+        self._save(job)
+        return job, True
+
+    def fail(self, job: Dict[str, Any], error: str):
+        """Mark a job that could not be queued as failed."""
+        job.update(status='failed', error=error, finished_at=time.time())
+        self._save(job)
+        self._release(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job, None if unknown or expired."""
+        return cache.get(self._key(job_id)) if job_id else None
+
+    def get_result(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get the rows of a succeeded job, None if unknown or expired."""
+        compressed = cache.get(self._result_key(job_id))
+        if compressed is None:
+            return None
+        return orjson.loads(zlib.decompress(compressed))
+
+    def run(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Run a queued job and store its compressed result.
+
+        The ClickHouse query is tagged with the job ID as query_id.
+
+        Returns:
+            The finished job, None if it expired before it ran
+        """
+        job = self.get(job_id)
+        if job is None:
+            analytics_logger.warning(f"Query job {job_id} expired before it ran")
+            return None
+
+        job.update(status='running', started_at=time.time())
+        self._save(job)
+        try:
+            rows = self._execute(job['query'], job['params'], query_id=job_id)
+            compressed = zlib.compress(orjson.dumps(rows), settings.ANALYTICS_JOB_COMPRESSION_LEVEL)
+            cache.set(self._result_key(job_id), compressed, settings.ANALYTICS_JOB_RESULT_TTL_SECONDS)
+            job.update(status='succeeded', rows=len(rows), result_bytes=len(compressed))
+        except Exception as e:
+            analytics_logger.error(f"Query job {job_id} failed: {str(e)}")
+            job.update(status='failed', error=str(e))
+            raise
+        finally:
+            job['finished_at'] = time.time()
+            self._save(job)
+            self._release(job)
+
+        analytics_logger.info(
+            f"Query job {job_id} returned {job['rows']} rows in "
+            f"{job['finished_at'] - job['started_at']:.1f}s, {job['result_bytes']} bytes compressed"
+        )
+        return job
+
+    def _save(self, job: Dict[str, Any]):
+        """Store a job's state for the result TTL."""
+        cache.set(self._key(job['job_id']), job, settings.ANALYTICS_JOB_RESULT_TTL_SECONDS)
+
+    def _release(self, job: Dict[str, Any]):
+        """End a job's in-flight window, unless a newer job took it over."""
+        in_flight_key = self._in_flight_key(job['fingerprint'])
+        if cache.get(in_flight_key) == job['job_id']:
+            cache.delete(in_flight_key)
+
+    def _execute(self, query: str, params: Dict[str, Any], query_id: str) -> List[Dict[str, Any]]:
+        """Run a query, money in currency units."""
+        start = datetime.strptime(params['start_date'], '%Y-%m-%d') if 'start_date' in params else None
+        end = datetime.strptime(params['end_date'], '%Y-%m-%d') if 'end_date' in params else None
+
+        if query == 'trends':
+            rows = self.clickhouse.get_time_series_metrics(
+                campaign_id=params.get('campaign_id'),
+                platform=params.get('platform'),
+                start_date=start,
+                end_date=end,
+                query_id=query_id,
+            )
+            return [
+                {
+                    **row,
+                    'date': row['date'].isoformat(),
+                    'cost': micros_to_float(row['cost']),
+                    'revenue': micros_to_float(row['revenue']),
+                }
+                for row in rows
+            ]
+
+        rows = self.clickhouse.get_entity_breakdown(
+            entity_type=params['entity_type'],
+            start_date=start,
+            end_date=end,
+            campaign_id=params.get('campaign_id'),
+            platform=params.get('platform'),
+            query_id=query_id,
+        )
+        if not rows:
+            return []
+        metrics = calculate_all_metrics_batch(
+            cost=[row['cost'] for row in rows],
+            revenue=[row['revenue'] for row in rows],
+            clicks=[row['clicks'] for row in rows],
+            impressions=[row['impressions'] for row in rows],
+            conversions=[row['conversions'] for row in rows],
+        )
+        return [
+            {
+                **row,
+                'cost': micros_to_float(row['cost']),
+                'revenue': micros_to_float(row['revenue']),
+                'roi': float(metrics['roi'][i]),
+                'cpc': micros_to_float(float(metrics['cpc'][i])),
+                'cpa': micros_to_float(float(metrics['cpa'][i])),
+                'ctr': float(metrics['ctr'][i]),
+            }
+            for i, row in enumerate(rows)
+        ]
@@ -2,32 +2,102 @@
 Caching utilities using Redis.
 """
 from functools import wraps
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Optional, Dict, List, Iterable
+from datetime import date, datetime, timedelta
 from django.core.cache import cache
+from django_redis import get_redis_connection
+from core.utils.logging import analytics_logger
 import hashlib
+import inspect
 import json
+import time
+from uuid import uuid4
 
 
-def cached_result(key_prefix: str, timeout: int = 300):
+def _encode_argument(value: Any) -> Any:
+    """JSON encoder hook for cache key and access tracking arguments."""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    return str(value)
+
+
+def _decode_argument(value: Dict[str, Any]) -> Any:
+    """JSON object hook reversing ``_encode_argument``."""
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__date__' in value:
+        return date.fromisoformat(value['__date__'])
+    return value
+
+
+def bind_arguments(func: Callable, *args, **kwargs) -> Dict[str, Any]:
+    """
+    Normalize call arguments to a name -> value mapping.
+
+    Defaults are applied and ``self`` is dropped, so positional, keyword and
+    per-instance calls of a method share one cache entry.
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.pop('self', None)
+    return arguments
+
+
+def build_cache_key(
+    key_prefix: str,
+    func: Callable,
+    arguments: Dict[str, Any],
+    versioned: bool = False,
+) -> str:
+    """Build the cache key of a call from its bound arguments."""
+    cache_key = f"{key_prefix}:{func.__name__}"
+    if arguments:
+        key_data = json.dumps(arguments, sort_keys=True, default=_encode_argument)
+        key_hash = hashlib.md5(key_data.encode()).hexdigest()
+        cache_key = f"{cache_key}:{key_hash}"
+    if versioned:
+        cache_key = f"{cache_key}:v{get_data_version()}"
+    return cache_key
+
+
+def cached_result(
+    key_prefix: str,
+    timeout: int = 300,
+    versioned: bool = False,
+    track_access: bool = False,
+):
     """
     Decorator to cache function results.
     
+    The wrapper exposes ``refresh(*args, **kwargs)``, which recomputes the
+    result and overwrites the cache entry without reading it, and
+    ``cache_keys(argument_sets)`` with ``timeout`` for batch callers reading
+    and filling entries themselves.
+
     Args:
         key_prefix: Prefix for cache key
         timeout: Cache timeout in seconds (default: 5 minutes)
+        versioned: Include the global data version in the key, so results
+            are not served across ingestions
+        track_access: Count calls per argument set for cache warming
     """
     def decorator(func: Callable) -> Callable:
+        def refresh(*args, **kwargs):
+            arguments = bind_arguments(func, *args, **kwargs)
+            result = func(*args, **kwargs)
+            cache.set(build_cache_key(key_prefix, func, arguments, versioned), result, timeout)
+            return result
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Generate cache key from function name and arguments
-            cache_key = f"{key_prefix}:{func.__name__}"
-            if args or kwargs:
-                key_data = json.dumps({
-                    'args': str(args),
-                    'kwargs': sorted(kwargs.items())
-                }, sort_keys=True)
-                key_hash = hashlib.md5(key_data.encode()).hexdigest()
-                cache_key = f"{cache_key}:{key_hash}"
+            arguments = bind_arguments(func, *args, **kwargs)
+            cache_key = build_cache_key(key_prefix, func, arguments, versioned)
+            if track_access:
+                record_access(key_prefix, arguments)
             
             # Try to get from cache
             result = cache.get(cache_key)
@@ -39,10 +109,55 @@ def cached_result(key_prefix: str, timeout: int = 300):
             cache.set(cache_key, result, timeout)
             return result
         
+        def cache_keys(argument_sets: Iterable[Dict[str, Any]]) -> List[str]:
+            """Build the cache keys of many bound argument sets, reading the data version once."""
+            suffix = f":v{get_data_version()}" if versioned else ""
+            return [build_cache_key(key_prefix, func, arguments) + suffix for arguments in argument_sets]
+
+        wrapper.refresh = refresh
+        wrapper.cache_keys = cache_keys
+        wrapper.timeout = timeout
         return wrapper
     return decorator
 
 
+ACCESS_FREQUENCY_KEY = 'analytics:access'
+
+
+def record_access(key_prefix: str, arguments: Dict[str, Any]):
+    """Increment the access counter of a cached call."""
+    member = json.dumps(
+        {'key_prefix': key_prefix, 'arguments': arguments},
+        sort_keys=True,
+        default=_encode_argument,
+    )
+    try:
+        get_redis_connection('default').zincrby(ACCESS_FREQUENCY_KEY, 1, member)
+    except Exception as e:
+        # Tracking is best effort and must never fail a request
+        analytics_logger.warning(f"Could not record cache access: {str(e)}")
+
+
+def get_most_accessed(limit: int) -> List[Dict[str, Any]]:
+    """
+    Get the most frequently accessed cached calls.
+
+    Returns:
+        Entries with ``key_prefix`` and decoded ``arguments``, most used first
+    """
+    members = get_redis_connection('default').zrevrange(ACCESS_FREQUENCY_KEY, 0, limit - 1)
+    return [json.loads(member, object_hook=_decode_argument) for member in members]
+
+
+def decay_access_counts(factor: float = 0.5, keep: int = 1000):
+    """Age access counters and drop the long tail, so recent usage dominates."""
+    redis = get_redis_connection('default')
+    pipeline = redis.pipeline()
+    pipeline.zunionstore(ACCESS_FREQUENCY_KEY, {ACCESS_FREQUENCY_KEY: factor})
+    pipeline.zremrangebyrank(ACCESS_FREQUENCY_KEY, 0, -(keep + 1))
+    pipeline.execute()
+
+
 def invalidate_cache(pattern: str):
     """
     Invalidate cache entries matching pattern.
@@ -53,3 +168,190 @@ def invalidate_cache(pattern: str):
     # In production, implement proper cache invalidation
     # For now, this is a placeholder
     pass
+
+
+DATA_VERSION_PREFIX = 'data_version'
+
+
+def _data_version_key(campaign_id: Optional[str] = None) -> str:
+    """Build the data version key for a campaign or the whole dataset."""
+    if campaign_id:
+        return f"{DATA_VERSION_PREFIX}:campaign:{campaign_id}"
+    return f"{DATA_VERSION_PREFIX}:global"
+
+
+def get_data_version(campaign_id: Optional[str] = None) -> float:
+    """
+    Get the data version watermark (timestamp of the last ingestion).
+
+    A missing watermark is initialized to the current time, so clients
+    never keep a response from before the watermark existed.
+    """
+    key = _data_version_key(campaign_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key) or time.time()
+    return version
+
+
+def bump_data_version(campaign_ids: Iterable[str]):
+    """Advance the global and per-campaign watermarks after an ingestion."""
+    now = time.time()
+    versions = {_data_version_key(): now}
+    for campaign_id in campaign_ids:
+        if campaign_id:
+            versions[_data_version_key(campaign_id)] = now
+    cache.set_many(versions, None)
+
+
+MATERIALIZED_VERSION_PREFIX = 'materialized_version'
+
+
+def get_materialized_version(name: str) -> float:
+    """
+    Get the watermark of a materialized result set (timestamp of its last refresh).
+
+    Results refreshed by background jobs change independently of ingestion,
+    so their conditional responses follow this watermark instead.
+    """
+    key = f"{MATERIALIZED_VERSION_PREFIX}:{name}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        version = cache.get(key) or time.time()
+    return version
+
+
+def bump_materialized_version(name: str):
+    """Advance the watermark of a materialized result set after a refresh."""
+    cache.set(f"{MATERIALIZED_VERSION_PREFIX}:{name}", time.time(), None)
+
+
+class DailyAggregateCache:
+    """
+    Day-bucketed cache of aggregated metrics.
+
+    Each bucket holds the sums for one day under one (campaign, platform)
+    filter, so any date range is assembled from cached days and only the
+    missing days are fetched, in a single query, from the loader.
+
+    Buckets are stored under their day's version, which invalidation
+    replaces. A bucket loaded before an invalidation but stored after it
+    lands under the old version, which no later read uses.
+    """
+
+    KEY_PREFIX = 'analytics:day'
+    # Outlives any bucket, so a bucket never outlasts its version
+    VERSION_TIMEOUT = 7 * 24 * 3600
+    SUM_FIELDS = ('impressions', 'clicks', 'cost', 'conversions', 'revenue')
+
+    def __init__(
+        self,
+        loader: Callable[..., Dict[date, Dict[str, Any]]],
+        timeout: int = 3600,
+        max_days: int = 731,
+    ):
+        """
+        Args:
+            loader: Callable ``(days, campaign_id=..., platform=...)`` returning
+                a mapping of day to summed metrics for the days with data
+            timeout: Bucket timeout in seconds (default: 1 hour)
+            max_days: Largest range served from buckets
+        """
+        self.loader = loader
+        self.timeout = timeout
+        self.max_days = max_days
+
+    @classmethod
+    def make_key(
+        cls,
+        day: date,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+    ) -> str:
+        """Build the cache key of a single day bucket."""
+        return f"{cls.KEY_PREFIX}:{campaign_id or '*'}:{platform or '*'}:{day.isoformat()}"
+
+    @staticmethod
+    def _version_key(key: str) -> str:
+        return f"{key}:version"
+
+    def supports(self, start_date: date, end_date: date) -> bool:
+        """Check whether a range is small enough to assemble from buckets."""
+        return 0 <= (end_date - start_date).days < self.max_days
+
+    def get_days(
+        self,
+        start_date: date,
+        end_date: date,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get per-day sums for an inclusive date range.
+
+        Returns:
+            One entry per day that has data, ordered by date
+        """
+        days = [
+            start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)
+        ]
+        # Versions are read before loading, see the class docstring
+        day_keys = {day: self.make_key(day, campaign_id, platform) for day in days}
+        versions = cache.get_many([self._version_key(key) for key in day_keys.values()])
+        keys = {
+            day: f"{key}:v{versions.get(self._version_key(key), 0)}"
+            for day, key in day_keys.items()
+        }
+        cached = cache.get_many(list(keys.values()))
+
+        missing = [day for day in days if keys[day] not in cached]
+        if missing:
+            loaded = self.loader(missing, campaign_id=campaign_id, platform=platform)
+            # Days without data are stored as empty buckets so they are not refetched
+            fresh = {keys[day]: loaded.get(day, {}) for day in missing}
+            cache.set_many(fresh, self.timeout)
+            cached.update(fresh)
+
+        return [cached[keys[day]] for day in days if cached[keys[day]]]
+
+    def get_totals(
+        self,
+        start_date: date,
+        end_date: date,
+        campaign_id: Optional[str] = None,
+        platform: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Get metric sums over an inclusive date range."""
+        totals = {field: 0 for field in self.SUM_FIELDS}
+        for bucket in self.get_days(start_date, end_date, campaign_id, platform):
+            for field in self.SUM_FIELDS:
+                totals[field] += bucket[field]
+        return totals
+
+    @classmethod
+    def invalidate(cls, records: Iterable[Dict[str, Any]]):
+        """
+        Drop the buckets touched by newly ingested records.
+
+        Every record invalidates its day under the exact, campaign-only,
+        platform-only and unfiltered keys.
+        """
+        keys = set()
+        for record in records:
+            day = record.get('date')
+            if isinstance(day, str):
+                day = datetime.strptime(day, '%Y-%m-%d').date()
+            elif isinstance(day, datetime):
+                day = day.date()
+            if not day:
+                continue
+            campaign_id = record.get('campaign_id') or None
+            platform = record.get('platform') or None
+            for key_campaign in {campaign_id, None}:
+                for key_platform in {platform, None}:
+                    keys.add(cls.make_key(day, key_campaign, key_platform))
+        if keys:
+            cache.set_many({cls._version_key(key): uuid4().hex for key in keys}, cls.VERSION_TIMEOUT)
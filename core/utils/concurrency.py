@@ -0,0 +1,123 @@
+"""
+Concurrent execution of independent computation stages.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from django.conf import settings
+from django.db import connections
+from core.utils.logging import analytics_logger
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class StageResult:
+    """Outcome of one stage."""
+    name: str
+    status: str = "ok"  # "ok", "timeout", "error"
+    value: Any = None
+    duration_ms: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the stage produced a value."""
+        return self.status == "ok"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize the stage for response metadata."""
+        summary = {'status': self.status, 'duration_ms': round(self.duration_ms, 1)}
+        if self.error:
+            summary['error'] = self.error
+        return summary
+
+
+def get_stage_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide bounded pool running stages.
+
+    The pool is rebuilt if STAGE_EXECUTOR_WORKERS changed since it was
+    created; stages already submitted to the old pool still finish.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        workers = settings.STAGE_EXECUTOR_WORKERS
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stage')
+            _executor_workers = workers
+        return _executor
+
+
+def _run_stage(func: Callable[[], Any]) -> Tuple[Any, float]:
+    """Run a stage in a pool thread, releasing the thread's database connections."""
+    stage_started = time.monotonic()
+    try:
+        return func(), (time.monotonic() - stage_started) * 1000
+    except Exception as e:
+        e.stage_duration_ms = (time.monotonic() - stage_started) * 1000
+        raise
+    finally:
+        connections.close_all()
+
+
+def run_stages(
+    stages: Dict[str, Callable[[], Any]],
+    timeouts: Union[float, Dict[str, float]],
+) -> Dict[str, StageResult]:
+    """
+    Run independent stages concurrently, each with its own timeout.
+
+    A stage that fails or exceeds its timeout is reported as such instead of
+    failing the others. Timed out stages are abandoned, not interrupted, and
+    keep their pool thread until they finish.
+
+    Args:
+        stages: Callables without arguments, by stage name
+        timeouts: Seconds allowed per stage, counted from submission, as one
+            value for all stages or per stage name
+
+    Returns:
+        Results by stage name, in the order of ``stages``
+    """
+    executor = get_stage_executor()
+    started = time.monotonic()
+    # Stages see the caller's context variables, e.g. service overrides
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _run_stage, func)
+        for name, func in stages.items()
+    }
+
+    results = {}
+    for name, future in futures.items():
+        timeout = timeouts[name] if isinstance(timeouts, dict) else timeouts
+        remaining = max(started + timeout - time.monotonic(), 0)
+        try:
+            value, duration_ms = future.result(timeout=remaining)
+            results[name] = StageResult(name=name, value=value, duration_ms=duration_ms)
+        except FutureTimeoutError:
+            future.cancel()
+            results[name] = StageResult(
+                name=name,
+                status="timeout",
+                duration_ms=timeout * 1000,
+                error=f"Timed out after {timeout}s",
+            )
+            analytics_logger.warning(f"Stage {name} timed out after {timeout}s")
+        except Exception as e:
+            results[name] = StageResult(
+                name=name,
+                status="error",
+                duration_ms=getattr(e, 'stage_duration_ms', 0.0),
+                error=str(e),
+            )
+            analytics_logger.error(f"Stage {name} failed: {str(e)}")
+
+    return results
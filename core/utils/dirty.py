@@ -0,0 +1,71 @@
+"""
+Tracking of entities whose data changed since derived results were computed.
+
+Ingestion marks the entities of every stored record. Each consumer (e.g. the
+anomaly detection or insight jobs) drains its own Redis sets, so consumers
+running on different schedules never steal each other's work.
+"""
+from typing import Any, Dict, Iterable, Set
+from django.conf import settings
+from django_redis import get_redis_connection
+
+DIRTY_KEY_PREFIX = 'dirty'
+
+# Record field identifying each entity type
+ENTITY_FIELDS = {
+    'campaign': 'campaign_id',
+    'adgroup': 'ad_group_id',
+    'ad': 'ad_id',
+}
+
+
+def _dirty_key(consumer: str, entity_type: str) -> str:
+    """Build the key of a consumer's set of changed entities."""
+    return f"{DIRTY_KEY_PREFIX}:{consumer}:{entity_type}"
+
+
+def mark_dirty(records: Iterable[Dict[str, Any]]):
+    """
+    Mark the entities of ingested records as changed for every consumer.
+
+    Consumers and the entity types they track are configured in the
+    DIRTY_ENTITY_CONSUMERS setting.
+
+    Args:
+        records: Ingested metric records
+    """
+    changed = {entity_type: set() for entity_type in ENTITY_FIELDS}
+    for record in records:
+        for entity_type, field in ENTITY_FIELDS.items():
+            if record.get(field):
+                changed[entity_type].add(record[field])
+
+    pipeline = get_redis_connection('default').pipeline(transaction=False)
+    for consumer, entity_types in settings.DIRTY_ENTITY_CONSUMERS.items():
+        for entity_type in entity_types:
+            entity_ids = changed.get(entity_type)
+            if entity_ids:
+                pipeline.sadd(_dirty_key(consumer, entity_type), *entity_ids)
+    pipeline.execute()
+
+
+def drain_dirty(consumer: str, entity_type: str) -> Set[str]:
+    """
+    Atomically take the entities changed since the consumer's last drain.
+
+    Returns:
+        Changed entity ids
+    """
+    key = _dirty_key(consumer, entity_type)
+    pipeline = get_redis_connection('default').pipeline(transaction=True)
+    pipeline.smembers(key)
+    pipeline.delete(key)
+    members, _ = pipeline.execute()
+    return {member.decode() if isinstance(member, bytes) else member for member in members}
+
+
+def restore_dirty(consumer: str, entity_type: str, entity_ids: Iterable[str]):
+    """Put drained entities back, e.g. after the consumer failed to process them."""
+    entity_ids = list(entity_ids)
+    if entity_ids:
+        get_redis_connection('default').sadd(_dirty_key(consumer, entity_type), *entity_ids)
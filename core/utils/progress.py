@@ -0,0 +1,189 @@
+"""
+Progress tracking of ingestion tasks in Redis.
+
+The worker writes status, record counts, per-stage timings and error samples
+to one Redis hash per task, so clients can poll a single cheap key instead of
+the Celery result backend. Progress is best effort: failing to record it
+never fails the ingestion.
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from django.conf import settings
+from django_redis import get_redis_connection
+from core.utils.logging import ingestion_logger
+
+PROGRESS_KEY_PREFIX = 'ingest:progress'
+
+# Sorted set of queued and running task ids, scored by queue time
+BACKLOG_KEY = 'ingest:backlog'
+
+# Ingestion stages, in execution order
+STAGES = ('parse', 'dimensions', 'postgres', 'clickhouse')
+
+MAX_ERROR_SAMPLES = 10
+
+
+def _decode(value: Any) -> Any:
+    """Decode a Redis reply value."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class IngestionProgress:
+    """Progress of one ingestion task; without a task id every call is a no-op."""
+
+    def __init__(self, task_id: Optional[str]):
+        self.task_id = task_id
+
+    @property
+    def key(self) -> str:
+        """Key of the progress hash."""
+        return f"{PROGRESS_KEY_PREFIX}:{self.task_id}"
+
+    @property
+    def errors_key(self) -> str:
+        """Key of the error samples list."""
+        return f"{self.key}:errors"
+
+    def _write(self, fields: Optional[Dict[str, Any]] = None, increments: Optional[Dict[str, float]] = None):
+        """Set and increment hash fields in one round trip, refreshing the TTL."""
+        if not self.task_id:
+            return
+        try:
+            pipeline = get_redis_connection('default').pipeline(transaction=False)
+            if fields:
+                pipeline.hset(self.key, mapping=fields)
+            for field, amount in (increments or {}).items():
+                if isinstance(amount, int):
+                    pipeline.hincrby(self.key, field, amount)
+                else:
+                    pipeline.hincrbyfloat(self.key, field, amount)
+            pipeline.expire(self.key, settings.INGESTION_PROGRESS_TTL_SECONDS)
+            pipeline.execute()
+        except Exception as e:
+            ingestion_logger.warning(f"Could not record progress of task {self.task_id}: {str(e)}")
+
+    def queue(self, total: int, parse_ms: float = 0.0):
+        """Register a task accepted by the API and add it to the backlog."""
+        queued_at = time.time()
+        self._write({
+            'status': 'queued',
+            'total': total,
+            'processed': 0,
+            'queued_at': queued_at,
+            'stage_ms:parse': round(parse_ms, 1),
+        })
+        self._update_backlog(queued_at)
+
+    def start(self, total: int):
+        """Mark the task as picked up by a worker."""
+        self._write({'status': 'running', 'total': total, 'started_at': time.time()})
+
+    def advance(self, count: int):
+        """Count records as fully processed."""
+        self._write(increments={'processed': count})
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage; repeated stages (e.g. per chunk) add up."""
+        self._write({'stage': name})
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._write(increments={f'stage_ms:{name}': round((time.monotonic() - started) * 1000, 1)})
+
+    def add_error(self, message: str):
+        """Record an error sample, keeping the first MAX_ERROR_SAMPLES."""
+        if not self.task_id:
+            return
+        try:
+            pipeline = get_redis_connection('default').pipeline(transaction=False)
+            pipeline.hincrby(self.key, 'error_count', 1)
+            pipeline.rpush(self.errors_key, message[:500])
+            pipeline.ltrim(self.errors_key, 0, MAX_ERROR_SAMPLES - 1)
+            pipeline.expire(self.errors_key, settings.INGESTION_PROGRESS_TTL_SECONDS)
+            pipeline.execute()
+        except Exception as e:
+            ingestion_logger.warning(f"Could not record error of task {self.task_id}: {str(e)}")
+
+    def finish(self, result: Dict[str, Any]):
+        """Mark the task as succeeded with its result."""
+        self._write({
+            'status': 'succeeded',
+            'stage': '',
+            'finished_at': time.time(),
+            'result': json.dumps(result),
+        })
+        self._update_backlog(None)
+
+    def fail(self, error: Exception):
+        """Mark the task as failed."""
+        self.add_error(str(error))
+        self._write({'status': 'failed', 'finished_at': time.time()})
+        self._update_backlog(None)
+
+    def _update_backlog(self, queued_at: Optional[float]):
+        """Add the task to the backlog, or remove it without a queue time."""
+        if not self.task_id:
+            return
+        try:
+            connection = get_redis_connection('default')
+            if queued_at is None:
+                connection.zrem(BACKLOG_KEY, self.task_id)
+            else:
+                connection.zadd(BACKLOG_KEY, {self.task_id: queued_at})
+        except Exception as e:
+            ingestion_logger.warning(f"Could not update backlog for task {self.task_id}: {str(e)}")
+
+    @staticmethod
+    def backlog() -> int:
+        """
+        Count ingestion tasks queued or running.
+
+        Tasks older than INGESTION_BACKLOG_STALE_SECONDS are dropped from the
+        count, so a worker lost mid-task does not hold the backlog up forever.
+        """
+        pipeline = get_redis_connection('default').pipeline(transaction=False)
+        pipeline.zremrangebyscore(BACKLOG_KEY, '-inf', time.time() - settings.INGESTION_BACKLOG_STALE_SECONDS)
+        pipeline.zcard(BACKLOG_KEY)
+        return int(pipeline.execute()[-1])
+
+    @classmethod
+    def get(cls, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the progress of a task.
+
+        Returns:
+            Status, counts, stage timings in ms, error samples and result, or
+            None for unknown or expired tasks
+        """
+        progress = cls(task_id)
+        pipeline = get_redis_connection('default').pipeline(transaction=False)
+        pipeline.hgetall(progress.key)
+        pipeline.lrange(progress.errors_key, 0, -1)
+        raw, errors = pipeline.execute()
+        if not raw:
+            return None
+
+        fields = {_decode(field): _decode(value) for field, value in raw.items()}
+        timestamps = {
+            name: float(fields[name]) if name in fields else None
+            for name in ('queued_at', 'started_at', 'finished_at')
+        }
+        return {
+            'task_id': task_id,
+            'status': fields.get('status', 'queued'),
+            'stage': fields.get('stage') or None,
+            'total': int(fields.get('total', 0)),
+            'processed': int(fields.get('processed', 0)),
+            'stages_ms': {
+                name: float(fields[f'stage_ms:{name}'])
+                for name in STAGES if f'stage_ms:{name}' in fields
+            },
+            'error_count': int(fields.get('error_count', 0)),
+            'errors': [_decode(error) for error in errors],
+            'result': json.loads(fields['result']) if fields.get('result') else None,
+            **timestamps,
+        }
@@ -1,16 +1,29 @@
 """
 Celery tasks for async data ingestion.
 """
+from collections import Counter
 from celery import shared_task
 from typing import List, Dict, Any
+from django.conf import settings
 from core.services.ingestion_service import IngestionService
 from core.infrastructure.clickhouse_client import ClickHouseClient
+from core.utils.cache import DailyAggregateCache, bump_data_version
+from core.domain.money import to_micros
+from core.utils.dirty import mark_dirty
+from core.utils.logging import ingestion_logger
+from core.utils.progress import IngestionProgress
+from analytics.online_stats import OnlineAnomalyStore
 
 
-@shared_task
-def ingest_marketing_data(data: List[Dict[str, Any]]) -> Dict[str, Any]:
+@shared_task(bind=True)
+def ingest_marketing_data(self, data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Async task to ingest marketing data.
+
+    Records are processed in chunks of INGESTION_CHUNK_SIZE, reporting
+    progress and stage timings to the task's Redis progress hash. Each
+    chunk is committed as it goes, so the data version of its campaigns is
+    bumped once it is stored, even if a later chunk fails.
     
     Args:
         data: List of marketing data records
@@ -18,18 +31,64 @@ def ingest_marketing_data(data: List[Dict[str, Any]]) -> Dict[str, Any]:
     Returns:
         Dictionary with ingestion results
     """
-    service = IngestionService()
-    result = service.normalize_and_store(data)
+    progress = IngestionProgress(self.request.id)
+    progress.start(len(data))
 
-    # Also store in ClickHouse for analytics
+    service = IngestionService()
     clickhouse = ClickHouseClient()
-    clickhouse_metrics = _prepare_clickhouse_metrics(data)
-    if clickhouse_metrics:
-        clickhouse.insert_metrics(clickhouse_metrics)
+    result = Counter()
+    try:
+        for offset in range(0, len(data), settings.INGESTION_CHUNK_SIZE):
+            chunk = data[offset:offset + settings.INGESTION_CHUNK_SIZE]
+            try:
+                result.update(service.normalize_and_store(chunk, progress=progress))
+
+                # Also store in ClickHouse for analytics
+                with progress.stage('clickhouse'):
+                    _store_clickhouse_metrics(clickhouse, chunk, progress)
+            finally:
+                # Part of the chunk may be stored even if it failed
+                bump_data_version({record.get('campaign_id') for record in chunk})
+            progress.advance(len(chunk))
+    except Exception as e:
+        ingestion_logger.error(f"Ingestion task {self.request.id} failed: {str(e)}")
+        progress.fail(e)
+        raise
 
+    result = {
+        key: result[key]
+        for key in ('campaigns_created', 'ad_groups_created', 'ads_created', 'metrics_created')
+    }
+    progress.finish(result)
     return result
 
 
+def _store_clickhouse_metrics(
+    clickhouse: ClickHouseClient,
+    data: List[Dict[str, Any]],
+    progress: IngestionProgress,
+):
+    """Insert records into ClickHouse and update the data derived from them."""
+    clickhouse_metrics = _prepare_clickhouse_metrics(data)
+    if not clickhouse_metrics:
+        return
+
+    clickhouse.insert_metrics(clickhouse_metrics)
+    DailyAggregateCache.invalidate(clickhouse_metrics)
+    try:
+        OnlineAnomalyStore().update(clickhouse_metrics)
+    except Exception as e:
+        # Scores are derived data; ingestion must not fail on them
+        ingestion_logger.error(f"Error updating online anomaly statistics: {str(e)}")
+        progress.add_error(f"Online anomaly statistics: {str(e)}")
+    try:
+        mark_dirty(clickhouse_metrics)
+    except Exception as e:
+        # A full scheduled run still picks up the change
+        ingestion_logger.error(f"Error marking changed entities: {str(e)}")
+        progress.add_error(f"Changed entity tracking: {str(e)}")
+
+
 def _prepare_clickhouse_metrics(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Prepare metrics for ClickHouse insertion."""
     metrics = []
@@ -44,9 +103,9 @@ def _prepare_clickhouse_metrics(data: List[Dict[str, Any]]) -> List[Dict[str, An
             'platform': record.get('platform', 'unknown'),
             'impressions': int(record.get('impressions', 0)),
             'clicks': int(record.get('clicks', 0)),
-            'cost': float(record.get('cost', 0)),
+            'cost_micros': to_micros(record.get('cost')),
             'conversions': int(record.get('conversions', 0)),
-            'revenue': float(record.get('revenue', 0)),
+            'revenue_micros': to_micros(record.get('revenue')),
         }
         metrics.append(metric_record)
     
@@ -8,3 +8,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'insightflow.settings')
 
 application = get_asgi_application()
+
+# Connect services at startup, not on the first request
+from core.container import container  # noqa: E402
+
+container.warm()
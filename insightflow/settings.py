@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -108,6 +109,116 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Async analytics query jobs run on their own queue (see docker-compose celery-analytics)
+ANALYTICS_JOB_QUEUE = os.environ.get('ANALYTICS_JOB_QUEUE', 'analytics_jobs')
+ANALYTICS_JOB_TIMEOUT_SECONDS = int(os.environ.get('ANALYTICS_JOB_TIMEOUT_SECONDS', '1800'))
+ANALYTICS_JOB_RESULT_TTL_SECONDS = int(os.environ.get('ANALYTICS_JOB_RESULT_TTL_SECONDS', '3600'))
+ANALYTICS_JOB_COMPRESSION_LEVEL = int(os.environ.get('ANALYTICS_JOB_COMPRESSION_LEVEL', '6'))
+CELERY_TASK_ROUTES = {
+    'analytics.tasks.run_query_job': {'queue': ANALYTICS_JOB_QUEUE},
+}
+
+# Ingestion: records per processing chunk and lifetime of task progress records
+INGESTION_CHUNK_SIZE = int(os.environ.get('INGESTION_CHUNK_SIZE', '5000'))
+INGESTION_PROGRESS_TTL_SECONDS = int(os.environ.get('INGESTION_PROGRESS_TTL_SECONDS', '86400'))
+
+# Ingestion admission control: most queued or running tasks before new uploads get 503,
+# their Retry-After, and the age after which a task no longer counts (lost worker)
+INGESTION_BACKLOG_MAX_TASKS = int(os.environ.get('INGESTION_BACKLOG_MAX_TASKS', '20'))
+INGESTION_BACKLOG_RETRY_AFTER_SECONDS = int(os.environ.get('INGESTION_BACKLOG_RETRY_AFTER_SECONDS', '30'))
+INGESTION_BACKLOG_STALE_SECONDS = int(os.environ.get('INGESTION_BACKLOG_STALE_SECONDS', '3600'))
+
+# Cache warming after ingestion
+CACHE_WARM_TOP_N = int(os.environ.get('CACHE_WARM_TOP_N', '50'))
+CACHE_WARM_CONCURRENCY = int(os.environ.get('CACHE_WARM_CONCURRENCY', '2'))
+CACHE_WARM_BUDGET_SECONDS = int(os.environ.get('CACHE_WARM_BUDGET_SECONDS', '120'))
+CACHE_WARM_DELAY_SECONDS = int(os.environ.get('CACHE_WARM_DELAY_SECONDS', '30'))
+
+# Most campaigns one batch analytics request may ask for
+ANALYTICS_BATCH_MAX_CAMPAIGNS = int(os.environ.get('ANALYTICS_BATCH_MAX_CAMPAIGNS', '500'))
+
+# Scheduled anomaly detection into the ClickHouse anomalies store
+ANOMALY_DETECTION_METHOD = os.environ.get('ANOMALY_DETECTION_METHOD', 'zscore')
+ANOMALY_DETECTION_LOOKBACK_DAYS = int(os.environ.get('ANOMALY_DETECTION_LOOKBACK_DAYS', '30'))
+ANOMALY_DETECTION_INTERVAL_SECONDS = int(os.environ.get('ANOMALY_DETECTION_INTERVAL_SECONDS', '3600'))
+ANOMALY_DETECTION_ENTITY_TYPES = os.environ.get('ANOMALY_DETECTION_ENTITY_TYPES', 'campaign').split(',')
+
+# Online anomaly statistics: unset for Welford, or an exponential weighting factor
+ANOMALY_ONLINE_ALPHA = (
+    float(os.environ['ANOMALY_ONLINE_ALPHA']) if os.environ.get('ANOMALY_ONLINE_ALPHA') else None
+)
+# Entity types tracked at ingestion time; others are detected from ClickHouse
+ANOMALY_ONLINE_ENTITY_TYPES = os.environ.get('ANOMALY_ONLINE_ENTITY_TYPES', 'campaign').split(',')
+# Entries of entities without new data expire after three detection windows
+ANOMALY_ONLINE_TTL_SECONDS = int(os.environ.get(
+    'ANOMALY_ONLINE_TTL_SECONDS', str(3 * ANOMALY_DETECTION_LOOKBACK_DAYS * 86400)
+))
+ANOMALY_ONLINE_LOCK_TIMEOUT_SECONDS = int(os.environ.get('ANOMALY_ONLINE_LOCK_TIMEOUT_SECONDS', '10'))
+
+# Materialized insight snapshots of trailing windows (days)
+INSIGHT_SUMMARY_WINDOWS = [7, 30]
+INSIGHT_SUMMARY_LIMIT = 10
+INSIGHT_REFRESH_INTERVAL_SECONDS = int(os.environ.get('INSIGHT_REFRESH_INTERVAL_SECONDS', '3600'))
+INSIGHT_SNAPSHOT_RETENTION_DAYS = int(os.environ.get('INSIGHT_SNAPSHOT_RETENTION_DAYS', '7'))
+# One request or task materializes a window at a time; the others retry after a while
+INSIGHT_MATERIALIZE_LOCK_SECONDS = int(os.environ.get('INSIGHT_MATERIALIZE_LOCK_SECONDS', '300'))
+INSIGHT_MATERIALIZE_RETRY_AFTER_SECONDS = int(os.environ.get('INSIGHT_MATERIALIZE_RETRY_AFTER_SECONDS', '5'))
+# Other requested windows are refreshed after ingestion until unrequested for this long
+INSIGHT_REQUESTED_WINDOW_SECONDS = int(os.environ.get('INSIGHT_REQUESTED_WINDOW_SECONDS', str(7 * 24 * 3600)))
+INSIGHT_REQUESTED_WINDOWS_MAX = int(os.environ.get('INSIGHT_REQUESTED_WINDOWS_MAX', '50'))
+
+# Concurrent computation stages: shared pool size and insight stage timeouts (seconds)
+STAGE_EXECUTOR_WORKERS = int(os.environ.get('STAGE_EXECUTOR_WORKERS', '8'))
+INSIGHT_STAGE_TIMEOUTS = {
+    'best_campaigns': 10,
+    'underperforming_ads': 10,
+    'anomalies': 15,
+    'budget': 10,
+}
+
+# Dashboard section timeouts (seconds); late sections are returned as timed out
+DASHBOARD_SECTION_TIMEOUTS = {
+    'roi': 5,
+    'trends': 5,
+    'top_campaigns': 5,
+    'insights': 10,
+}
+
+# Budget pacing: 'linear' or 'day_weighted' curve, on-pace tolerance and run-rate window (days);
+# day-weighted curves learn weekday weights (Monday first) from recent spend unless set
+BUDGET_PACING_CURVE = os.environ.get('BUDGET_PACING_CURVE', 'linear')
+BUDGET_PACING_TOLERANCE = float(os.environ.get('BUDGET_PACING_TOLERANCE', '0.1'))
+BUDGET_PACING_RECENT_DAYS = int(os.environ.get('BUDGET_PACING_RECENT_DAYS', '7'))
+BUDGET_PACING_WEEKDAY_WEIGHTS = None
+
+# Entities changed by ingestion, recomputed by each consumer job
+DIRTY_ENTITY_INTERVAL_SECONDS = int(os.environ.get('DIRTY_ENTITY_INTERVAL_SECONDS', '60'))
+DIRTY_ENTITY_CONSUMERS = {
+    'anomalies': ANOMALY_DETECTION_ENTITY_TYPES,
+    'insights': ['campaign'],
+}
+
+CELERY_BEAT_SCHEDULE = {
+    # Full runs keep the windows sliding as days pass
+    'detect-anomalies': {
+        'task': 'analytics.tasks.detect_and_store_anomalies',
+        'schedule': ANOMALY_DETECTION_INTERVAL_SECONDS,
+    },
+    'refresh-insights': {
+        'task': 'analytics.tasks.refresh_insights',
+        'schedule': INSIGHT_REFRESH_INTERVAL_SECONDS,
+        'kwargs': {'force': True},
+    },
+    'prune-insight-snapshots': {
+        'task': 'analytics.tasks.prune_insight_snapshots',
+        'schedule': 24 * 3600,
+    },
+    'process-dirty-entities': {
+        'task': 'analytics.tasks.process_dirty_entities',
+        'schedule': DIRTY_ENTITY_INTERVAL_SECONDS,
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -145,6 +256,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_FILTER_BACKENDS': [
@@ -152,8 +267,30 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.CheapRateThrottle',
+    ),
 }
 
+# Token buckets per user (or client address) and endpoint class: burst capacity and refill rate
+THROTTLE_BUCKETS = {
+    'cheap': {
+        'capacity': int(os.environ.get('THROTTLE_CHEAP_CAPACITY', '120')),
+        'refill_per_second': float(os.environ.get('THROTTLE_CHEAP_REFILL_PER_SECOND', '2')),
+    },
+    'expensive': {
+        'capacity': int(os.environ.get('THROTTLE_EXPENSIVE_CAPACITY', '20')),
+        'refill_per_second': float(os.environ.get('THROTTLE_EXPENSIVE_REFILL_PER_SECOND', '0.2')),
+    },
+}
+
+# Largest page_size clients may request from cursor-paginated views
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '1000'))
+
+# Responses of at least this many bytes are compressed (brotli if available, else gzip)
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('RESPONSE_COMPRESSION_BROTLI_QUALITY', '5'))
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
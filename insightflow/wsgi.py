@@ -8,3 +8,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'insightflow.settings')
 
 application = get_wsgi_application()
+
+# Connect services at startup, not on the first request
+from core.container import container  # noqa: E402
+
+container.warm()
@@ -3,11 +3,13 @@ Tests for analytics calculations.
 """
 import pytest
 from decimal import Decimal
+import numpy as np
 from analytics.roi import (
     calculate_roi,
     calculate_cpc,
     calculate_cpa,
     calculate_ctr,
+    calculate_all_metrics_batch,
 )
 
 
@@ -38,3 +40,31 @@ class TestROICalculations:
         """Test CTR calculation."""
         ctr = calculate_ctr(50, 1000)
         assert ctr == Decimal('5')
+
+
+class TestBatchCalculations:
+    """Tests for vectorized metric calculations."""
+
+    def test_batch_matches_scalar(self):
+        """Test batch results match the scalar functions."""
+        cost = [Decimal('100'), Decimal('0'), Decimal('40.50')]
+        revenue = [Decimal('150'), Decimal('10'), Decimal('12.25')]
+        clicks = [50, 0, 9]
+        impressions = [1000, 0, 300]
+        conversions = [10, 3, 0]
+
+        metrics = calculate_all_metrics_batch(cost, revenue, clicks, impressions, conversions)
+
+        for i in range(3):
+            assert metrics['roi'][i] == pytest.approx(float(calculate_roi(cost[i], revenue[i])))
+            assert metrics['cpc'][i] == pytest.approx(float(calculate_cpc(cost[i], clicks[i])))
+            assert metrics['cpa'][i] == pytest.approx(float(calculate_cpa(cost[i], conversions[i])))
+            assert metrics['ctr'][i] == pytest.approx(float(calculate_ctr(clicks[i], impressions[i])))
+
+    def test_batch_zero_denominators(self):
+        """Test zero denominators yield 0 without warnings."""
+        zeros = np.zeros(4)
+        with np.errstate(all='raise'):
+            metrics = calculate_all_metrics_batch(zeros, np.ones(4), zeros, zeros, zeros)
+        for values in metrics.values():
+            assert not values.any()
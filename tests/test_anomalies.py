@@ -0,0 +1,411 @@
+"""
+Tests for anomaly detection.
+"""
+import pytest
+import statistics
+import numpy as np
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from redis.exceptions import LockNotOwnedError
+from analytics.anomalies import AnomalyDetector
+from analytics.detectors import (
+    ZScoreDetector, RollingZScoreDetector, RobustMADDetector, SeasonalDetector,
+    get_detector_strategy,
+)
+from analytics.online_stats import RunningStats, OnlineAnomalyStore
+from core.domain.entities import MetricType
+from core.infrastructure.clickhouse_client import ClickHouseClient
+
+
+METRIC_NAMES = ['impressions', 'clicks', 'cost', 'conversions', 'revenue']
+
+
+class FakeClickHouse:
+    """In-memory stand-in for ClickHouseClient series queries."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (entity_id, date, impressions, clicks, cost, conversions, revenue)
+
+    def get_entity_time_series(self, start_date, end_date, entity_type='campaign', **filters):
+        columns = [list(column) for column in zip(*self.rows)]
+        return dict(zip(['entity_id', 'date'] + METRIC_NAMES, columns))
+
+    def replace_anomalies(self, anomalies, **window):
+        self.replaced = (anomalies, window)
+
+    def get_time_series_metrics(self, campaign_id=None, **kwargs):
+        return [
+            dict(date=row[1], **dict(zip(METRIC_NAMES, row[2:])))
+            for row in self.rows
+            if row[0] == campaign_id
+        ]
+
+
+def make_rows(spikes):
+    """Build 20 days of steady data per campaign with optional spikes."""
+    today = datetime.utcnow().date()
+    rows = []
+    for entity_id in ['camp_1', 'camp_2', 'camp_3']:
+        for offset in range(20):
+            value = 100 + offset % 3
+            value = spikes.get((entity_id, offset), value)
+            rows.append((
+                entity_id, today - timedelta(days=20 - offset),
+                value * 10, value, value * 1_000_000, value // 10, value * 3_000_000,
+            ))
+    return rows
+
+
+def make_detector(rows, strategy=None):
+    """Create a detector without connecting to ClickHouse."""
+    detector = AnomalyDetector.__new__(AnomalyDetector)
+    detector.z_threshold = 2.5
+    detector.strategy = strategy or ZScoreDetector()
+    detector.clickhouse = FakeClickHouse(rows)
+    return detector
+
+
+class TestBulkAnomalyDetection:
+    """Tests for AnomalyDetector.detect_anomalies_bulk."""
+
+    def test_bulk_matches_per_entity_detection(self):
+        """Test bulk detection equals running detection per entity."""
+        detector = make_detector(make_rows({('camp_1', 10): 900, ('camp_3', 4): 5}))
+        metric_types = [MetricType.COST, MetricType.CLICKS]
+
+        bulk = detector.detect_anomalies_bulk(metric_types)
+        single = [
+            anomaly
+            for entity_id in ['camp_1', 'camp_2', 'camp_3']
+            for metric_type in metric_types
+            for anomaly in detector.detect_anomalies(metric_type, entity_id)
+        ]
+
+        def key(anomaly):
+            return (anomaly.entity_id, anomaly.metric_type, anomaly.date, anomaly.z_score)
+
+        assert bulk
+        assert sorted(map(key, bulk)) == sorted(map(key, single))
+
+    def test_bulk_reports_money_in_currency_units(self):
+        """Test money metrics are scored in currency units, not micros."""
+        detector = make_detector(make_rows({('camp_2', 15): 900}))
+        anomalies = detector.detect_anomalies_bulk([MetricType.COST])
+
+        assert [anomaly.entity_id for anomaly in anomalies] == ['camp_2']
+        assert float(anomalies[0].value) == 900
+
+
+class TestDetectorStrategies:
+    """Tests for pluggable detector baselines."""
+
+    def test_zscore_matches_statistics(self):
+        """Test the default strategy scores against the global mean/stdev."""
+        values = [10.0, 12.0, 11.0, 30.0, 9.0, 10.0, 11.0, 12.0]
+        matrix = np.array([values])
+        dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-09'))
+
+        expected, z_scores = ZScoreDetector().score(matrix, dates)
+
+        mean, stdev = statistics.mean(values), statistics.stdev(values)
+        assert expected[0, 3] == pytest.approx(mean)
+        assert z_scores[0, 3] == pytest.approx((30.0 - mean) / stdev)
+
+    def test_rolling_scores_against_preceding_window(self):
+        """Test a point is scored against the window of days before it."""
+        values = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+        matrix = np.array([values])
+        dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-11'))
+
+        expected, z_scores = RollingZScoreDetector(window=4).score(matrix, dates)
+
+        window = values[5:9]
+        assert expected[0, 9] == pytest.approx(statistics.mean(window))
+        assert z_scores[0, 9] == pytest.approx((10.0 - statistics.mean(window)) / statistics.stdev(window))
+        assert np.isnan(z_scores[0, 0])
+
+    def test_smallest_rolling_window_scores(self):
+        """Test the shortest allowed window still flags points, and shorter ones are rejected."""
+        values = [10.0, 11.0, 12.0, 10.0, 11.0, 12.0, 40.0]
+        matrix = np.array([values])
+        dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-08'))
+
+        _, z_scores = RollingZScoreDetector(window=3).score(matrix, dates)
+
+        assert z_scores[0, 6] > 2.5
+        with pytest.raises(ValueError):
+            get_detector_strategy('rolling', window=2)
+
+    def test_rolling_finds_spike_hidden_by_trend(self):
+        """Test a spike on a rising trend is flagged locally but not globally."""
+        values = 100.0 + 10.0 * np.arange(20)
+        values[15] += 80.0
+        matrix = values[None, :]
+        dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-21'))
+
+        _, global_z = ZScoreDetector().score(matrix, dates)
+        _, rolling_z = RollingZScoreDetector(window=7).score(matrix, dates)
+
+        assert not np.any(np.abs(global_z) >= 2.5)
+        assert list(np.nonzero(np.abs(rolling_z[0]) >= 2.5)[0]) == [15]
+
+    def test_mad_ignores_outlier_in_baseline(self):
+        """Test the robust baseline is not pulled by the outlier."""
+        matrix = np.array([[10.0, 11.0, 10.0, 9.0, 10.0, 11.0, 9.0, 500.0]])
+        dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-09'))
+
+        expected, z_scores = RobustMADDetector().score(matrix, dates)
+
+        assert expected[0, 7] == 10.0
+        assert z_scores[0, 7] > 100
+
+    def test_seasonal_accepts_weekly_pattern(self):
+        """Test weekend dips are expected under the day-of-week baseline."""
+        dates = np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-02-26'))  # Mondays
+        weekdays = (dates.astype(np.int64) + 3) % 7
+        values = np.where(weekdays >= 5, 20.0, 100.0) + np.arange(len(dates)) % 3
+        values[30] = 300.0
+        matrix = values[None, :]
+
+        _, z_scores = SeasonalDetector().score(matrix, dates)
+        flagged = np.nonzero(np.abs(z_scores[0]) >= 2.5)[0]
+
+        assert list(flagged) == [30]
+
+    def test_missing_days_keep_calendar_alignment(self):
+        """Test gaps in a series leave NaN columns rather than shifting days."""
+        rows = [row for row in make_rows({('camp_1', 12): 900}) if row[0] == 'camp_1']
+        del rows[5]
+        detector = make_detector(rows, RobustMADDetector())
+
+        anomalies = detector.detect_anomalies(MetricType.CLICKS, 'camp_1')
+
+        assert [anomaly.date.date() for anomaly in anomalies] == [rows[11][1]]
+
+    def test_unknown_strategy(self):
+        """Test unknown strategy names are rejected."""
+        with pytest.raises(ValueError):
+            get_detector_strategy('prophet')
+
+
+class FakeHierarchyClickHouse:
+    """Stand-in for ClickHouseClient over campaign > ad group > ad rows."""
+
+    def __init__(self, rows):
+        self.rows = rows  # (campaign_id, ad_group_id, ad_id, date, clicks)
+        self.calls = []
+
+    def get_entity_time_series(self, start_date, end_date, entity_type='campaign',
+                               entity_ids=None, parent_ids=None):
+        self.calls.append((entity_type, parent_ids))
+        level = ['campaign', 'adgroup', 'ad'].index(entity_type)
+        totals = {}
+        for row in self.rows:
+            if entity_ids is not None and row[level] not in entity_ids:
+                continue
+            if parent_ids is not None and row[level - 1] not in parent_ids:
+                continue
+            totals[(row[level], row[3])] = totals.get((row[level], row[3]), 0) + row[4]
+        keys = sorted(totals)
+        return {
+            'entity_id': [key[0] for key in keys],
+            'date': [key[1] for key in keys],
+            'clicks': [totals[key] for key in keys],
+        }
+
+
+class TestHierarchicalDetection:
+    """Tests for campaign > ad group > ad drill-down."""
+
+    def test_drill_down_only_into_anomalous_parents(self):
+        """Test children are analyzed only below anomalous entities."""
+        today = datetime.utcnow().date()
+        rows = []
+        for offset in range(20):
+            day = today - timedelta(days=20 - offset)
+            for campaign, ad_group, ad in [
+                ('camp_1', 'ag_1', 'ad_1'), ('camp_1', 'ag_1', 'ad_2'),
+                ('camp_1', 'ag_2', 'ad_3'), ('camp_2', 'ag_3', 'ad_4'),
+            ]:
+                clicks = 100 + offset % 3
+                if ad == 'ad_2' and offset == 12:
+                    clicks = 900
+                rows.append((campaign, ad_group, ad, day, clicks))
+
+        detector = make_detector([])
+        detector.clickhouse = FakeHierarchyClickHouse(rows)
+        anomalies = detector.detect_anomalies_hierarchical([MetricType.CLICKS])
+
+        assert [(a.entity_type, a.entity_id) for a in anomalies] == [
+            ('campaign', 'camp_1'), ('adgroup', 'ag_1'), ('ad', 'ad_2'),
+        ]
+        assert detector.clickhouse.calls == [
+            ('campaign', None), ('adgroup', ['camp_1']), ('ad', ['ag_1']),
+        ]
+
+    def test_unknown_entity_type(self):
+        """Test unknown entity types are rejected instead of scanning everything."""
+        detector = make_detector([])
+        with pytest.raises(ValueError):
+            detector.detect_anomalies(MetricType.CLICKS, 'x', entity_type='keyword')
+
+
+class RecordingClient:
+    """Raw ClickHouse connection returning fixed rows and recording inserts."""
+
+    def __init__(self, stored_rows):
+        self.stored_rows = stored_rows
+        self.inserts = []
+        self.queries = []
+
+    def query(self, query, parameters=None):
+        self.queries.append((query, parameters))
+        return type('Result', (), {'result_rows': self.stored_rows})()
+
+    def insert(self, table, rows, column_names):
+        self.inserts.append((table, [dict(zip(column_names, row)) for row in rows]))
+
+
+class TestAnomalyStore:
+    """Tests for persisting detected anomalies."""
+
+    def test_detect_and_store_replaces_window(self):
+        """Test detection results are written for the whole lookback window."""
+        detector = make_detector(make_rows({('camp_1', 10): 900}))
+        anomalies = detector.detect_and_store([MetricType.CLICKS], lookback_days=30)
+
+        stored, window = detector.clickhouse.replaced
+        assert len(stored) == len(anomalies) == 1
+        assert stored[0]['entity_id'] == 'camp_1'
+        assert window['metric_types'] == ['clicks']
+        assert (window['end_date'] - window['start_date']).days == 30
+
+    def test_replace_is_idempotent_and_tombstones_stale_rows(self):
+        """Test rows get deterministic ids and undetected stored rows are deactivated."""
+        day = datetime(2024, 1, 10).date()
+        stale_id = ClickHouseClient.anomaly_id('campaign', 'camp_2', 'clicks', day)
+        client = ClickHouseClient.__new__(ClickHouseClient)
+        client.client = RecordingClient([(stale_id, 'clicks', 'camp_2', day)])
+        anomaly = {
+            'metric_type': 'clicks', 'entity_id': 'camp_1', 'date': datetime(2024, 1, 10),
+            'value': 900.0, 'expected_value': 140.123, 'z_score': 4.12345,
+            'severity': 'high', 'description': 'spike',
+        }
+
+        for _ in range(2):
+            client.replace_anomalies(
+                [anomaly], entity_type='campaign', metric_types=['clicks'],
+                start_date=day, end_date=day,
+            )
+
+        first, second = [rows for _, rows in client.client.inserts]
+        assert [row['id'] for row in first] == [row['id'] for row in second]
+        assert first[0]['id'] == ClickHouseClient.anomaly_id('campaign', 'camp_1', 'clicks', day)
+        assert str(first[0]['expected_value']) == '140.12'
+        assert first[1]['id'] == stale_id and first[1]['is_active'] == 0
+
+
+    def test_page_continues_after_keyset_position(self):
+        """Test a page reads past the previous page's last key, bounded by its date."""
+        client = ClickHouseClient.__new__(ClickHouseClient)
+        client.client = RecordingClient([])
+        after = (datetime(2024, 1, 10).date(), 'campaign', 'camp_2', 'clicks')
+
+        client.get_anomalies(entity_type='campaign', limit=51, after=after)
+
+        query, params = client.client.queries[0]
+        assert 'date <= {after_date:Date}' in query
+        assert '(entity_type, entity_id, metric_type) >' in query
+        assert params['after_date'] == after[0] and params['after_entity_id'] == 'camp_2'
+        assert params['limit'] == 51
+
+class TestOnlineAnomalyStatistics:
+    """Tests for statistics maintained at ingestion time."""
+
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        """Run against an empty in-memory cache."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        settings.ANOMALY_ONLINE_ALPHA = None
+        settings.ANOMALY_ONLINE_ENTITY_TYPES = ['campaign']
+        cache.clear()
+
+    def test_running_stats_match_statistics(self):
+        """Test Welford updates match the statistics module."""
+        values = [3.0, 5.0, 8.0, 1.0, 9.0, 4.0]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        assert stats.mean == pytest.approx(statistics.mean(values))
+        assert stats.stdev() == pytest.approx(statistics.stdev(values))
+
+    def test_split_batches_score_whole_days(self):
+        """Test a day ingested in several batches is scored once, in full."""
+        store = OnlineAnomalyStore()
+        today = datetime.utcnow().date()
+        for offset in range(15):
+            day = (today - timedelta(days=15 - offset)).isoformat()
+            clicks = 400 if offset == 12 else 100 + offset % 3
+            store.update([{'campaign_id': 'camp_1', 'date': day, 'clicks': clicks // 2}])
+            store.update([{'campaign_id': 'camp_1', 'date': day, 'clicks': clicks - clicks // 2}])
+
+        anomalies = store.get_anomalies(MetricType.CLICKS, 'camp_1')
+        assert [anomaly['value'] for anomaly in anomalies] == [400]
+
+    def test_untracked_entity_types_are_skipped(self):
+        """Test only entity types in ANOMALY_ONLINE_ENTITY_TYPES are stored."""
+        OnlineAnomalyStore().update([{'campaign_id': 'camp_1', 'ad_id': 'ad_1', 'date': '2024-01-01', 'clicks': 5}])
+
+        assert cache.get(OnlineAnomalyStore.make_key('campaign', 'camp_1', MetricType.CLICKS))
+        assert cache.get(OnlineAnomalyStore.make_key('ad', 'ad_1', MetricType.CLICKS)) is None
+        assert not OnlineAnomalyStore.tracks('ad')
+
+    def test_expired_lock_rereads_before_writing(self, monkeypatch):
+        """Test an update whose lock expired is redone from the stored entries."""
+        class ExpiringLock:
+            """Lock expiring during its first use, failing its release like redis-py."""
+            uses = 0
+
+            def __enter__(self):
+                ExpiringLock.uses += 1
+                return self
+
+            def __exit__(self, *args):
+                if not self.owned():
+                    raise LockNotOwnedError('Cannot release a lock that is no longer owned')
+
+            def owned(self):
+                return ExpiringLock.uses > 1
+
+        store = OnlineAnomalyStore()
+        monkeypatch.setattr(store, '_lock', lambda *args: ExpiringLock())
+        store.update([{'campaign_id': 'camp_1', 'date': '2024-01-01', 'clicks': 5}])
+
+        entry = cache.get(OnlineAnomalyStore.make_key('campaign', 'camp_1', MetricType.CLICKS))
+        assert ExpiringLock.uses == 2
+        assert RunningStats.from_tuple(entry['stats']).count == 1
+
+    def test_running_stats_remove_undoes_add(self):
+        """Test removing an observation restores the Welford statistics."""
+        stats = RunningStats()
+        for value in [3.0, 5.0, 8.0, 1.0]:
+            stats.add(value)
+        stats.remove(5.0)
+        assert stats.count == 3
+        assert stats.mean == pytest.approx(statistics.mean([3.0, 8.0, 1.0]))
+        assert stats.stdev() == pytest.approx(statistics.stdev([3.0, 8.0, 1.0]))
+
+    def test_late_batches_replace_earlier_day(self):
+        """Test a day revised after later days were ingested is counted once, in full."""
+        store = OnlineAnomalyStore()
+        days = ['2024-01-01', '2024-01-02', '2024-01-03']
+        for day in days:
+            store.update([{'campaign_id': 'camp_1', 'date': day, 'clicks': 10}])
+        store.update([{'campaign_id': 'camp_1', 'date': '2024-01-02', 'clicks': 20}])
+        store.update([{'campaign_id': 'camp_1', 'date': '2024-01-02', 'clicks': 30}])
+
+        entry = cache.get(OnlineAnomalyStore.make_key('campaign', 'camp_1', MetricType.CLICKS))
+        stats = RunningStats.from_tuple(entry['stats'])
+        assert stats.count == 3
+        assert stats.mean == pytest.approx(statistics.mean([10, 60, 10]))
+        assert stats.stdev() == pytest.approx(statistics.stdev([10, 60, 10]))
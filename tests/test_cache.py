@@ -0,0 +1,262 @@
+"""
+Tests for caching utilities.
+"""
+import pytest
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta
+from django.core.cache import cache
+from core.services.analytics_service import AnalyticsService
+from core.utils import dirty
+from core.utils.cache import DailyAggregateCache, bind_arguments, build_cache_key
+
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class RecordingLoader:
+    """Fake ClickHouse loader that records requested days."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, days, campaign_id=None, platform=None):
+        self.calls.append(list(days))
+        return {
+            day: {
+                'date': day,
+                'impressions': 100,
+                'clicks': 10,
+                'cost': 5_000_000,
+                'conversions': 1,
+                'revenue': 20_000_000,
+            }
+            for day in days
+            if day.day % 2 == 0  # Only even days have data
+        }
+
+
+class TestDailyAggregateCache:
+    """Tests for DailyAggregateCache."""
+
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        """Run against an empty in-memory cache."""
+        settings.CACHES = LOCMEM_CACHES
+        cache.clear()
+
+    def test_shifted_range_fetches_only_new_day(self):
+        """Test that a range shifted by one day loads a single day."""
+        loader = RecordingLoader()
+        daily_cache = DailyAggregateCache(loader)
+        start = date(2024, 1, 1)
+
+        daily_cache.get_days(start, start + timedelta(days=29))
+        daily_cache.get_days(start + timedelta(days=1), start + timedelta(days=30))
+
+        assert len(loader.calls) == 2
+        assert len(loader.calls[0]) == 30
+        assert loader.calls[1] == [date(2024, 1, 31)]
+
+    def test_totals_sum_days_with_data(self):
+        """Test totals over a range with empty days."""
+        daily_cache = DailyAggregateCache(RecordingLoader())
+        totals = daily_cache.get_totals(date(2024, 1, 1), date(2024, 1, 10))
+
+        assert totals['impressions'] == 500  # Days 2, 4, 6, 8, 10
+        assert totals['cost'] == 25_000_000
+
+    def test_invalidate_refetches_day(self):
+        """Test that ingested records drop their day buckets."""
+        loader = RecordingLoader()
+        daily_cache = DailyAggregateCache(loader)
+        start, end = date(2024, 1, 1), date(2024, 1, 7)
+
+        daily_cache.get_days(start, end)
+        DailyAggregateCache.invalidate([
+            {'campaign_id': 'camp_1', 'platform': 'google_ads', 'date': '2024-01-03'},
+        ])
+        daily_cache.get_days(start, end)
+
+        assert loader.calls[-1] == [date(2024, 1, 3)]
+
+    def test_load_racing_invalidation_is_not_served(self):
+        """Test a day loaded before an invalidation but stored after it is refetched."""
+        day = date(2024, 1, 2)
+
+        def racing_loader(days, campaign_id=None, platform=None):
+            loaded = RecordingLoader()(days, campaign_id=campaign_id, platform=platform)
+            DailyAggregateCache.invalidate([{'date': day.isoformat()}])
+            return loaded
+
+        DailyAggregateCache(racing_loader).get_days(day, day)
+        loader = RecordingLoader()
+        DailyAggregateCache(loader).get_days(day, day)
+
+        assert loader.calls == [[day]]
+
+
+class TestCacheKeys:
+    """Tests for cache key normalization."""
+
+    class Service:
+        def calculate(self, campaign_id=None, days=30):
+            return campaign_id
+
+    def test_key_ignores_instance_and_call_style(self):
+        """Test positional, keyword and per-instance calls share a key."""
+        func = self.Service.calculate
+        positional = bind_arguments(func, self.Service(), 'camp_1')
+        keyword = bind_arguments(func, self.Service(), campaign_id='camp_1', days=30)
+
+        assert positional == {'campaign_id': 'camp_1', 'days': 30}
+        assert build_cache_key('test', func, positional) == build_cache_key('test', func, keyword)
+
+
+class FakeGroupedClickHouse:
+    """Fake ClickHouse client recording single and grouped aggregations."""
+
+    TOTALS = {
+        'camp_1': {'total_impressions': 1000, 'total_clicks': 50, 'total_cost': 100_000_000,
+                   'total_conversions': 5, 'total_revenue': 150_000_000},
+        'camp_2': {'total_impressions': 2000, 'total_clicks': 20, 'total_cost': 40_000_000,
+                   'total_conversions': 0, 'total_revenue': 10_000_000},
+    }
+
+    def __init__(self):
+        self.single_calls = []
+        self.grouped_calls = []
+
+    def get_aggregated_metrics(self, campaign_id=None, platform=None, start_date=None, end_date=None):
+        self.single_calls.append(campaign_id)
+        return self.TOTALS[campaign_id]
+
+    def get_aggregated_metrics_by_campaign(self, campaign_ids=None, platforms=None,
+                                           start_date=None, end_date=None):
+        self.grouped_calls.append({'campaign_ids': campaign_ids, 'platforms': platforms})
+        return {
+            campaign_id: totals for campaign_id, totals in self.TOTALS.items()
+            if campaign_ids is None or campaign_id in campaign_ids
+        }
+
+
+class TestBatchROI:
+    """Tests for batch ROI sharing the per-campaign cache."""
+
+    START, END = datetime(2024, 1, 1), datetime(2024, 1, 31)
+
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        """Run against an empty in-memory cache."""
+        settings.CACHES = LOCMEM_CACHES
+        cache.clear()
+
+    @pytest.fixture
+    def service(self):
+        """Analytics service over a fake ClickHouse client."""
+        service = AnalyticsService.__new__(AnalyticsService)
+        service.clickhouse = FakeGroupedClickHouse()
+        service.daily_cache = SimpleNamespace(supports=lambda start, end: False)
+        return service
+
+    def test_only_misses_are_queried(self, service):
+        """Test cached campaigns are reused and the misses share one query and are cached."""
+        service.calculate_roi(campaign_id='camp_1', start_date=self.START, end_date=self.END)
+
+        results = service.calculate_roi_batch(
+            campaign_ids=['camp_3', 'camp_1', 'camp_2'], start_date=self.START, end_date=self.END
+        )
+
+        assert list(results) == ['camp_3', 'camp_1', 'camp_2']
+        assert service.clickhouse.grouped_calls == [{'campaign_ids': ['camp_3', 'camp_2'], 'platforms': []}]
+        assert results['camp_1'].roi == 50.0
+        assert results['camp_3'].total_cost == 0 and results['camp_3'].roi == 0
+
+        service.calculate_roi(campaign_id='camp_2', start_date=self.START, end_date=self.END)
+        service.calculate_roi_batch(campaign_ids=['camp_1', 'camp_2'], start_date=self.START, end_date=self.END)
+        assert service.clickhouse.single_calls == ['camp_1']
+        assert len(service.clickhouse.grouped_calls) == 1
+
+    def test_several_platforms_bypass_cache(self, service):
+        """Test a multi-platform batch is not cached as single-platform results."""
+        for _ in range(2):
+            results = service.calculate_roi_batch(
+                platforms=['google_ads', 'meta_ads'], start_date=self.START, end_date=self.END
+            )
+
+        assert set(results) == {'camp_1', 'camp_2'}
+        assert len(service.clickhouse.grouped_calls) == 2
+        assert service.clickhouse.grouped_calls[0]['platforms'] == ['google_ads', 'meta_ads']
+
+
+class FakeRedis:
+    """In-memory Redis supporting the set commands used by the dirty tracker."""
+
+    def __init__(self):
+        self.sets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def delete(self, key):
+        self.sets.pop(key, None)
+
+
+class FakePipeline:
+    """Queues FakeRedis commands until execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((getattr(self.redis, name), args))
+            return self
+        return queue
+
+    def execute(self):
+        return [command(*args) for command, args in self.commands]
+
+
+class TestDirtyEntities:
+    """Tests for the changed-entity tracker."""
+
+    @pytest.fixture
+    def redis(self, monkeypatch, settings):
+        """Route the tracker to an in-memory Redis."""
+        fake = FakeRedis()
+        monkeypatch.setattr(dirty, 'get_redis_connection', lambda alias: fake)
+        settings.DIRTY_ENTITY_CONSUMERS = {'anomalies': ['campaign', 'ad'], 'insights': ['campaign']}
+        return fake
+
+    def test_consumers_drain_independently(self, redis):
+        """Test each consumer sees every change exactly once."""
+        dirty.mark_dirty([
+            {'campaign_id': 'camp_1', 'ad_id': 'ad_1'},
+            {'campaign_id': 'camp_2', 'ad_id': None},
+        ])
+
+        assert dirty.drain_dirty('anomalies', 'campaign') == {'camp_1', 'camp_2'}
+        assert dirty.drain_dirty('anomalies', 'campaign') == set()
+        assert dirty.drain_dirty('anomalies', 'ad') == {'ad_1'}
+        assert dirty.drain_dirty('insights', 'campaign') == {'camp_1', 'camp_2'}
+        assert dirty.drain_dirty('insights', 'ad') == set()
+
+    def test_restore_after_failure(self, redis):
+        """Test drained entities can be put back for the next run."""
+        dirty.mark_dirty([{'campaign_id': 'camp_1'}])
+        drained = dirty.drain_dirty('insights', 'campaign')
+        dirty.mark_dirty([{'campaign_id': 'camp_2'}])
+        dirty.restore_dirty('insights', 'campaign', drained)
+
+        assert dirty.drain_dirty('insights', 'campaign') == {'camp_1', 'camp_2'}
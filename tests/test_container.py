@@ -0,0 +1,94 @@
+"""
+Tests for the service container.
+"""
+import threading
+from core.container import ServiceContainer
+from core.utils.concurrency import run_stages
+
+
+class Counted:
+    """Service counting its constructions."""
+
+    built = 0
+
+    def __init__(self, dependency=None):
+        Counted.built += 1
+        self.dependency = dependency
+
+
+def make_container():
+    """Build a container with a service depending on a client."""
+    Counted.built = 0
+    container = ServiceContainer()
+    container.register('client', object)
+    container.register('service', lambda: Counted(container.resolve('client')))
+    return container
+
+
+class TestServiceContainer:
+    """Tests for ServiceContainer."""
+
+    def test_services_are_built_once(self):
+        """Test a service and its dependencies are shared by every resolve."""
+        container = make_container()
+
+        service = container.resolve('service')
+        assert container.resolve('service') is service
+        assert service.dependency is container.resolve('client')
+        assert Counted.built == 1
+
+    def test_concurrent_first_resolves_build_once(self):
+        """Test threads racing to the first resolve share one instance."""
+        container = make_container()
+        resolved = []
+        threads = [threading.Thread(target=lambda: resolved.append(container.resolve('service'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert Counted.built == 1
+        assert all(service is resolved[0] for service in resolved)
+
+    def test_override_is_scoped(self):
+        """Test an override applies within its block only and builds nothing."""
+        container = make_container()
+        fake = object()
+
+        with container.override(service=fake):
+            assert container.resolve('service') is fake
+        assert Counted.built == 0
+        assert isinstance(container.resolve('service'), Counted)
+
+    def test_override_does_not_leak_to_other_threads(self):
+        """Test concurrent requests do not see each other's overrides."""
+        container = make_container()
+        seen = []
+
+        with container.override(service='fake'):
+            thread = threading.Thread(target=lambda: seen.append(container.resolve('service')))
+            thread.start()
+            thread.join()
+
+        assert isinstance(seen[0], Counted)
+
+    def test_override_reaches_stages(self):
+        """Test stages run concurrently see the caller's overrides."""
+        container = make_container()
+
+        with container.override(service='fake'):
+            results = run_stages({'stage': lambda: container.resolve('service')}, timeouts=5)
+
+        assert results['stage'].value == 'fake'
+
+    def test_warm_stops_at_failure(self):
+        """Test warming logs a failed service and leaves the rest to first use."""
+        container = ServiceContainer()
+        container.register('broken', lambda: 1 / 0)
+        container.register('service', Counted)
+        Counted.built = 0
+
+        container.warm()
+        assert Counted.built == 0
+        container.warm(['service'])
+        assert Counted.built == 1
@@ -0,0 +1,83 @@
+"""
+Tests for the dashboard service.
+"""
+import time
+import pytest
+from datetime import datetime
+from core.domain.entities import AnalyticsResult, Insight, InsightSnapshot
+from core.services.dashboard_service import DashboardService
+from core.services.insight_service import InsightService
+
+
+class FakeAnalyticsService:
+    """Analytics stand-in with a slow trends query."""
+
+    def __init__(self, trends_delay=0.0):
+        self.trends_delay = trends_delay
+        self.roi_calls = []
+
+    def calculate_roi(self, **kwargs):
+        self.roi_calls.append(kwargs)
+        return AnalyticsResult(roi=50.0, total_cost=1_000_000, total_revenue=1_500_000)
+
+    def get_trends(self, **kwargs):
+        time.sleep(self.trends_delay)
+        return [{'date': kwargs['start_date'].date(), 'cost': 1_000_000}]
+
+    def get_campaign_performance(self, **kwargs):
+        return [{'campaign_id': 'camp_1'}]
+
+
+class TestDashboardService:
+    """Tests for DashboardService."""
+
+    START = datetime(2024, 1, 1)
+    END = datetime(2024, 1, 31)
+
+    @pytest.fixture(autouse=True)
+    def timeouts(self, settings):
+        settings.STAGE_EXECUTOR_WORKERS = 4
+        settings.DASHBOARD_SECTION_TIMEOUTS = {'roi': 2, 'trends': 0.2, 'top_campaigns': 2, 'insights': 2}
+
+    @pytest.fixture
+    def stored_snapshot(self, monkeypatch):
+        """Serve a stored snapshot for every window."""
+        snapshot = InsightSnapshot(insights=[Insight(type='anomaly', title='Stored')])
+        monkeypatch.setattr(InsightService, 'get_latest_snapshot', staticmethod(lambda *args, **kwargs: snapshot))
+        return snapshot
+
+    def test_sections_share_one_window(self, stored_snapshot):
+        """Test every section is computed for the requested filters and window."""
+        analytics = FakeAnalyticsService()
+        service = DashboardService(analytics_service=analytics)
+
+        results = service.build(self.START, self.END, campaign_id='camp_1', limit=5)
+
+        assert list(results) == list(DashboardService.SECTIONS)
+        assert all(result.ok for result in results.values())
+        assert analytics.roi_calls == [{
+            'campaign_id': 'camp_1', 'platform': None, 'start_date': self.START, 'end_date': self.END,
+        }]
+        assert results['insights'].value == stored_snapshot.insights
+
+    def test_slow_section_times_out_alone(self, stored_snapshot):
+        """Test a section exceeding its timeout does not hold back the others."""
+        service = DashboardService(analytics_service=FakeAnalyticsService(trends_delay=1.0))
+
+        started = time.monotonic()
+        results = service.build(self.START, self.END)
+
+        assert time.monotonic() - started < 1.0
+        assert results['trends'].status == 'timeout'
+        assert results['roi'].ok and results['top_campaigns'].ok and results['insights'].ok
+
+    def test_missing_snapshot_is_not_materialized(self, monkeypatch):
+        """Test the insights section fails alone when the window has no snapshot yet."""
+        monkeypatch.setattr(InsightService, 'get_latest_snapshot', staticmethod(lambda *args, **kwargs: None))
+        service = DashboardService(analytics_service=FakeAnalyticsService())
+
+        results = service.build(self.START, self.END, limit=5)
+
+        assert results['insights'].status == 'error'
+        assert 'No insight snapshot' in results['insights'].error
+        assert results['roi'].ok and results['trends'].ok and results['top_campaigns'].ok
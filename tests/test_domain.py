@@ -10,6 +10,7 @@ from core.domain.entities import (
     MetricType,
     AnalyticsResult,
 )
+from core.domain.money import to_micros, from_micros, micros_to_float
 
 
 class TestCampaign:
@@ -91,3 +92,31 @@ class TestAnalyticsResult:
         )
         ctr = result.calculate_ctr()
         assert ctr == Decimal('5')  # (50/1000) * 100 = 5%
+
+
+class TestMoney:
+    """Tests for integer micros money conversions."""
+
+    def test_to_micros(self):
+        """Test conversion of floats, strings, Decimals and ints."""
+        assert to_micros(25.5) == 25_500_000
+        assert to_micros(0.1) == 100_000
+        assert to_micros('150.00') == 150_000_000
+        assert to_micros(Decimal('0.0000015')) == 2  # Half to even
+        assert to_micros(3) == 3_000_000
+        assert to_micros(None) == 0
+
+    def test_round_trip(self):
+        """Test micros convert back to exact amounts."""
+        assert from_micros(to_micros('19.99')) == Decimal('19.99')
+        assert micros_to_float(25_500_000) == 25.5
+
+    def test_roi_from_micros(self):
+        """Test derived metrics computed on integer micros."""
+        result = AnalyticsResult(
+            total_cost=to_micros('100'),
+            total_revenue=to_micros('150'),
+            total_clicks=50,
+        )
+        assert result.calculate_roi() == 50
+        assert micros_to_float(result.calculate_cpc()) == 2
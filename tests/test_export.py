@@ -0,0 +1,52 @@
+"""
+Tests for streaming exports.
+"""
+import json
+from datetime import date
+from api.export import render_csv, render_ndjson, streaming_export
+from core.infrastructure.clickhouse_client import ClickHouseClient
+
+
+COLUMNS = ClickHouseClient.AD_METRICS_EXPORT_COLUMNS
+ROWS = [
+    (date(2024, 1, 1), 'camp_1', 'google_ads', 'ag_1', 'ad_1', 1000, 50, 25_500_000, 2, 60_000_000),
+    (date(2024, 1, 1), 'camp_2', 'meta_ads', None, None, 500, 10, 0, 0, 0),
+]
+
+
+class TestExportRendering:
+    """Tests for CSV and NDJSON rendering."""
+
+    def test_csv(self):
+        """Test the header line, ISO dates, money in currency units and empty nulls."""
+        lines = ''.join(render_csv(COLUMNS, ROWS)).splitlines()
+
+        assert lines[0] == ','.join(COLUMNS)
+        assert lines[1] == '2024-01-01,camp_1,google_ads,ag_1,ad_1,1000,50,25.5,2,60.0'
+        assert lines[2] == '2024-01-01,camp_2,meta_ads,,,500,10,0.0,0,0.0'
+
+    def test_ndjson(self):
+        """Test one JSON object per row."""
+        lines = ''.join(render_ndjson(COLUMNS, ROWS)).splitlines()
+
+        assert [json.loads(line)['campaign_id'] for line in lines] == ['camp_1', 'camp_2']
+        assert json.loads(lines[0])['cost'] == 25.5
+        assert json.loads(lines[1])['ad_id'] is None
+
+    def test_rows_are_read_while_streaming(self):
+        """Test no row is read before the client consumes the response."""
+        consumed = []
+
+        def rows():
+            for row in ROWS * 1500:
+                consumed.append(row)
+                yield row
+
+        response = streaming_export(COLUMNS, rows(), 'ndjson', 'metrics')
+        assert consumed == []
+        assert response['Content-Disposition'] == 'attachment; filename="metrics.ndjson"'
+
+        chunks = iter(response.streaming_content)
+        next(chunks)
+        assert len(consumed) == 1000
+        assert sum(chunk.count(b'\n') for chunk in chunks) == 2000
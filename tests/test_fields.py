@@ -0,0 +1,67 @@
+"""
+Tests for sparse fieldsets and float precision.
+"""
+import pytest
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.fields import Fieldset, InvalidFieldset, round_floats
+from api.views import ROI_FIELDS
+from core.domain.entities import AnalyticsResult
+
+
+def make_fieldset(url, getters):
+    """Build a fieldset for a GET request to ``url``."""
+    return Fieldset(Request(APIRequestFactory().get(url)), getters)
+
+
+class TestFieldset:
+    """Tests for Fieldset."""
+
+    def test_all_fields_by_default(self):
+        """Test every field is returned in declaration order without ``fields``."""
+        fieldset = make_fieldset('/x', {'b': lambda obj: 2, 'a': lambda obj: 1})
+
+        assert list(fieldset.serialize(None)) == ['b', 'a']
+
+    def test_only_requested_fields_are_computed(self):
+        """Test getters of unrequested fields never run."""
+        def unrequested(obj):
+            raise AssertionError('computed an unrequested field')
+
+        fieldset = make_fieldset('/x?fields=a&fields=c', {'a': lambda obj: 1, 'b': unrequested, 'c': lambda obj: 3})
+
+        assert fieldset.serialize(None) == {'a': 1, 'c': 3}
+
+    def test_unknown_field_is_rejected(self):
+        """Test unknown fields raise InvalidFieldset naming them."""
+        with pytest.raises(InvalidFieldset, match='nope'):
+            make_fieldset('/x?fields=a,nope', {'a': lambda obj: 1})
+
+    @pytest.mark.parametrize('precision', ['-1', '11', 'two'])
+    def test_invalid_precision_is_rejected(self, precision):
+        """Test precision must be an integer from 0 to 10."""
+        with pytest.raises(InvalidFieldset):
+            make_fieldset(f'/x?precision={precision}', {'a': lambda obj: 1})
+
+    def test_roi_payload_is_pruned_and_rounded(self):
+        """Test a widget can ask for ROI and cost only, rounded."""
+        result = AnalyticsResult(roi=33.333333, total_cost=12_345_678, total_revenue=16_460_904)
+        fieldset = make_fieldset('/x?fields=total_cost,roi&precision=2', ROI_FIELDS)
+
+        assert fieldset.serialize(result) == {'roi': 33.33, 'total_cost': 12.35}
+
+
+class TestRoundFloats:
+    """Tests for round_floats."""
+
+    def test_rounds_nested_floats_only(self):
+        """Test floats in nested metadata are rounded and other values kept."""
+        value = {'z_score': 3.14159, 'points': [1.23456, 7], 'entity': 'camp_1', 'flag': True}
+
+        assert round_floats(value, 1) == {'z_score': 3.1, 'points': [1.2, 7], 'entity': 'camp_1', 'flag': True}
+
+    def test_no_precision_keeps_value(self):
+        """Test values are returned as they are without a precision."""
+        value = {'roi': 1.23456}
+
+        assert round_floats(value, None) is value
@@ -4,7 +4,10 @@ Tests for ingestion service.
 import pytest
 from datetime import datetime
 from core.services.ingestion_service import IngestionService
+from core.utils import progress as progress_module
+from core.utils.progress import IngestionProgress, MAX_ERROR_SAMPLES
 from core.repositories.campaign_repository import DjangoCampaignRepository
+from ingestion import tasks as ingestion_tasks
 
 
 @pytest.mark.django_db
@@ -41,3 +44,171 @@ class TestIngestionService:
         assert len(metrics) == 5  # impressions, clicks, cost, conversions, revenue
         assert metrics[0].metric_type.value == 'impressions'
         assert metrics[0].value == 1000
+
+    def test_normalize_metrics_money_in_micros(self):
+        """Test money metrics are normalized to integer micros."""
+        service = IngestionService()
+        record = {
+            'campaign_id': 'camp_1',
+            'platform': 'google_ads',
+            'date': '2024-01-15',
+            'cost': 25.50,
+            'revenue': '150.00',
+        }
+        metrics = {metric.metric_type.value: metric.value for metric in service._normalize_metrics(record)}
+        assert metrics == {'cost': 25_500_000, 'revenue': 150_000_000}
+
+
+class FakeRedis:
+    """In-memory Redis supporting the hash and list commands used by progress tracking."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.lists = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({
+            field.encode(): str(value).encode() for field, value in mapping.items()
+        })
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = str(int(fields.get(field.encode(), 0)) + amount).encode()
+
+    def hincrbyfloat(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = str(float(fields.get(field.encode(), 0)) + amount).encode()
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value.encode())
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+
+class FakePipeline:
+    """Queues FakeRedis commands until execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class TestIngestionProgress:
+    """Tests for ingestion progress tracking."""
+
+    @pytest.fixture
+    def redis(self, monkeypatch, settings):
+        """Route progress tracking to an in-memory Redis."""
+        fake = FakeRedis()
+        monkeypatch.setattr(progress_module, 'get_redis_connection', lambda alias: fake)
+        settings.INGESTION_PROGRESS_TTL_SECONDS = 60
+        return fake
+
+    def test_lifecycle(self, redis):
+        """Test counts, stage timings and result are reported through the task's life."""
+        progress = IngestionProgress('task_1')
+        progress.queue(3, parse_ms=2.5)
+        assert IngestionProgress.get('task_1')['status'] == 'queued'
+
+        progress.start(3)
+        with progress.stage('postgres'):
+            pass
+        with progress.stage('postgres'):
+            pass
+        progress.advance(2)
+        running = IngestionProgress.get('task_1')
+        assert running['status'] == 'running'
+        assert running['processed'] == 2
+        assert running['total'] == 3
+        assert set(running['stages_ms']) == {'parse', 'postgres'}
+        assert running['stages_ms']['parse'] == 2.5
+
+        progress.finish({'metrics_created': 15})
+        done = IngestionProgress.get('task_1')
+        assert done['status'] == 'succeeded'
+        assert done['stage'] is None
+        assert done['result'] == {'metrics_created': 15}
+        assert redis.ttls[progress.key] == 60
+
+    def test_error_samples_are_capped(self, redis):
+        """Test only the first error samples are kept but all are counted."""
+        progress = IngestionProgress('task_1')
+        progress.start(1)
+        for index in range(MAX_ERROR_SAMPLES + 5):
+            progress.add_error(f'error {index}')
+        progress.fail(ValueError('boom'))
+
+        failed = IngestionProgress.get('task_1')
+        assert failed['status'] == 'failed'
+        assert failed['error_count'] == MAX_ERROR_SAMPLES + 6
+        assert failed['errors'] == [f'error {index}' for index in range(MAX_ERROR_SAMPLES)]
+
+    def test_unknown_task(self, redis):
+        """Test unknown tasks have no progress."""
+        assert IngestionProgress.get('missing') is None
+
+    def test_without_task_id_is_noop(self, redis):
+        """Test progress outside a task writes nothing."""
+        progress = IngestionProgress(None)
+        progress.start(1)
+        with progress.stage('parse'):
+            pass
+        progress.add_error('ignored')
+
+        assert redis.hashes == {}
+        assert redis.lists == {}
+
+
+class FailingIngestionService:
+    """Ingestion stand-in failing on one campaign."""
+
+    def __init__(self, failing_campaign):
+        self.failing_campaign = failing_campaign
+
+    def normalize_and_store(self, chunk, progress=None):
+        if any(record['campaign_id'] == self.failing_campaign for record in chunk):
+            raise RuntimeError('database unavailable')
+        return {'metrics_created': len(chunk)}
+
+
+class TestIngestMarketingData:
+    """Tests for the ingest_marketing_data task."""
+
+    def test_stored_chunks_bump_data_version_when_later_chunk_fails(self, settings, monkeypatch):
+        """Test campaigns of committed chunks are invalidated even if the task fails."""
+        settings.INGESTION_CHUNK_SIZE = 1
+        bumped = []
+        monkeypatch.setattr(ingestion_tasks, 'IngestionService', lambda: FailingIngestionService('camp_2'))
+        monkeypatch.setattr(ingestion_tasks, 'ClickHouseClient', lambda: None)
+        monkeypatch.setattr(ingestion_tasks, '_store_clickhouse_metrics', lambda *args: None)
+        monkeypatch.setattr(ingestion_tasks, 'bump_data_version', lambda campaign_ids: bumped.append(campaign_ids))
+
+        with pytest.raises(RuntimeError):
+            ingestion_tasks.ingest_marketing_data.run([
+                {'campaign_id': 'camp_1'}, {'campaign_id': 'camp_2'}, {'campaign_id': 'camp_3'},
+            ])
+
+        assert bumped == [{'camp_1'}, {'camp_2'}]
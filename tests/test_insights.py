@@ -0,0 +1,444 @@
+"""
+Tests for insight generation and storage.
+"""
+import pytest
+import time
+import numpy as np
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from django.core.cache import cache
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api import views
+from analytics import tasks as analytics_tasks
+from core.services import insight_service as insight_service_module
+from core.domain.entities import Insight, InsightSnapshot
+from core.models import Campaign, AdGroup, Ad
+from core.models import Insight as InsightModel, InsightSnapshot as SnapshotModel
+from core.repositories.insight_repository import DjangoInsightRepository
+from core.repositories.dimension_repository import CachedDimensionRepository
+from core.services.insight_service import InsightService
+from analytics.budget import BudgetPacer, calculate_pacing_batch, weekday_counts
+from core.utils.concurrency import get_stage_executor, run_stages
+
+
+def make_snapshot(count=3, start_date=date(2024, 1, 1), end_date=date(2024, 1, 31)):
+    """Build an unsaved snapshot with ``count`` insights."""
+    return InsightSnapshot(
+        start_date=start_date,
+        end_date=end_date,
+        limit=10,
+        insights=[
+            Insight(
+                type='best_campaign',
+                title=f'Top Performer {i}',
+                description='High ROI',
+                entity_id=f'camp_{i}',
+                entity_type='campaign',
+                metadata={'roi': 100.0 + i},
+            )
+            for i in range(count)
+        ],
+    )
+
+
+@pytest.mark.django_db
+class TestInsightRepository:
+    """Tests for DjangoInsightRepository."""
+
+    def test_snapshot_round_trip(self):
+        """Test a stored snapshot is returned with its insights in order."""
+        repo = DjangoInsightRepository()
+        stored = repo.create_snapshot(make_snapshot())
+
+        latest = repo.get_latest_snapshot(date(2024, 1, 1), date(2024, 1, 31), 10)
+
+        assert latest.id == stored.id
+        assert [insight.entity_id for insight in latest.insights] == ['camp_0', 'camp_1', 'camp_2']
+        assert SnapshotModel.objects.get(id=stored.id).insight_count == 3
+
+    def test_latest_version_wins(self):
+        """Test the newest snapshot of a window is served."""
+        repo = DjangoInsightRepository()
+        repo.create_snapshot(make_snapshot(count=1))
+        newer = repo.create_snapshot(make_snapshot(count=2))
+
+        latest = repo.get_latest_snapshot(date(2024, 1, 1), date(2024, 1, 31), 10)
+        assert latest.id == newer.id
+        assert repo.get_latest_snapshot(date(2024, 1, 2), date(2024, 1, 31), 10) is None
+
+    def test_created_after_skips_stale_snapshots(self):
+        """Test snapshots older than the data watermark are ignored."""
+        repo = DjangoInsightRepository()
+        repo.create_snapshot(make_snapshot())
+        watermark = datetime.now(timezone.utc) + timedelta(seconds=1)
+
+        assert repo.get_latest_snapshot(
+            date(2024, 1, 1), date(2024, 1, 31), 10, created_after=watermark
+        ) is None
+
+    def test_snapshot_insights_pages(self):
+        """Test keyset pages walk a snapshot's insights without overlap."""
+        repo = DjangoInsightRepository()
+        stored = repo.create_snapshot(make_snapshot(count=5))
+
+        pages, after = [], None
+        while True:
+            page = repo.get_snapshot_insights(stored.id, limit=2, after=after)
+            if not page:
+                break
+            pages.append([insight.entity_id for insight in page])
+            after = (page[-1].created_at, int(page[-1].id))
+
+        assert pages == [['camp_0', 'camp_1'], ['camp_2', 'camp_3'], ['camp_4']]
+        assert repo.get_latest_snapshot(
+            date(2024, 1, 1), date(2024, 1, 31), 10, with_insights=False
+        ).insights == []
+
+    def test_prune_keeps_latest_per_window(self):
+        """Test retention deletes old versions but never a window's latest."""
+        repo = DjangoInsightRepository()
+        old = repo.create_snapshot(make_snapshot())
+        latest = repo.create_snapshot(make_snapshot())
+        other_window = repo.create_snapshot(make_snapshot(start_date=date(2024, 1, 24)))
+        SnapshotModel.objects.update(created_at=datetime.now(timezone.utc) - timedelta(days=30))
+
+        deleted = repo.prune(datetime.now(timezone.utc) - timedelta(days=7))
+
+        remaining = set(SnapshotModel.objects.values_list('id', flat=True))
+        assert deleted == 1
+        assert remaining == {int(latest.id), int(other_window.id)}
+        assert not InsightModel.objects.filter(snapshot_id=int(old.id)).exists()
+
+
+@pytest.mark.django_db
+class TestDimensionRepository:
+    """Tests for CachedDimensionRepository."""
+
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        """Run against an empty in-memory cache."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        cache.clear()
+
+    def test_names_are_loaded_once(self, django_assert_num_queries):
+        """Test names come from one query, then from the cache."""
+        campaign = Campaign.objects.create(id='camp_1', name='Campaign', platform='google_ads')
+        ad_group = AdGroup.objects.create(id='ag_1', campaign=campaign, name='Group')
+        Ad.objects.create(id='ad_1', ad_group=ad_group, name='Banner 1')
+        Ad.objects.create(id='ad_2', ad_group=ad_group, name='Banner 2')
+        repo = CachedDimensionRepository()
+
+        with django_assert_num_queries(1):
+            assert repo.get_names('ad', ['ad_1', 'ad_2', 'ad_x']) == {
+                'ad_1': 'Banner 1', 'ad_2': 'Banner 2',
+            }
+        with django_assert_num_queries(0):
+            assert repo.get_names('ad', ['ad_2', 'ad_1']) == {
+                'ad_1': 'Banner 1', 'ad_2': 'Banner 2',
+            }
+
+
+class TestUnderperformingAds:
+    """Tests for underperforming ad insights."""
+
+    def test_metrics_and_names_from_clickhouse_rows(self):
+        """Test ranked ClickHouse rows get ROI, CPA and resolved names."""
+        rows = [
+            {'ad_id': 'ad_1', 'impressions': 1000, 'clicks': 40, 'cost': 100_000_000,
+             'conversions': 0, 'revenue': 0},
+            {'ad_id': 'ad_2', 'impressions': 1000, 'clicks': 50, 'cost': 200_000_000,
+             'conversions': 2, 'revenue': 150_000_000},
+        ]
+        calls = []
+
+        def get_underperforming_ads(**kwargs):
+            calls.append(kwargs)
+            return rows
+
+        service = InsightService.__new__(InsightService)
+        service.analytics_service = SimpleNamespace(
+            clickhouse=SimpleNamespace(get_underperforming_ads=get_underperforming_ads)
+        )
+        service.dimensions = SimpleNamespace(get_names=lambda entity_type, ids: {'ad_2': 'Banner 2'})
+
+        ads = service._get_underperforming_ads(datetime(2024, 1, 1), datetime(2024, 1, 31), limit=5)
+
+        assert calls[0]['max_cpa'] == 50_000_000 and calls[0]['limit'] == 5
+        assert [ad['ad_name'] for ad in ads] == ['ad_1', 'Banner 2']
+        assert ads[0]['roi'] == -100.0
+        assert ads[0]['cpa'] == 999999.0 * 1_000_000
+        assert ads[1]['cpa'] == 100_000_000
+
+
+class TestStageExecution:
+    """Tests for concurrent insight stages."""
+
+    @pytest.fixture(autouse=True)
+    def stage_settings(self, settings):
+        """Use short stage timeouts."""
+        settings.STAGE_EXECUTOR_WORKERS = 4
+        settings.INSIGHT_STAGE_TIMEOUTS = {
+            'best_campaigns': 1, 'underperforming_ads': 1, 'anomalies': 0.2, 'budget': 1,
+        }
+
+    def test_stages_run_concurrently(self):
+        """Test total latency is that of the slowest stage, not the sum."""
+        started = time.monotonic()
+        results = run_stages(
+            {name: (lambda name=name: time.sleep(0.3) or name) for name in ['a', 'b', 'c']},
+            timeouts=2,
+        )
+
+        assert time.monotonic() - started < 0.6
+        assert [result.value for result in results.values()] == ['a', 'b', 'c']
+        assert all(result.duration_ms >= 300 for result in results.values())
+
+    def test_executor_follows_worker_setting(self, settings):
+        """Test a changed worker count rebuilds the pool instead of leaking to later runs."""
+        pool = get_stage_executor()
+        settings.STAGE_EXECUTOR_WORKERS = 2
+
+        assert get_stage_executor() is not pool
+        assert get_stage_executor()._max_workers == 2
+
+    def test_failed_and_slow_stages_degrade(self):
+        """Test a failing or timed out stage leaves the other stages' insights."""
+        def fail():
+            raise RuntimeError('ClickHouse unavailable')
+
+        service = InsightService.__new__(InsightService)
+        service._best_campaign_insights = lambda *args: [Insight(type='best_campaign')]
+        service._underperforming_ad_insights = lambda *args: fail()
+        service._anomaly_insights = lambda *args: time.sleep(1) or []
+        service._budget_insights = lambda *args: []
+
+        snapshot = service.build_summary(datetime(2024, 1, 1), datetime(2024, 1, 31))
+
+        stages = snapshot.metadata['stages']
+        assert [insight.type for insight in snapshot.insights] == ['best_campaign']
+        assert stages['best_campaigns']['status'] == 'ok'
+        assert stages['underperforming_ads'] == {
+            'status': 'error', 'duration_ms': stages['underperforming_ads']['duration_ms'],
+            'error': 'ClickHouse unavailable',
+        }
+        assert stages['anomalies']['status'] == 'timeout'
+        assert snapshot.metadata['degraded'] is True
+
+
+class TestBudgetPacing:
+    """Tests for budget pacing."""
+
+    def test_weekday_counts(self):
+        """Test weekdays are counted from each range's first day."""
+        counts = weekday_counts(np.array(['2024-01-01', '2024-01-06'], dtype='datetime64[D]'), np.array([10, 2]))
+
+        assert counts[0].tolist() == [2, 2, 2, 1, 1, 1, 1]
+        assert counts[1].tolist() == [0, 0, 0, 0, 0, 1, 1]
+
+    def test_linear_pacing_flags(self):
+        """Test on-pace, overpacing and underpacing campaigns on a linear curve."""
+        pacing = calculate_pacing_batch(
+            budget=[3000, 3000, 3000],
+            start_dates=[date(2024, 1, 1)] * 3,
+            end_dates=[date(2024, 1, 30)] * 3,
+            spend=[1000, 1500, 500],
+            recent_spend=[700, 1050, 350],
+            as_of=date(2024, 1, 10),
+        )
+
+        assert pacing['expected_spend'].tolist() == [1000, 1000, 1000]
+        assert pacing['pacing'].tolist() == [1.0, 1.5, 0.5]
+        assert pacing['projected_spend'].tolist() == [3000, 4500, 1500]
+        assert pacing['over_pacing'].tolist() == [False, True, False]
+        assert pacing['under_pacing'].tolist() == [False, False, True]
+        assert pacing['overspend_projected'].tolist() == [False, True, False]
+        assert pacing['projected_overspend'].tolist() == [0, 1500, 0]
+
+    def test_day_weighted_curve(self):
+        """Test a weekday-only curve expects the weekdays' share of the budget."""
+        kwargs = dict(
+            budget=[1000],
+            start_dates=[date(2024, 1, 1)],  # Monday
+            end_dates=[date(2024, 1, 14)],
+            spend=[500],
+            recent_spend=[500],
+            as_of=date(2024, 1, 5),  # Friday
+        )
+
+        linear = calculate_pacing_batch(**kwargs)
+        weighted = calculate_pacing_batch(
+            curve='day_weighted', weekday_weights=[1, 1, 1, 1, 1, 0, 0], **kwargs
+        )
+
+        assert linear['over_pacing'][0]
+        assert weighted['pacing'][0] == 1.0
+        assert not weighted['over_pacing'][0] and not weighted['overspend_projected'][0]
+        # Five weekdays remain, at the recent 100 per weekday
+        assert weighted['projected_spend'][0] == 1000
+
+    def test_unknown_curve(self):
+        """Test an unknown curve is rejected."""
+        with pytest.raises(ValueError):
+            calculate_pacing_batch([1], [date(2024, 1, 1)], [date(2024, 1, 2)], [0], [0], date(2024, 1, 1), curve='log')
+
+    def test_pace_active_campaigns(self):
+        """Test campaigns are paced from one spend query, missing spend counting as zero."""
+        campaigns = [
+            SimpleNamespace(id='camp_1', name='One', budget=Decimal('300.00'),
+                            start_date=datetime(2024, 1, 1), end_date=datetime(2024, 1, 30)),
+            SimpleNamespace(id='camp_2', name='Two', budget=Decimal('300.00'),
+                            start_date=datetime(2024, 1, 6), end_date=datetime(2024, 1, 15)),
+        ]
+        calls = []
+
+        def get_campaign_spend(campaign_ids, start_dates, as_of, recent_days):
+            calls.append((campaign_ids, start_dates, as_of, recent_days))
+            return {'camp_1': (150_000_000, 105_000_000)}
+
+        pacer = BudgetPacer.__new__(BudgetPacer)
+        pacer.curve, pacer.tolerance, pacer.recent_days, pacer.weekday_weights = 'linear', 0.1, 7, None
+        pacer.campaigns = SimpleNamespace(list_in_flight=lambda as_of: campaigns)
+        pacer.clickhouse = SimpleNamespace(get_campaign_spend=get_campaign_spend)
+
+        paced = pacer.pace_active_campaigns(as_of=date(2024, 1, 10))
+
+        assert calls == [(['camp_1', 'camp_2'], [date(2024, 1, 1), date(2024, 1, 6)], date(2024, 1, 10), 7)]
+        assert paced[0]['expected_spend'] == 100_000_000
+        assert paced[0]['over_pacing'] and paced[0]['overspend_projected']
+        assert paced[1]['spend'] == 0 and paced[1]['under_pacing']
+        assert paced[1]['days_elapsed'] == 5 and paced[1]['days_total'] == 10
+
+    def test_budget_insights_rank_overspend_first(self):
+        """Test projected overspend is reported before pacing deviations."""
+        def campaign(campaign_id, spend, projected, pacing, **flags):
+            return {
+                'campaign_id': campaign_id, 'name': campaign_id, 'budget': 100_000_000,
+                'spend': spend, 'expected_spend': 50_000_000, 'projected_spend': projected,
+                'projected_overspend': max(projected - 100_000_000, 0), 'pacing': pacing,
+                'days_elapsed': 5, 'days_total': 10, 'over_pacing': False, 'under_pacing': False,
+                'overspend_projected': projected > 100_000_000, **flags,
+            }
+
+        service = InsightService.__new__(InsightService)
+        service.budget_pacer = SimpleNamespace(
+            curve='linear',
+            pace_active_campaigns=lambda as_of: [
+                campaign('on_pace', 50_000_000, 100_000_000, 1.0),
+                campaign('under', 20_000_000, 40_000_000, 0.4, under_pacing=True),
+                campaign('over', 70_000_000, 140_000_000, 1.4, over_pacing=True),
+                campaign('spent', 110_000_000, 220_000_000, 2.2, over_pacing=True),
+            ],
+        )
+
+        insights = service._budget_insights(datetime(2024, 1, 10), limit=10)
+
+        assert [insight.entity_id for insight in insights] == ['spent', 'over', 'under']
+        assert [insight.severity for insight in insights] == ['critical', 'warning', 'info']
+        assert all(insight.type == 'budget_inefficiency' for insight in insights)
+
+
+class TestSnapshotServing:
+    """Tests for serving insight snapshots to the summary endpoint."""
+
+    URL = '/api/v1/insights/summary?start_date=2024-01-01&end_date=2024-01-31'
+
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        """Run against an empty in-memory cache."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        cache.clear()
+
+    @pytest.fixture
+    def queued(self, monkeypatch):
+        """Record queued window refreshes."""
+        refreshes = []
+        monkeypatch.setattr(views, 'refresh_insight_window', SimpleNamespace(delay=lambda *args: refreshes.append(args)))
+        return refreshes
+
+    def get_snapshot(self):
+        return views.InsightsSummaryView._get_snapshot(Request(APIRequestFactory().get(self.URL)))
+
+    def test_stale_snapshot_is_served_and_refreshed_once(self, monkeypatch, queued):
+        """Test data newer than the snapshot queues one refresh while the snapshot is served."""
+        snapshot = make_snapshot()
+        snapshot.created_at = datetime(2024, 2, 1, tzinfo=timezone.utc)
+        monkeypatch.setattr(InsightService, 'get_latest_snapshot', staticmethod(lambda *args, **kwargs: snapshot))
+        monkeypatch.setattr(views, 'get_data_version', lambda: datetime(2024, 2, 2, tzinfo=timezone.utc).timestamp())
+
+        assert self.get_snapshot() == (snapshot, True)
+        assert self.get_snapshot() == (snapshot, True)
+        assert queued == [('2024-01-01', '2024-01-31', 10)]
+
+    def test_missing_snapshot_is_materialized_by_one_request(self, monkeypatch, queued):
+        """Test requests for a window being materialized get no snapshot instead of building another."""
+        monkeypatch.setattr(InsightService, 'get_latest_snapshot', staticmethod(lambda *args, **kwargs: None))
+        monkeypatch.setattr(views, 'get_data_version', lambda: 0.0)
+        InsightService.claim_window(date(2024, 1, 1), date(2024, 1, 31), 10)
+
+        assert self.get_snapshot() == (None, False)
+        assert queued == []
+
+
+class FakeWindowRedis:
+    """In-memory Redis supporting the sorted set commands used for requested windows."""
+
+    def __init__(self):
+        self.windows = {}
+
+    def zadd(self, key, mapping):
+        self.windows.update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        self.windows = {member: score for member, score in self.windows.items() if score > high}
+
+    def zrevrange(self, key, start, end):
+        return sorted(self.windows, key=self.windows.get, reverse=True)[start:end + 1]
+
+
+class TestRequestedWindows:
+    """Tests for keeping requested insight windows current."""
+
+    @pytest.fixture(autouse=True)
+    def redis(self, settings, monkeypatch):
+        """Track windows in memory, with the claims in an empty local cache."""
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        settings.INSIGHT_SUMMARY_WINDOWS = [7]
+        settings.INSIGHT_SUMMARY_LIMIT = 10
+        cache.clear()
+        fake = FakeWindowRedis()
+        monkeypatch.setattr(insight_service_module, 'get_redis_connection', lambda alias: fake)
+        return fake
+
+    def test_only_unscheduled_windows_are_tracked(self, redis):
+        """Test the scheduled trailing windows are not recorded and other windows are."""
+        InsightService.track_window(*InsightService.trailing_window(7), 10)
+        InsightService.track_window(date(2024, 1, 1), date(2024, 1, 31), 5)
+
+        assert InsightService.requested_windows() == [(date(2024, 1, 1), date(2024, 1, 31), 5)]
+
+    def test_windows_not_requested_lately_are_forgotten(self, redis, settings):
+        """Test windows older than INSIGHT_REQUESTED_WINDOW_SECONDS are dropped."""
+        settings.INSIGHT_REQUESTED_WINDOW_SECONDS = 60
+        redis.zadd(insight_service_module.REQUESTED_WINDOWS_KEY, {'2024-01-01:2024-01-31:10': time.time() - 120})
+
+        assert InsightService.requested_windows() == []
+        assert redis.windows == {}
+
+    def test_changed_data_refreshes_requested_windows(self, monkeypatch):
+        """Test ingestion refreshes requested windows besides the trailing ones."""
+        materialized = []
+        monkeypatch.setattr(analytics_tasks, 'drain_dirty', lambda *args: {'camp_1'})
+        monkeypatch.setattr(InsightService, 'get_latest_snapshot', staticmethod(lambda *args, **kwargs: make_snapshot()))
+        monkeypatch.setattr(InsightService, '__init__', lambda self: None)
+        monkeypatch.setattr(InsightService, 'materialize_snapshot', lambda self, *window: materialized.append(window))
+        InsightService.track_window(date(2024, 1, 1), date(2024, 1, 31), 5)
+
+        result = analytics_tasks.refresh_insights()
+
+        assert materialized == [
+            (*InsightService.trailing_window(7), 10),
+            (date(2024, 1, 1), date(2024, 1, 31), 5),
+        ]
+        assert result == {'refreshed': [7], 'requested': 1}
@@ -35,6 +35,7 @@ class TestDataIngestionAPI:
         assert response.status_code == 202
         assert 'task_id' in response.data
         assert response.data['records_count'] == 1
+        assert response.data['status_url'].endswith(f"/api/v1/data/ingest/{response.data['task_id']}")
 
     def test_ingest_csv_data(self):
         """Test CSV data ingestion."""
@@ -58,6 +59,13 @@ camp_test_2,google_ads,2024-01-15,1000,50,25.50,5,150.00"""
         response = client.post('/api/v1/data/ingest', data, format='json')
         assert response.status_code == 400
 
+    def test_ingest_status_unknown_task(self):
+        """Test status of an unknown ingestion task."""
+        client = APIClient()
+
+        response = client.get('/api/v1/data/ingest/unknown-task')
+        assert response.status_code == 404
+
 
 @pytest.mark.django_db
 class TestAnalyticsAPI:
@@ -112,6 +120,17 @@ class TestAnalyticsAPI:
         assert 'cpc' in response.data
         assert 'ctr' in response.data
 
+    def test_roi_endpoint_not_modified(self):
+        """Test ROI endpoint answers a matching If-None-Match with 304."""
+        client = APIClient()
+        url = '/api/v1/analytics/roi?campaign_id=camp_analytics_1'
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.has_header('ETag')
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+
     def test_trends_endpoint(self):
         """Test trends analytics endpoint."""
         client = APIClient()
@@ -129,6 +148,87 @@ class TestAnalyticsAPI:
         assert response.status_code == 200
         assert isinstance(response.data, list)
 
+    def test_roi_batch_endpoint(self):
+        """Test batch ROI answers one entry per requested campaign, in order."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/roi/batch?campaign_ids=camp_analytics_1,camp_missing')
+        assert response.status_code == 200
+        assert [entry['campaign_id'] for entry in response.data] == ['camp_analytics_1', 'camp_missing']
+
+    def test_roi_batch_requires_filter(self):
+        """Test batch ROI needs campaign_ids or a platform."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/roi/batch')
+        assert response.status_code == 400
+
+    def test_metrics_export_streams_csv(self):
+        """Test the metrics export streams a CSV download."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/export/metrics?campaign_id=camp_analytics_1')
+        assert response.status_code == 200
+        assert response.streaming
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0].startswith('date,campaign_id,platform')
+
+    def test_export_rejects_unknown_format(self):
+        """Test exports only offer CSV and NDJSON."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/export/trends?export_format=xml')
+        assert response.status_code == 400
+
+    def test_trends_pages_follow_cursor(self):
+        """Test trends are paged by days through the next cursor."""
+        client = APIClient()
+        first = client.get('/api/v1/analytics/trends?days=30&page_size=10')
+        assert first.status_code == 200
+        cursor = first['X-Next-Cursor']
+
+        second = client.get(f'/api/v1/analytics/trends?days=30&page_size=10&cursor={cursor}')
+        assert second.status_code == 200
+        assert 'rel="next"' in second['Link']
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/anomalies?cursor=garbage')
+        assert response.status_code == 400
+
+    def test_live_anomalies_require_entity(self):
+        """Test live anomaly detection needs an entity_id."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/anomalies?live=1&metric_type=cost')
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize('query', [
+        'method=rolling&window=abc', 'method=rolling&window=0', 'method=rolling&window=2', 'lookback_days=-5',
+    ])
+    def test_anomalies_reject_invalid_windows(self, query):
+        """Test lookback_days must be a positive integer and window at least 3."""
+        client = APIClient()
+        response = client.get(f'/api/v1/analytics/anomalies?live=1&entity_id=camp_1&{query}')
+        assert response.status_code == 400
+
+    def test_dashboard_endpoint(self):
+        """Test the dashboard returns every section with its timing."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/dashboard?campaign_id=camp_analytics_1&precision=2')
+        assert response.status_code == 200
+        assert set(response.data['sections']) == {'roi', 'trends', 'top_campaigns', 'insights'}
+        assert set(response.data['timing']) == set(response.data['sections'])
+        assert 'Server-Timing' in response
+
+    def test_analytics_job_rejects_unknown_query(self):
+        """Test submitting an unknown job query."""
+        client = APIClient()
+        response = client.post('/api/v1/analytics/jobs', {'query': 'everything'}, format='json')
+        assert response.status_code == 400
+
+    def test_analytics_job_unknown(self):
+        """Test status of an unknown analytics job."""
+        client = APIClient()
+        response = client.get('/api/v1/analytics/jobs/unknown-job')
+        assert response.status_code == 404
+
     def test_insights_endpoint(self):
         """Test insights summary endpoint."""
         client = APIClient()
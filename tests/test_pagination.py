@@ -0,0 +1,55 @@
+"""
+Tests for keyset pagination.
+"""
+import pytest
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor
+
+
+def make_paginator(url):
+    """Build a paginator for a GET request to ``url``."""
+    return KeysetPaginator(Request(APIRequestFactory().get(url)))
+
+
+class TestCursors:
+    """Tests for cursor tokens."""
+
+    def test_round_trip(self):
+        """Test a position survives encoding as an opaque URL-safe token."""
+        position = {'d': '2024-01-10', 't': 'campaign', 'e': 'camp/2', 'm': 'clicks'}
+        token = encode_cursor(position)
+
+        assert '=' not in token and '/' not in token and 'camp' not in token
+        assert decode_cursor(token) == position
+
+    @pytest.mark.parametrize('token', ['not a cursor', encode_cursor(['list'])[:-2], 'WzFd'])
+    def test_malformed_cursors_are_rejected(self, token):
+        """Test tokens not produced by encode_cursor raise InvalidCursor."""
+        with pytest.raises(InvalidCursor):
+            decode_cursor(token)
+
+
+class TestKeysetPaginator:
+    """Tests for KeysetPaginator."""
+
+    def test_page_size_is_capped(self, settings):
+        """Test page sizes default to PAGE_SIZE and are capped at MAX_PAGE_SIZE."""
+        settings.MAX_PAGE_SIZE = 100
+
+        assert make_paginator('/x').page_size == settings.REST_FRAMEWORK['PAGE_SIZE']
+        assert make_paginator('/x?page_size=20').page_size == 20
+        assert make_paginator('/x?page_size=5000').page_size == 100
+        assert make_paginator('/x?page_size=0').page_size == 1
+
+    def test_next_page_headers(self):
+        """Test the next cursor replaces the current one in the Link URL."""
+        paginator = make_paginator(f"/x?days=30&cursor={encode_cursor({'d': '2024-01-01'})}")
+        assert paginator.position == {'d': '2024-01-01'}
+
+        headers = paginator.headers({'d': '2024-01-11'})
+
+        token = headers['X-Next-Cursor']
+        assert decode_cursor(token) == {'d': '2024-01-11'}
+        assert headers['Link'] == f'<http://testserver/x?cursor={token}&days=30>; rel="next"'
+        assert paginator.headers(None) == {}
@@ -0,0 +1,116 @@
+"""
+Tests for asynchronous analytics query jobs.
+"""
+import pytest
+from datetime import date
+from django.core.cache import cache
+from core.services.query_job_service import QueryJobService
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+class FakeClickHouse:
+    """ClickHouse stand-in recording query IDs."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.query_ids = []
+
+    def get_time_series_metrics(self, query_id=None, **kwargs):
+        self.query_ids.append(query_id)
+        if self.fail:
+            raise RuntimeError('Memory limit exceeded')
+        return [{
+            'date': date(2024, 1, 1), 'cost': 1_500_000, 'revenue': 3_000_000,
+            'clicks': 10, 'impressions': 100, 'conversions': 1,
+        }]
+
+    def get_entity_breakdown(self, query_id=None, **kwargs):
+        self.query_ids.append(query_id)
+        return [{
+            'entity_id': 'ad_1', 'cost': 2_000_000, 'revenue': 5_000_000,
+            'clicks': 4, 'impressions': 200, 'conversions': 2,
+        }]
+
+
+class TestQueryJobService:
+    """Tests for QueryJobService."""
+
+    PARAMS = {'start_date': '2020-01-01', 'end_date': '2024-12-31', 'platform': 'google_ads'}
+
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        """Run against an empty in-memory cache."""
+        settings.CACHES = LOCMEM_CACHES
+        cache.clear()
+
+    def test_identical_in_flight_submission_joins_job(self):
+        """Test an identical submission reuses the queued job until it finishes."""
+        service = QueryJobService(clickhouse=FakeClickHouse())
+
+        job, created = service.submit('trends', self.PARAMS)
+        duplicate, duplicate_created = service.submit('trends', dict(self.PARAMS, unused='x'))
+
+        assert created and not duplicate_created
+        assert duplicate['job_id'] == job['job_id']
+
+        service.run(job['job_id'])
+        rerun, rerun_created = service.submit('trends', self.PARAMS)
+
+        assert rerun_created
+        assert rerun['job_id'] != job['job_id']
+
+    def test_different_parameters_get_own_job(self):
+        """Test submissions with other parameters are not deduplicated."""
+        service = QueryJobService(clickhouse=FakeClickHouse())
+
+        job, _ = service.submit('trends', self.PARAMS)
+        other, created = service.submit('trends', dict(self.PARAMS, platform='meta_ads'))
+
+        assert created
+        assert other['job_id'] != job['job_id']
+
+    def test_run_stores_compressed_result(self):
+        """Test a job runs with its ID as query_id and its rows round-trip."""
+        clickhouse = FakeClickHouse()
+        service = QueryJobService(clickhouse=clickhouse)
+        job, _ = service.submit('breakdown', self.PARAMS)
+
+        finished = service.run(job['job_id'])
+
+        assert clickhouse.query_ids == [job['job_id']]
+        assert finished['status'] == 'succeeded'
+        assert finished['rows'] == 1 and finished['result_bytes'] > 0
+        assert service.get(job['job_id'])['status'] == 'succeeded'
+        [row] = service.get_result(job['job_id'])
+        assert row['entity_id'] == 'ad_1'
+        assert row['cost'] == 2.0 and row['revenue'] == 5.0
+        assert row['roi'] == pytest.approx(150.0)
+
+    def test_failed_run_releases_submission(self):
+        """Test a failed job is recorded and identical submissions start over."""
+        service = QueryJobService(clickhouse=FakeClickHouse(fail=True))
+        job, _ = service.submit('trends', self.PARAMS)
+
+        with pytest.raises(RuntimeError):
+            service.run(job['job_id'])
+
+        failed = service.get(job['job_id'])
+        assert failed['status'] == 'failed'
+        assert 'Memory limit' in failed['error']
+        assert service.get_result(job['job_id']) is None
+        assert service.submit('trends', self.PARAMS)[1]
+
+    @pytest.mark.parametrize('query, params', [
+        ('everything', {}),
+        ('breakdown', {'entity_type': 'keyword'}),
+        ('trends', {'start_date': '2024-13-01'}),
+    ])
+    def test_invalid_submission_is_rejected(self, query, params):
+        """Test unknown queries and invalid parameters raise ValueError."""
+        with pytest.raises(ValueError):
+            QueryJobService(clickhouse=FakeClickHouse()).submit(query, params)
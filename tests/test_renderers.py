@@ -0,0 +1,85 @@
+"""
+Tests for JSON rendering and response compression.
+"""
+import gzip
+import json
+import numpy as np
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from api.compression import CompressionMiddleware
+from api.renderers import ORJSONRenderer
+
+
+class TestORJSONRenderer:
+    """Tests for ORJSONRenderer."""
+
+    def test_native_types(self):
+        """Test Decimal, dates and NumPy values render without conversion."""
+        data = {
+            'cost': Decimal('25.50'),
+            'date': date(2024, 1, 1),
+            'created_at': datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc),
+            'values': np.array([1.5, 2.0]),
+            'roi': np.float64(12.5),
+        }
+
+        rendered = json.loads(ORJSONRenderer().render(data))
+
+        assert rendered == {
+            'cost': 25.5,
+            'date': '2024-01-01',
+            'created_at': '2024-01-01T12:30:00Z',
+            'values': [1.5, 2.0],
+            'roi': 12.5,
+        }
+
+    def test_none_renders_empty(self):
+        """Test an empty body for no data."""
+        assert ORJSONRenderer().render(None) == b''
+
+
+class TestCompressionMiddleware:
+    """Tests for CompressionMiddleware."""
+
+    def _respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_small_responses_are_not_compressed(self, settings):
+        """Test responses below the threshold are sent as they are."""
+        settings.RESPONSE_COMPRESSION_MIN_BYTES = 1024
+        response = self._respond(HttpResponse(b'{"roi": 1.0}'))
+
+        assert not response.has_header('Content-Encoding')
+
+    def test_large_responses_are_gzipped(self, settings):
+        """Test responses above the threshold are gzipped with a weak ETag."""
+        settings.RESPONSE_COMPRESSION_MIN_BYTES = 1024
+        body = json.dumps([{'date': '2024-01-01', 'cost': 1.5}] * 200).encode()
+        original = HttpResponse(body)
+        original['ETag'] = '"abc"'
+
+        response = self._respond(original, accept_encoding='gzip, deflate')
+
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['ETag'] == 'W/"abc"'
+        assert 'Accept-Encoding' in response['Vary']
+        assert gzip.decompress(response.content) == body
+
+    def test_streaming_responses_are_compressed(self, settings):
+        """Test streamed chunks are compressed as they pass."""
+        settings.RESPONSE_COMPRESSION_MIN_BYTES = 1024
+        response = self._respond(StreamingHttpResponse(iter([b'a,b\n', b'1,2\n'] * 100)))
+
+        assert response['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(b''.join(response.streaming_content)) == b'a,b\n1,2\n' * 100
+
+    def test_identity_without_accept_encoding(self, settings):
+        """Test clients not accepting compression get the plain body."""
+        settings.RESPONSE_COMPRESSION_MIN_BYTES = 10
+        response = self._respond(HttpResponse(b'x' * 100), accept_encoding='')
+
+        assert not response.has_header('Content-Encoding')
+        assert response.content == b'x' * 100
@@ -0,0 +1,170 @@
+"""
+Tests for throttling and ingestion admission control.
+"""
+import pytest
+from types import SimpleNamespace
+from rest_framework.test import APIRequestFactory
+from api import throttling
+from api.throttling import CheapRateThrottle, ExpensiveRateThrottle, TokenBucketThrottle
+from api.views import DataIngestionView
+from core.utils import progress as progress_module
+from core.utils.progress import IngestionProgress
+
+
+class FakeScript:
+    """Token bucket script returning canned replies and recording its calls."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def make_request(user=None, address='10.0.0.1'):
+    """Build a request from ``address``, anonymous without ``user``."""
+    return SimpleNamespace(
+        user=user or SimpleNamespace(is_authenticated=False, pk=None),
+        META={'REMOTE_ADDR': address},
+    )
+
+
+class TestTokenBucketThrottle:
+    """Tests for TokenBucketThrottle."""
+
+    @pytest.fixture(autouse=True)
+    def buckets(self, settings):
+        settings.THROTTLE_BUCKETS = {
+            'cheap': {'capacity': 100, 'refill_per_second': 10.0},
+            'expensive': {'capacity': 5, 'refill_per_second': 0.5},
+        }
+
+    def use_script(self, monkeypatch, *replies):
+        script = FakeScript(*replies)
+        monkeypatch.setattr(TokenBucketThrottle, '_script', script)
+        return script
+
+    def test_allowed_request_takes_token_of_scope_bucket(self, monkeypatch):
+        """Test a request spends one token of its scope's bucket for its client."""
+        script = self.use_script(monkeypatch, [1, '0'])
+        throttle = ExpensiveRateThrottle()
+
+        assert throttle.allow_request(make_request(), None)
+        assert script.calls == [(['throttle:expensive:ip:10.0.0.1'], [5, 0.5, 1])]
+        assert throttle.wait() is None
+
+    def test_users_have_own_buckets(self, monkeypatch):
+        """Test authenticated users are throttled per user, not per address."""
+        script = self.use_script(monkeypatch, [1, '0'])
+        user = SimpleNamespace(is_authenticated=True, pk=42)
+
+        CheapRateThrottle().allow_request(make_request(user), None)
+        assert script.calls[0][0] == ['throttle:cheap:user:42']
+
+    def test_empty_bucket_reports_retry_after(self, monkeypatch):
+        """Test a throttled request waits for the bucket to refill."""
+        self.use_script(monkeypatch, [0, '1.5'])
+        throttle = ExpensiveRateThrottle()
+
+        assert not throttle.allow_request(make_request(), None)
+        assert throttle.wait() == 1.5
+
+    def test_fails_open_without_redis(self, monkeypatch):
+        """Test requests are allowed when Redis is unavailable."""
+        self.use_script(monkeypatch, ConnectionError('down'))
+
+        assert CheapRateThrottle().allow_request(make_request(), None)
+
+
+class FakeRedis:
+    """In-memory Redis supporting the sorted set commands used by the backlog."""
+
+    def __init__(self):
+        self.zsets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, member):
+        self.zsets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        members = self.zsets.get(key, {})
+        for member, score in list(members.items()):
+            if score <= high:
+                del members[member]
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def hset(self, key, mapping):
+        pass
+
+    def expire(self, key, seconds):
+        pass
+
+
+class FakePipeline:
+    """Queues FakeRedis commands until execute."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+class TestIngestionAdmission:
+    """Tests for queue-depth admission control of ingestion."""
+
+    @pytest.fixture
+    def redis(self, monkeypatch, settings):
+        """Route the backlog to an in-memory Redis."""
+        fake = FakeRedis()
+        monkeypatch.setattr(progress_module, 'get_redis_connection', lambda alias: fake)
+        settings.INGESTION_BACKLOG_MAX_TASKS = 2
+        settings.INGESTION_BACKLOG_RETRY_AFTER_SECONDS = 30
+        settings.INGESTION_BACKLOG_STALE_SECONDS = 3600
+        return fake
+
+    def test_full_backlog_rejects_until_task_finishes(self, redis):
+        """Test ingestion is refused while the backlog is full."""
+        IngestionProgress('task_1').queue(10)
+        assert throttling.ingestion_backlog_retry_after() is None
+
+        IngestionProgress('task_2').queue(10)
+        assert throttling.ingestion_backlog_retry_after() == 30
+
+        IngestionProgress('task_1').finish({})
+        assert throttling.ingestion_backlog_retry_after() is None
+
+    def test_stale_tasks_leave_backlog(self, redis):
+        """Test tasks of lost workers stop counting after the stale age."""
+        redis.zadd(progress_module.BACKLOG_KEY, {'lost_1': 0.0, 'lost_2': 0.0})
+
+        assert IngestionProgress.backlog() == 0
+
+    def test_view_returns_503_with_retry_after(self, monkeypatch):
+        """Test the ingestion view sheds load before parsing the upload."""
+        monkeypatch.setattr('api.views.ingestion_backlog_retry_after', lambda: 30)
+        monkeypatch.setattr(DataIngestionView, 'throttle_classes', [])
+        request = APIRequestFactory().post('/api/v1/data/ingest', [{'campaign_id': 'c'}], format='json')
+
+        response = DataIngestionView.as_view()(request)
+        assert response.status_code == 503
+        assert response['Retry-After'] == '30'